@@ -0,0 +1,433 @@
+"""
+Offline arXiv metadata mirror.
+
+Loads arXiv bulk metadata dumps into a local SQLite store and answers
+searches from it. Two dump formats are understood, optionally gzipped:
+
+- JSON lines as published in the arXiv metadata snapshot
+  (``arxiv-metadata-oai-snapshot.json``)
+- OAI-PMH ``ListRecords`` XML harvested with ``metadataPrefix=arXiv``
+
+Records are parsed as a stream and committed in batches, so memory use does
+not depend on dump size. Titles, abstracts and authors go into an FTS5
+index; categories get their own table for filtered queries.
+
+Usage:
+    python arxiv_mirror.py ingest arxiv-metadata-oai-snapshot.json --db arxiv_mirror.db
+    python arxiv_mirror.py search "graph neural networks cat:cs.LG" --db arxiv_mirror.db
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Iterator, List, Optional
+
+INGEST_BATCH_SIZE = 10000
+
+OAI_NS = "http://www.openarchives.org/OAI/2.0/"
+ARXIV_OAI_NS = "http://arxiv.org/OAI/arXiv/"
+
+CATEGORY_TOKEN_RE = re.compile(r"\bcat:(\S+)")
+
+
+# ==============================
+# 🗄️ SCHEMA
+# ==============================
+
+def init_mirror(conn: sqlite3.Connection):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mirror_papers (
+            id INTEGER PRIMARY KEY,
+            arxiv_id TEXT NOT NULL UNIQUE,
+            latest_version TEXT,
+            title TEXT NOT NULL,
+            authors TEXT NOT NULL,
+            abstract TEXT,
+            categories TEXT,
+            doi TEXT,
+            published TEXT,
+            updated TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mirror_categories (
+            category TEXT NOT NULL,
+            paper_rowid INTEGER NOT NULL,
+            PRIMARY KEY (category, paper_rowid)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS mirror_fts USING fts5(
+            title, abstract, authors,
+            content='mirror_papers', content_rowid='id'
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mirror_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    conn.commit()
+
+
+# ==============================
+# 📄 DUMP PARSERS
+# ==============================
+
+def _open_dump(path: str, mode: str = "rt"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8") if "t" in mode else gzip.open(path, mode)
+    return open(path, mode, encoding="utf-8") if "t" in mode else open(path, mode)
+
+
+def _clean(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+
+def _iso_date(value: str) -> str:
+    """Normalizes the date styles found in dumps to ``YYYY-MM-DD``."""
+    value = (value or "").strip()
+    if not value:
+        return ""
+    if re.match(r"^\d{4}-\d{2}-\d{2}", value):
+        return value[:10]
+    try:
+        return parsedate_to_datetime(value).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return ""
+
+
+def parse_jsonl_dump(stream) -> Iterator[dict]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            continue
+
+        versions = data.get("versions") or []
+        parsed = data.get("authors_parsed")
+        if parsed:
+            authors = [" ".join(p for p in (a[1], a[0]) if p).strip() for a in parsed if a]
+        else:
+            authors = [a.strip() for a in re.split(r",| and ", data.get("authors") or "") if a.strip()]
+
+        yield {
+            "arxiv_id": data.get("id", "").strip(),
+            "latest_version": versions[-1].get("version", "") if versions else "",
+            "title": _clean(data.get("title")),
+            "authors": authors,
+            "abstract": _clean(data.get("abstract")),
+            "categories": (data.get("categories") or "").split(),
+            "doi": (data.get("doi") or "").strip(),
+            "published": _iso_date(versions[0].get("created", "")) if versions else "",
+            "updated": _iso_date(data.get("update_date", "")),
+        }
+
+
+def parse_oai_dump(stream) -> Iterator[dict]:
+    """Streams ``<record>`` elements out of an OAI-PMH ``arXiv`` harvest."""
+    o = f"{{{OAI_NS}}}"
+    a = f"{{{ARXIV_OAI_NS}}}"
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        if elem.tag != f"{o}record":
+            continue
+
+        header = elem.find(f"{o}header")
+        meta = elem.find(f"{o}metadata/{a}arXiv")
+        if header is None or header.get("status") == "deleted" or meta is None:
+            elem.clear()
+            continue
+
+        authors = []
+        for author in meta.findall(f"{a}authors/{a}author"):
+            parts = [author.findtext(f"{a}forenames"), author.findtext(f"{a}keyname")]
+            authors.append(" ".join(p.strip() for p in parts if p))
+
+        yield {
+            "arxiv_id": (meta.findtext(f"{a}id") or "").strip(),
+            "latest_version": "",
+            "title": _clean(meta.findtext(f"{a}title")),
+            "authors": authors,
+            "abstract": _clean(meta.findtext(f"{a}abstract")),
+            "categories": (meta.findtext(f"{a}categories") or "").split(),
+            "doi": (meta.findtext(f"{a}doi") or "").strip(),
+            "published": _iso_date(meta.findtext(f"{a}created") or ""),
+            "updated": _iso_date(meta.findtext(f"{a}updated") or header.findtext(f"{o}datestamp") or ""),
+        }
+        # Drop the parsed subtree so memory stays flat across the file
+        elem.clear()
+
+
+def iter_dump(path: str) -> Iterator[dict]:
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".xml"):
+        with _open_dump(path, "rb") as stream:
+            yield from parse_oai_dump(stream)
+    else:
+        with _open_dump(path, "rt") as stream:
+            yield from parse_jsonl_dump(stream)
+
+
+# ==============================
+# 📥 INGESTION
+# ==============================
+
+def _write_batch(conn: sqlite3.Connection, batch: List[dict]):
+    cursor = conn.cursor()
+    # The batch's ids go into a temp table rather than one bound variable
+    # each, which would exceed SQLite's variable limit on older builds
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS batch_ids (arxiv_id TEXT PRIMARY KEY)")
+    cursor.execute("DELETE FROM batch_ids")
+    cursor.executemany("INSERT OR IGNORE INTO batch_ids (arxiv_id) VALUES (?)", [(r["arxiv_id"],) for r in batch])
+
+    # External-content FTS rows must be removed with their old values
+    # before the underlying row changes.
+    cursor.execute("""
+        INSERT INTO mirror_fts (mirror_fts, rowid, title, abstract, authors)
+        SELECT 'delete', id, title, abstract, authors
+        FROM mirror_papers WHERE arxiv_id IN (SELECT arxiv_id FROM batch_ids)
+    """)
+    cursor.execute("""
+        DELETE FROM mirror_categories WHERE paper_rowid IN (
+            SELECT id FROM mirror_papers WHERE arxiv_id IN (SELECT arxiv_id FROM batch_ids)
+        )
+    """)
+
+    cursor.executemany("""
+        INSERT INTO mirror_papers
+        (arxiv_id, latest_version, title, authors, abstract, categories, doi, published, updated)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (arxiv_id) DO UPDATE SET
+            latest_version = COALESCE(NULLIF(excluded.latest_version, ''), latest_version),
+            title = excluded.title,
+            authors = excluded.authors,
+            abstract = excluded.abstract,
+            categories = excluded.categories,
+            doi = excluded.doi,
+            published = COALESCE(NULLIF(excluded.published, ''), published),
+            updated = excluded.updated
+    """, [(
+        r["arxiv_id"], r["latest_version"], r["title"], ", ".join(r["authors"]), r["abstract"],
+        " ".join(r["categories"]), r["doi"], r["published"], r["updated"],
+    ) for r in batch])
+
+    cursor.execute("""
+        INSERT INTO mirror_fts (rowid, title, abstract, authors)
+        SELECT id, title, abstract, authors
+        FROM mirror_papers WHERE arxiv_id IN (SELECT arxiv_id FROM batch_ids)
+    """)
+
+    cursor.execute("SELECT arxiv_id, id FROM mirror_papers WHERE arxiv_id IN (SELECT arxiv_id FROM batch_ids)")
+    rowids = dict(cursor.fetchall())
+    cursor.executemany(
+        "INSERT OR IGNORE INTO mirror_categories (category, paper_rowid) VALUES (?, ?)",
+        [(category, rowids[r["arxiv_id"]]) for r in batch for category in r["categories"]]
+    )
+
+
+def ingest(db_path: str, records: Iterable[dict], batch_size: int = INGEST_BATCH_SIZE,
+           progress: bool = False) -> dict:
+    """
+    Loads records into the mirror in batched transactions. Re-ingesting a
+    record replaces it, so dumps can be applied incrementally.
+    """
+    conn = sqlite3.connect(db_path)
+    init_mirror(conn)
+    # Bulk-load settings. With WAL, synchronous=NORMAL skips most fsyncs but
+    # keeps the database consistent after an OS crash or power loss: at
+    # worst the last batches are lost, and re-running the ingest is idempotent.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -200000")
+
+    stats = {"records": 0, "skipped": 0}
+    latest = ""
+    batch = {}
+    start = time.perf_counter()
+
+    def flush():
+        with conn:
+            _write_batch(conn, list(batch.values()))
+        batch.clear()
+        if progress:
+            rate = stats["records"] / max(time.perf_counter() - start, 1e-9)
+            print(f"  {stats['records']:>10} records  {rate:>8.0f} rec/s", file=sys.stderr)
+
+    try:
+        for record in records:
+            if not record["arxiv_id"] or not record["title"]:
+                stats["skipped"] += 1
+                continue
+            # Keyed by id so a record repeated within one batch is written once
+            batch[record["arxiv_id"]] = record
+            stats["records"] += 1
+            latest = max(latest, record["updated"], record["published"])
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        with conn:
+            row = conn.execute("SELECT value FROM mirror_meta WHERE key = 'latest_date'").fetchone()
+            if not row or latest > (row[0] or ""):
+                conn.execute(
+                    "INSERT OR REPLACE INTO mirror_meta (key, value) VALUES ('latest_date', ?)", (latest,)
+                )
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+    stats["elapsed_s"] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+# ==============================
+# 🔎 QUERY ENGINE
+# ==============================
+
+class ArxivMirror:
+    """Read-only query interface over an ingested mirror database."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._complete = False
+
+    @property
+    def available(self) -> bool:
+        """
+        True once an ingest has finished: ``latest_date`` is only written
+        at the end, so a mirror still being loaded is not used.
+        """
+        if not self.db_path or not os.path.exists(self.db_path):
+            self._complete = False
+            return False
+        if not self._complete:
+            try:
+                self._complete = self.latest_date() is not None
+            except sqlite3.Error:
+                # Schema not created yet, or the first batch is still open
+                return False
+        return self._complete
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def latest_date(self) -> Optional[str]:
+        """Newest ``published``/``updated`` date in the mirror (``YYYY-MM-DD``)."""
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM mirror_meta WHERE key = 'latest_date'").fetchone()
+        conn.close()
+        return row[0] if row and row[0] else None
+
+    def search(self, query: str, limit: int = 5) -> list:
+        """
+        Ranks mirror records against ``query``. ``cat:<category>`` tokens
+        restrict results to those categories; all other words must match.
+        """
+        categories = CATEGORY_TOKEN_RE.findall(query)
+        terms = re.findall(r"\w+", CATEGORY_TOKEN_RE.sub(" ", query))
+        if not terms and not categories:
+            return []
+
+        params = []
+        if terms:
+            match = " ".join(f'"{t}"' for t in terms)
+            sql = """
+                SELECT mp.* FROM mirror_fts
+                JOIN mirror_papers mp ON mp.id = mirror_fts.rowid
+                WHERE mirror_fts MATCH ?
+            """
+            params.append(match)
+        else:
+            sql = "SELECT mp.* FROM mirror_papers mp WHERE 1 = 1"
+
+        for category in categories:
+            # Probes the (category, paper_rowid) key per candidate instead of
+            # materializing every paper in a broad category
+            sql += """ AND EXISTS (
+                SELECT 1 FROM mirror_categories mc
+                WHERE mc.category = ? AND mc.paper_rowid = mp.id
+            )"""
+            params.append(category)
+
+        # Title matches weigh more than abstract or author matches
+        sql += " ORDER BY bm25(mirror_fts, 10.0, 1.0, 2.0)" if terms else " ORDER BY mp.published DESC"
+        sql += " LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        rows = conn.execute(sql, params).fetchall()
+        conn.close()
+        return [self._to_result(row) for row in rows]
+
+    def get(self, arxiv_id: str) -> Optional[dict]:
+        """Looks up one record by arXiv id, with or without a version suffix."""
+        base_id = re.sub(r"v\d+$", "", arxiv_id)
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM mirror_papers WHERE arxiv_id = ?", (base_id,)).fetchone()
+        conn.close()
+        return self._to_result(row) if row else None
+
+    @staticmethod
+    def _to_result(row: sqlite3.Row) -> dict:
+        arxiv_id = row["arxiv_id"] + (row["latest_version"] or "")
+        return {
+            "id": arxiv_id,
+            "title": row["title"],
+            "authors": row["authors"].split(", ") if row["authors"] else [],
+            "abstract": row["abstract"] or "",
+            "publication_date": (row["published"] or "")[:4],
+            "doi": f"https://arxiv.org/abs/{arxiv_id}",
+            "pdf_url": f"https://arxiv.org/pdf/{arxiv_id}.pdf",
+        }
+
+
+# ==============================
+# 🖥️ CLI
+# ==============================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("ARXIV_MIRROR_PATH", "arxiv_mirror.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest_cmd = sub.add_parser("ingest", help="load one or more dump files")
+    ingest_cmd.add_argument("files", nargs="+")
+    ingest_cmd.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+
+    search_cmd = sub.add_parser("search", help="query the mirror")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--limit", type=int, default=10)
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        for path in args.files:
+            print(f"Ingesting {path}", file=sys.stderr)
+            stats = ingest(args.db, iter_dump(path), args.batch_size, progress=True)
+            print(json.dumps({"file": path, **stats}))
+    else:
+        start = time.perf_counter()
+        results = ArxivMirror(args.db).search(args.query, args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for r in results:
+            print(f"{r['id']:<18} {r['publication_date']}  {r['title']}")
+        print(f"{len(results)} result(s) in {elapsed_ms:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Ingestion and query benchmark for the offline arXiv mirror.
+
+Writes a synthetic dump in the arXiv metadata snapshot format, ingests it
+and then times a mix of keyword and category queries.
+
+Usage:
+    python benchmarks/bench_arxiv_mirror.py --count 2000000 --queries 500
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arxiv_mirror
+from common import summarize_latencies, write_results
+
+CATEGORIES = ["cs.LG", "cs.CL", "cs.CV", "cs.AI", "stat.ML", "math.OC", "hep-th", "quant-ph"]
+
+# Zipf-distributed synthetic vocabulary, so term selectivity resembles real
+# abstracts instead of every query matching every record.
+VOCABULARY = [f"term{i}" for i in range(30000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+# Queries use mid-frequency terms, like typical topical keywords
+QUERY_TERMS = VOCABULARY[50:3000]
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=n))
+
+
+def write_dump(path: str, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            year = 2007 + i * 18 // count
+            title = _words(rng, 8)
+            abstract = _words(rng, 150)
+            f.write(json.dumps({
+                "id": f"{year % 100:02d}{rng.randint(1, 12):02d}.{i % 100000:05d}",
+                "authors": "A. Author, B. Writer",
+                "title": title,
+                "categories": " ".join(rng.sample(CATEGORIES, rng.randint(1, 3))),
+                "abstract": abstract,
+                "doi": None,
+                "versions": [{"version": "v1", "created": "Mon, 2 Apr 2007 19:18:42 GMT"}],
+                "update_date": f"{year}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+                "authors_parsed": [["Author", "A.", ""], ["Writer", "B.", ""]],
+            }) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=arxiv_mirror.INGEST_BATCH_SIZE)
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        dump_path = os.path.join(tmp, "dump.jsonl")
+        db_path = os.path.join(tmp, "mirror.db")
+        write_dump(dump_path, args.count)
+
+        stats = arxiv_mirror.ingest(db_path, arxiv_mirror.iter_dump(dump_path), args.batch_size)
+        rate = stats["records"] / stats["elapsed_s"]
+        print(f"ingest   {stats['records']:>10} records  {stats['elapsed_s']:8.2f}s  {rate:>9.0f} rec/s")
+        results.append({"operation": "ingest", "records": stats["records"],
+                        "elapsed_s": stats["elapsed_s"], "records_per_s": round(rate, 1)})
+
+        mirror = arxiv_mirror.ArxivMirror(db_path)
+        rng = random.Random(11)
+        query_sets = {
+            "keyword": lambda: " ".join(rng.sample(QUERY_TERMS, 2)),
+            "keyword+category": lambda: f"{rng.choice(QUERY_TERMS)} cat:{rng.choice(CATEGORIES)}",
+        }
+        for label, make_query in query_sets.items():
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(args.queries):
+                q_start = time.perf_counter()
+                mirror.search(make_query(), limit=5)
+                latencies.append(time.perf_counter() - q_start)
+            summary = summarize_latencies(latencies, time.perf_counter() - start)
+            print(f"{label:<18} p50 {summary['p50_ms']:7.2f} ms  p95 {summary['p95_ms']:7.2f} ms  "
+                  f"p99 {summary['p99_ms']:7.2f} ms")
+            results.append({"operation": f"query {label}", **summary})
+
+    path = write_results("arxiv_mirror", vars(args), results, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Event-loop blocking benchmark for the async database gateway.
+
+Seeds a library and builds two copies of a small ``async def`` API over
+the app's own query helpers:
+
+- blocking: the handlers call ``sqlite3`` directly, as the async endpoints
+  used to,
+- gateway: the handlers await ``db_gateway.DatabaseGateway``.
+
+Each copy serves a health check, the paper list and a deliberately slow
+query. While ``--slow-clients`` clients keep slow queries in flight, a probe
+client measures the latency of the health check and the paper list. Rows
+without slow load give the baseline. With the gateway, probe latency
+should stay close to the baseline; when blocking, it grows to roughly one
+slow query.
+
+Usage:
+    python benchmarks/bench_db_gateway.py --size 10000 --slow-ms 500 --probes 200
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import uvicorn
+from fastapi import FastAPI
+
+import db_gateway
+from common import summarize_latencies, write_results
+from run_load import _free_port
+from seed import MOCK_USER_ID, seed_library
+
+SLOW_QUERY = """
+    WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter WHERE x < ?)
+    SELECT sum(x) FROM counter
+"""
+
+
+def calibrate_slow_query(db_path: str, target_ms: float) -> int:
+    """Picks a recursion depth that makes ``SLOW_QUERY`` take about ``target_ms``."""
+    conn = sqlite3.connect(db_path)
+    rows = 100_000
+    start = time.perf_counter()
+    conn.execute(SLOW_QUERY, (rows,)).fetchone()
+    per_row = (time.perf_counter() - start) / rows
+    conn.close()
+    return max(int(target_ms / 1000 / per_row), 1)
+
+
+def build_app(main, slow_rows: int, gateway) -> FastAPI:
+    def slow_query():
+        conn = sqlite3.connect(main.DB_PATH)
+        conn.execute(SLOW_QUERY, (slow_rows,)).fetchone()
+        conn.close()
+
+    app = FastAPI()
+
+    if gateway is None:
+        @app.get("/health")
+        async def health():
+            return {"status": "healthy"}
+
+        @app.get("/api/papers")
+        async def papers(reading_list_id: int = None):
+            return {"papers": main.get_user_papers(MOCK_USER_ID, reading_list_id)}
+
+        @app.get("/slow")
+        async def slow():
+            slow_query()
+            return {"success": True}
+    else:
+        @app.get("/health")
+        async def health():
+            return {"status": "healthy"}
+
+        @app.get("/api/papers")
+        async def papers(reading_list_id: int = None):
+            return {"papers": await gateway.read(main.get_user_papers, MOCK_USER_ID, reading_list_id)}
+
+        @app.get("/slow")
+        async def slow():
+            await gateway.read(slow_query)
+            return {"success": True}
+
+    return app
+
+
+class Server:
+    """Serves an app with uvicorn on a background thread, over a real socket."""
+
+    def __init__(self, app: FastAPI):
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def measure(base_url: str, path: str, params: dict, probes: int, slow_clients: int) -> dict:
+    stop = threading.Event()
+
+    def slow_loop():
+        with requests.Session() as session:
+            while not stop.is_set():
+                session.get(f"{base_url}/slow", timeout=120)
+
+    slow_threads = [threading.Thread(target=slow_loop) for _ in range(slow_clients)]
+    for thread in slow_threads:
+        thread.start()
+    # Let the slow queries get going before probing
+    time.sleep(0.05 if slow_clients else 0)
+
+    latencies = []
+    with requests.Session() as session:
+        start = time.perf_counter()
+        for _ in range(probes):
+            t0 = time.perf_counter()
+            session.get(f"{base_url}{path}", params=params, timeout=120)
+            latencies.append(time.perf_counter() - t0)
+            # Spread probes out so they land at different points of a slow query
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+
+    stop.set()
+    for thread in slow_threads:
+        thread.join()
+    return summarize_latencies(latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10000, help="library size to seed")
+    parser.add_argument("--slow-ms", type=float, default=500.0, help="duration of one slow query")
+    parser.add_argument("--slow-clients", type=int, default=2, help="slow queries kept in flight")
+    parser.add_argument("--read-workers", type=int, default=8)
+    parser.add_argument("--probes", type=int, default=100, help="probe requests per row")
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "papers.db")
+        ids = seed_library(db_path, args.size)
+        import main as api
+
+        api.DB_PATH = db_path
+        slow_rows = calibrate_slow_query(db_path, args.slow_ms)
+        list_params = {"reading_list_id": ids["list_ids"][0]}
+
+        print(f"{'mode':<10}{'probe':<14}{'slow load':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for mode in ("blocking", "gateway"):
+            gateway = db_gateway.DatabaseGateway(read_workers=args.read_workers) if mode == "gateway" else None
+            with Server(build_app(api, slow_rows, gateway)) as server:
+                for path, params in (("/health", {}), ("/api/papers", list_params)):
+                    for slow_clients in (0, args.slow_clients):
+                        stats = measure(server.base_url, path, params, args.probes, slow_clients)
+                        row = {"mode": mode, "probe": path, "slow_clients": slow_clients, **stats}
+                        if gateway is not None:
+                            row["pools"] = gateway.snapshot()
+                        results.append(row)
+                        print(f"{mode:<10}{path:<14}{slow_clients:>10}{stats['p50_ms']:>10}"
+                              f"{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+            if gateway is not None:
+                pool = gateway.snapshot()["read"]
+                print(f"gateway read pool: max queue depth {pool['max_queue_depth']}, "
+                      f"wait p99 {pool.get('wait_p99_ms', 0)} ms")
+                gateway.shutdown()
+        api.db.shutdown()
+
+    path = write_results("db_gateway", vars(args), results, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
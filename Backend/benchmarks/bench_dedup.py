@@ -0,0 +1,153 @@
+"""
+Insert-time duplicate detection benchmark.
+
+Builds a synthetic library of ``--count`` indexed papers, then times the
+save path (``find_duplicate`` + insert + ``index_paper``) for a mix of
+fresh papers, lightly edited copies of existing papers and new arXiv
+versions. Reports latency percentiles and detection recall / false
+positive counts, so lookups can be checked to stay flat as the library grows.
+
+Usage:
+    python benchmarks/bench_dedup.py --count 1000000 --lookups 2000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dedup
+from common import summarize_latencies, write_results
+
+USER_ID = "bench_user"
+VOCABULARY = [f"term{i}" for i in range(30000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+
+def _words(rng: random.Random, n: int) -> list:
+    return rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=n)
+
+
+def _paper(rng: random.Random, i: int) -> dict:
+    return {
+        "id": f"{2100 + i // 100000}.{i % 100000:05d}v1",
+        "title": " ".join(_words(rng, 8)),
+        "abstract": " ".join(_words(rng, 150)),
+    }
+
+
+def _edit(rng: random.Random, paper: dict) -> dict:
+    """Copy of a paper with a couple of words changed, as a re-upload would have."""
+    words = paper["abstract"].split()
+    for _ in range(2):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return {"id": f"copy-{paper['id']}", "title": paper["title"], "abstract": " ".join(words)}
+
+
+def create_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE saved_papers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            paper_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            abstract TEXT,
+            user_id TEXT NOT NULL
+        )
+    """)
+    dedup.init_dedup_tables(conn)
+    conn.commit()
+
+
+def insert(conn: sqlite3.Connection, paper: dict, signature=None) -> int:
+    cursor = conn.execute(
+        "INSERT INTO saved_papers (paper_id, title, abstract, user_id) VALUES (?, ?, ?, ?)",
+        (paper["id"], paper["title"], paper["abstract"], USER_ID)
+    )
+    dedup.index_paper(conn, cursor.lastrowid, USER_ID, paper["id"], paper["title"], paper["abstract"], signature)
+    return cursor.lastrowid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        conn.execute("PRAGMA journal_mode=WAL")
+        create_schema(conn)
+
+        # Keep a sample of indexed papers to derive duplicates from
+        sample = []
+        start = time.perf_counter()
+        with conn:
+            for i in range(args.count):
+                paper = _paper(rng, i)
+                insert(conn, paper)
+                if len(sample) < args.lookups:
+                    sample.append(paper)
+                elif rng.random() < args.lookups / (i + 1):
+                    sample[rng.randrange(args.lookups)] = paper
+        build_s = time.perf_counter() - start
+        print(f"indexed {args.count} papers in {build_s:.1f}s ({args.count / build_s:.0f}/s)")
+        results.append({
+            "operation": "bulk index",
+            "library_size": args.count,
+            "records": args.count,
+            "elapsed_s": round(build_s, 3),
+            "records_per_s": round(args.count / build_s, 1),
+        })
+
+        kinds = {
+            "fresh": lambda n: _paper(rng, args.count + n),
+            "near_duplicate": lambda n: _edit(rng, sample[n % len(sample)]),
+            "version": lambda n: {**sample[n % len(sample)], "id": sample[n % len(sample)]["id"][:-1] + "2"},
+        }
+        for kind, make in kinds.items():
+            latencies = []
+            detected = 0
+            start = time.perf_counter()
+            for n in range(args.lookups):
+                paper = make(n)
+                t0 = time.perf_counter()
+                with conn:
+                    signature = dedup.compute_signature(paper["title"], paper["abstract"])
+                    match = dedup.find_duplicate(conn, USER_ID, paper["id"], paper["title"],
+                                                 paper["abstract"], signature)
+                    saved_id = insert(conn, paper, signature)
+                latencies.append(time.perf_counter() - t0)
+                if match:
+                    detected += 1
+                # Remove it again so every lookup sees the same library
+                with conn:
+                    dedup.unindex_paper(conn, saved_id)
+                    conn.execute("DELETE FROM saved_papers WHERE id = ?", (saved_id,))
+            row = {"operation": f"save {kind}", "library_size": args.count,
+                   **summarize_latencies(latencies, time.perf_counter() - start)}
+            if kind == "fresh":
+                row["false_positives"] = detected
+            else:
+                row["recall"] = round(detected / args.lookups, 4)
+            results.append(row)
+            print(f"save {kind:<15} p50 {row['p50_ms']:7.2f}ms  p95 {row['p95_ms']:7.2f}ms  "
+                  f"p99 {row['p99_ms']:7.2f}ms  detected {detected}/{args.lookups}")
+        conn.close()
+
+    path = write_results("dedup", vars(args), results, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
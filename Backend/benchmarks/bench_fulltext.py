@@ -0,0 +1,108 @@
+"""
+Throughput benchmark for the full-text ingestion pipeline.
+
+Runs extraction, chunking and indexing over local PDFs (no network) for
+each worker count and reports papers/minute. Pass ``--pdf-dir`` to use real
+papers; otherwise synthetic multi-page PDFs are generated.
+
+Usage:
+    python benchmarks/bench_fulltext.py --pdf-dir ~/papers --workers 1,2,4,8
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fulltext
+from common import build_synthetic_pdf, write_results
+
+USER_ID = "bench_user"
+
+
+def write_synthetic_pdf(path: str, pages: int, seed: int):
+    with open(path, "wb") as f:
+        f.write(build_synthetic_pdf(pages, seed))
+
+
+def run(pdfs: list, workers: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(db_path)
+        fulltext.init_fulltext_tables(conn)
+        conn.commit()
+        conn.close()
+
+        pipeline = fulltext.FullTextPipeline(db_path, cache_dir=os.path.join(tmp, "cache"), workers=workers)
+        os.makedirs(pipeline.cache_dir)
+        paper_ids = []
+        for i, src in enumerate(pdfs):
+            paper_id = f"bench.{i:05d}"
+            shutil.copy(src, pipeline.pdf_path(paper_id))
+            paper_ids.append(paper_id)
+
+        # Start the worker processes before timing so spawn cost is excluded
+        process_pool, _ = pipeline._pools()
+        list(process_pool.map(abs, range(workers)))
+
+        start = time.perf_counter()
+        for paper_id in paper_ids:
+            pipeline.enqueue(USER_ID, paper_id)
+        pipeline.shutdown(wait=True)
+        elapsed = time.perf_counter() - start
+
+        conn = sqlite3.connect(db_path)
+        indexed = conn.execute(
+            "SELECT COUNT(*) FROM paper_fulltext_jobs WHERE status = ?", (fulltext.STATUS_INDEXED,)
+        ).fetchone()[0]
+        conn.close()
+        assert indexed == len(paper_ids), f"only {indexed}/{len(paper_ids)} papers indexed"
+        return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-dir", help="directory of sample PDFs (default: generate synthetic ones)")
+    parser.add_argument("--papers", type=int, default=40, help="number of synthetic PDFs to generate")
+    parser.add_argument("--pages", type=int, default=12, help="pages per synthetic PDF")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as sample_dir:
+        if args.pdf_dir:
+            pdfs = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+        else:
+            pdfs = []
+            for i in range(args.papers):
+                path = os.path.join(sample_dir, f"sample_{i}.pdf")
+                write_synthetic_pdf(path, args.pages, seed=i)
+                pdfs.append(path)
+        if not pdfs:
+            sys.exit("No PDFs found")
+
+        print(f"{len(pdfs)} papers, {os.cpu_count()} CPUs")
+        results = []
+        for workers in [int(w) for w in args.workers.split(",")]:
+            elapsed = run(pdfs, workers)
+            papers_per_min = len(pdfs) / elapsed * 60
+            print(f"workers={workers:<3} {elapsed:7.2f}s  {papers_per_min:8.1f} papers/min")
+            results.append({
+                "workers": workers,
+                "papers": len(pdfs),
+                "elapsed_s": round(elapsed, 3),
+                "papers_per_min": round(papers_per_min, 1),
+            })
+
+    path = write_results("fulltext", vars(args), results, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
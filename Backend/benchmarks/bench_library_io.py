@@ -0,0 +1,162 @@
+"""
+Throughput benchmark for streaming library import/export.
+
+Generates a synthetic JSONL library on disk, imports it into a scratch
+database, then exports it in every format. Peak Python heap usage is
+reported alongside throughput to show memory stays flat with size. It is
+measured in a second run of each operation, since tracing allocations
+slows Python code down several-fold.
+
+Usage:
+    python benchmarks/bench_library_io.py --count 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dedup
+import library_io
+from common import write_results
+
+USER_ID = "bench_user"
+RESULTS = []
+
+VOCABULARY = [
+    "graph", "neural", "network", "transformer", "attention", "retrieval", "index", "latency",
+    "throughput", "sparse", "dense", "embedding", "federated", "privacy", "diffusion", "sampling",
+    "gradient", "convex", "kernel", "bandit", "policy", "reward", "compiler", "cache", "shard",
+    "query", "planner", "benchmark", "dataset", "robust", "adversarial", "causal", "inference",
+]
+
+
+def create_schema(db_path: str):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS saved_papers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            paper_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            authors TEXT NOT NULL,
+            abstract TEXT,
+            publication_date TEXT,
+            doi TEXT,
+            user_id TEXT NOT NULL,
+            reading_list_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_saved_papers_user_paper ON saved_papers (user_id, paper_id)")
+    # Imports check for and index near-duplicates
+    dedup.init_dedup_tables(conn)
+    conn.commit()
+    conn.close()
+
+
+def reset_db(db_path: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    create_schema(db_path)
+
+
+def copy_db(src_path: str, dst_path: str):
+    reset_db(dst_path)
+    src, dst = sqlite3.connect(src_path), sqlite3.connect(dst_path)
+    src.backup(dst)
+    src.close()
+    dst.close()
+
+
+def write_sample_file(path: str, count: int):
+    rng = random.Random(42)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            # Distinct abstracts, so near-duplicate checks see realistic candidates
+            abstract = " ".join(rng.choice(VOCABULARY) for _ in range(60))
+            f.write(json.dumps({
+                "id": f"{2100 + i // 100000}.{i % 100000:05d}",
+                "title": f"Synthetic paper number {i} on scalable systems",
+                "authors": [f"Author {i % 97}", f"Coauthor {i % 89}"],
+                "abstract": f"Record {i}. {abstract}.",
+                "publication_date": str(2000 + i % 25),
+                "doi": f"https://arxiv.org/abs/{2100 + i // 100000}.{i % 100000:05d}",
+            }) + "\n")
+
+
+def measure(label: str, count: int, fn, setup=None):
+    """
+    Times ``fn``, then runs it again under tracemalloc for its peak heap.
+    ``setup`` restores the starting state before each run.
+    """
+    if setup:
+        setup()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<16} {count:>10} records  {elapsed:8.2f}s  "
+          f"{count / elapsed:>10.0f} rec/s  peak heap {peak / 1024 / 1024:6.1f} MiB")
+    RESULTS.append({
+        "operation": label,
+        "records": count,
+        "elapsed_s": round(elapsed, 3),
+        "records_per_s": round(count / elapsed, 1),
+        "peak_heap_mib": round(peak / 1024 / 1024, 2),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        imported_path = os.path.join(tmp, "imported.db")
+        sample_path = os.path.join(tmp, "sample.jsonl")
+        write_sample_file(sample_path, args.count)
+
+        def run_import():
+            with open(sample_path, encoding="utf-8") as f:
+                return library_io.import_papers(db_path, f, "jsonl", USER_ID)
+
+        stats = measure("import jsonl", args.count, run_import, setup=lambda: reset_db(db_path))
+        assert stats["imported"] == args.count, stats
+        copy_db(db_path, imported_path)
+
+        # Re-importing the same file exercises the dedup path only
+        stats = measure("re-import dedup", args.count, run_import,
+                        setup=lambda: copy_db(imported_path, db_path))
+        assert stats["skipped"] == args.count, stats
+
+        for fmt in library_io.FORMATTERS:
+            def run_export():
+                with open(os.devnull, "w") as sink:
+                    for chunk in library_io.stream_export(library_io.iter_saved_papers(db_path, USER_ID), fmt):
+                        sink.write(chunk)
+
+            measure(f"export {fmt}", args.count, run_export)
+
+    path = write_results("library_io", vars(args), RESULTS, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
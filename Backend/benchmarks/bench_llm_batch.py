@@ -0,0 +1,113 @@
+"""
+Batched citation and related-paper benchmark against the Gemini stub.
+
+Generates citations for a synthetic reading list in several formats, once
+with one call per paper and format (the old path) and once through
+``llm_batch.batch_citations`` at a few token budgets. Reports model
+calls, wall time and how many retries truncated responses caused. A
+related-papers pass shows the same for candidate sets.
+
+Usage:
+    python benchmarks/bench_llm_batch.py --papers 200 --formats APA,MLA,BibTeX --latency-ms 400
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+
+import llm_batch
+from common import WORDS, write_results
+from stubs import FaultProfile, GeminiStub
+
+
+def synthetic_papers(count: int, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    papers = []
+    for i in range(count):
+        papers.append({
+            "id": f"2401.{i:05d}v1",
+            "title": " ".join(rng.choice(WORDS) for _ in range(9)).capitalize(),
+            "authors": [f"Author {rng.randint(1, 999)}" for _ in range(rng.randint(1, 8))],
+            "abstract": " ".join(rng.choice(WORDS) for _ in range(rng.randint(120, 260))),
+            "publication_date": str(rng.randint(2010, 2025)),
+            "doi": f"https://arxiv.org/abs/2401.{i:05d}v1",
+        })
+    return papers
+
+
+def make_complete(stub: GeminiStub):
+    genai.configure(api_key="bench", transport="rest", client_options={"api_endpoint": stub.url})
+    model = genai.GenerativeModel("gemini-flash-latest")
+
+    def complete(prompt: str) -> str:
+        return model.generate_content(prompt).text
+
+    return complete
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--papers", type=int, default=200)
+    parser.add_argument("--formats", default="APA,MLA,BibTeX")
+    parser.add_argument("--budgets", default="2000,6000,20000", help="comma-separated prompt token budgets")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="simulated model latency per call")
+    parser.add_argument("--malformed-rate", type=float, default=0.1,
+                        help="fraction of batched answers the stub truncates")
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",")]
+    papers = synthetic_papers(args.papers)
+    results = []
+
+    def record(row: dict):
+        results.append(row)
+        print(f"{row['operation']:<34} calls {row['calls']:>5}  retries {row.get('retries', 0):>3}  "
+              f"failed {row.get('failed', 0):>3}  {row['elapsed_s']:8.2f}s")
+
+    with GeminiStub(FaultProfile(latency_ms=args.latency_ms), malformed_rate=args.malformed_rate) as stub:
+        complete = make_complete(stub)
+
+        # One call per paper and format, as /api/papers/{id}/citation does
+        start = time.perf_counter()
+        for paper in papers[:max(args.papers // 10, 1)]:
+            for fmt in formats:
+                complete(f"Generate a citation in {fmt} format.\nTitle: {paper['title']}\n")
+        sample_elapsed = time.perf_counter() - start
+        scale = args.papers / max(args.papers // 10, 1)
+        record({"operation": "citations, one call each (extrap.)", "papers": args.papers,
+                "formats": len(formats), "calls": args.papers * len(formats),
+                "elapsed_s": round(sample_elapsed * scale, 2)})
+
+        for budget in [int(b) for b in args.budgets.split(",")]:
+            start = time.perf_counter()
+            output, stats = llm_batch.batch_citations(
+                [(paper, formats) for paper in papers], complete, prompt_budget=budget
+            )
+            elapsed = time.perf_counter() - start
+            missing = sum(1 for per_paper in output for citation in per_paper.values() if citation is None)
+            assert missing == stats["failed"], (missing, stats)
+            record({"operation": f"citations, batched budget={budget}", "papers": args.papers,
+                    "formats": len(formats), "prompt_budget": budget, **stats,
+                    "elapsed_s": round(elapsed, 2)})
+
+        target, candidates = papers[0], papers[1:]
+        for budget in [int(b) for b in args.budgets.split(",")]:
+            start = time.perf_counter()
+            related, stats = llm_batch.batch_related(target, candidates, complete, prompt_budget=budget)
+            elapsed = time.perf_counter() - start
+            record({"operation": f"related, batched budget={budget}", "papers": len(candidates),
+                    "prompt_budget": budget, **stats, "elapsed_s": round(elapsed, 2)})
+
+    path = write_results("llm_batch", vars(args), results, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
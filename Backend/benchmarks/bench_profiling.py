@@ -0,0 +1,154 @@
+"""
+Overhead benchmark for the profiling middleware.
+
+Measures, per request and per ``stage()`` call:
+
+- a bare ASGI app, with and without ``ProfilingMiddleware`` in front of it,
+  with profiling disabled, sampling at ``--sample-rate`` and forced on by
+  header,
+- ``profiling.stage()`` blocks with no active profile and inside one,
+- full FastAPI requests through an in-process HTTP client, with and
+  without the middleware.
+
+The disabled rows should sit within noise of the baselines.
+
+Usage:
+    python benchmarks/bench_profiling.py --calls 200000 --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+import profiling
+from common import summarize_latencies, write_results
+
+SCOPE = {"type": "http", "method": "GET", "path": "/health",
+         "headers": [(b"host", b"bench"), (b"user-agent", b"bench"), (b"accept", b"*/*")]}
+BENCH_TOKEN = "bench"
+PROFILED_SCOPE = {**SCOPE, "headers": SCOPE["headers"] + [(profiling.PROFILE_HEADER, BENCH_TOKEN.encode())]}
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def time_asgi(app, scope, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        await app(scope, _receive, _send)
+    return time.perf_counter() - start
+
+
+def time_stages(calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        with profiling.stage("bench"):
+            pass
+    return time.perf_counter() - start
+
+
+def build_fastapi(middleware_kwargs=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    if middleware_kwargs is not None:
+        app.add_middleware(profiling.ProfilingMiddleware, **middleware_kwargs)
+    return app
+
+
+async def time_http(app, requests: int, headers=None) -> dict:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get("/health", headers=headers)
+        start = time.perf_counter()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            await client.get("/health", headers=headers)
+            latencies.append(time.perf_counter() - t0)
+    return summarize_latencies(latencies, time.perf_counter() - start)
+
+
+async def run(args) -> list:
+    results = []
+
+    def per_call(label: str, elapsed: float, calls: int, baseline: float = None):
+        ns = elapsed / calls * 1e9
+        row = {"layer": "asgi" if "stage" not in label else "stage", "mode": label,
+               "calls": calls, "ns_per_call": round(ns, 1)}
+        if baseline is not None:
+            row["overhead_ns"] = round(ns - baseline, 1)
+        results.append(row)
+        extra = f"  (+{row['overhead_ns']:.0f} ns)" if baseline is not None else ""
+        print(f"{label:<36} {ns:10.0f} ns/call{extra}")
+        return ns
+
+    buffer = profiling.SlowRequestBuffer(capacity=10)
+    disabled = profiling.ProfilingMiddleware(bare_app, buffer)
+    sampled = profiling.ProfilingMiddleware(bare_app, buffer, sample_rate=args.sample_rate)
+    forced = profiling.ProfilingMiddleware(bare_app, buffer, token=BENCH_TOKEN)
+
+    base = per_call("bare app", await time_asgi(bare_app, SCOPE, args.calls), args.calls)
+    per_call("middleware, disabled", await time_asgi(disabled, SCOPE, args.calls), args.calls, base)
+    per_call(f"middleware, sampling {args.sample_rate:g}",
+             await time_asgi(sampled, SCOPE, args.calls), args.calls, base)
+    profiled_calls = max(args.calls // 100, 1)
+    per_call("middleware, header (profiled)",
+             await time_asgi(forced, PROFILED_SCOPE, profiled_calls), profiled_calls, base)
+
+    per_call("stage(), no profile", time_stages(args.calls), args.calls)
+    profile = profiling.RequestProfile("GET", "/bench", "bench")
+    token = profiling._current_profile.set(profile)
+    per_call("stage(), profiled", time_stages(args.calls), args.calls)
+    profiling._current_profile.reset(token)
+
+    apps = {
+        "fastapi, no middleware": (build_fastapi(), None),
+        "fastapi, middleware disabled": (build_fastapi({"buffer": buffer}), None),
+        "fastapi, header (profiled)": (build_fastapi({"buffer": buffer, "token": BENCH_TOKEN}),
+                                       {"X-Profile": BENCH_TOKEN}),
+    }
+    for label, (app, headers) in apps.items():
+        stats = await time_http(app, args.requests, headers)
+        results.append({"layer": "http", "mode": label, **stats})
+        print(f"{label:<36} p50 {stats['p50_ms']:6.3f}ms  p99 {stats['p99_ms']:6.3f}ms  "
+              f"{stats['throughput_rps']:>9.0f} req/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    path = write_results("profiling", vars(args), results, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
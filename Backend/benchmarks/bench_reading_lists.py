@@ -0,0 +1,125 @@
+"""
+Reading-list view benchmark for users with many lists.
+
+Seeds libraries of several sizes for a user with ``--lists`` reading lists
+and times:
+
+- the list view, both the old ``LEFT JOIN ... GROUP BY`` aggregate and the
+  trigger-maintained summary read,
+- saving a paper into a list and moving papers between lists (trigger cost),
+- deleting a list,
+- a full consistency check after the churn, which must find no drift.
+
+Usage:
+    python benchmarks/bench_reading_lists.py --sizes 10000,100000 --lists 1000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import list_summaries
+from common import summarize_latencies, write_results
+from seed import MOCK_USER_ID, seed_library
+
+# get_all_reading_lists before the summary table existed
+LEGACY_QUERY = """
+    SELECT rl.*, COUNT(sp.id) as paper_count
+    FROM reading_lists rl
+    LEFT JOIN saved_papers sp ON rl.id = sp.reading_list_id
+    WHERE rl.user_id = ?
+    GROUP BY rl.id
+    ORDER BY rl.created_at DESC
+"""
+
+
+def timed(count: int, fn) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    return summarize_latencies(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated library sizes")
+    parser.add_argument("--lists", type=int, default=1000)
+    parser.add_argument("--reads", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            db_path = os.path.join(tmp, f"lists-{size}.db")
+            ids = seed_library(db_path, size, lists=args.lists)
+            list_ids = ids["list_ids"]
+            rng = random.Random(size)
+            conn = sqlite3.connect(db_path)
+
+            def record(operation: str, stats: dict):
+                row = {"operation": operation, "library_size": size, "lists": args.lists, **stats}
+                results.append(row)
+                print(f"{size:>8} papers  {operation:<22} p50 {row['p50_ms']:8.2f}ms  "
+                      f"p95 {row['p95_ms']:8.2f}ms  p99 {row['p99_ms']:8.2f}ms")
+
+            record("list view (aggregate)", timed(
+                args.reads, lambda i: conn.execute(LEGACY_QUERY, (MOCK_USER_ID,)).fetchall()))
+            record("list view (summary)", timed(
+                args.reads, lambda i: list_summaries.list_summaries(conn, MOCK_USER_ID)))
+
+            def save(i):
+                with conn:
+                    conn.execute("""
+                        INSERT INTO saved_papers (paper_id, title, authors, user_id, reading_list_id)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, (f"bench-{i}", f"Benchmark paper {i}", "Bench Author", MOCK_USER_ID,
+                          rng.choice(list_ids)))
+
+            record("save into list", timed(args.writes, save))
+
+            paper_rows = [row[0] for row in conn.execute(
+                "SELECT id FROM saved_papers WHERE user_id = ? AND reading_list_id IS NOT NULL", (MOCK_USER_ID,))]
+
+            def move(i):
+                with conn:
+                    conn.execute("UPDATE saved_papers SET reading_list_id = ? WHERE id = ?",
+                                 (rng.choice(list_ids), rng.choice(paper_rows)))
+
+            record("move between lists", timed(args.writes, move))
+
+            doomed = rng.sample(list_ids, min(len(list_ids) // 10, args.reads))
+
+            def delete_list(i):
+                with conn:
+                    conn.execute("DELETE FROM reading_lists WHERE id = ?", (doomed[i],))
+                    conn.execute("UPDATE saved_papers SET reading_list_id = NULL WHERE reading_list_id = ?",
+                                 (doomed[i],))
+
+            record("delete list", timed(len(doomed), delete_list))
+
+            start = time.perf_counter()
+            problems = list_summaries.check_summaries(conn)
+            check_s = time.perf_counter() - start
+            print(f"{size:>8} papers  consistency check      {check_s:8.2f}s  {len(problems)} mismatch(es)")
+            results.append({"operation": "consistency check", "library_size": size, "lists": args.lists,
+                            "elapsed_s": round(check_s, 3), "mismatches": len(problems)})
+            conn.close()
+            assert not problems, problems[:5]
+
+    path = write_results("reading_lists", vars(args), results, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Upstream outage drill: the API under load while arXiv and Gemini go down.
+
+Seeds a library, starts the API against the arXiv and Gemini stubs and
+keeps a fixed number of clients busy on SQLite-only endpoints and on
+upstream-backed endpoints through three phases:
+
+- healthy: the stubs answer normally (this also warms the fallback caches),
+- outage: every stub request hangs for ``--hang-ms`` and then fails,
+- recovery: the stubs answer normally again.
+
+Per phase and scenario it reports p50/p99 latency, status counts and how
+many answers were degraded (cached or local). Circuit breaker states from
+``/api/admin/dependencies`` are polled throughout, so the open -> half-open
+-> closed cycle shows up in the timeline.
+
+``--baseline`` raises the timeouts, concurrency caps and failure thresholds
+far enough that the guards never trigger, for comparison.
+
+Usage:
+    python benchmarks/bench_resilience.py --phase-seconds 20 --upstream-clients 12
+    python benchmarks/bench_resilience.py --baseline
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from common import summarize_latencies, write_results
+from run_load import ADMIN_TOKEN, SCENARIOS, ScenarioContext, _with_timeout, fixture_papers, start_api, stop_api
+from seed import seed_library
+from stubs import ArxivStub, FaultProfile, GeminiStub
+
+LOCAL_SCENARIOS = ["list_papers", "reading_lists", "paper_detail"]
+UPSTREAM_SCENARIOS = ["search", "citation", "related", "download_pdf"]
+
+BASELINE_ENV = {
+    f"{prefix}_{name}": value
+    for prefix in ("ARXIV_API", "ARXIV_PDF", "GEMINI")
+    for name, value in (("TIMEOUT_SECONDS", "600"), ("MAX_CONCURRENT", "1000"),
+                        ("FAILURE_THRESHOLD", "1000000"))
+}
+BASELINE_ENV.update({"REQUEST_DEADLINE_SECONDS": "600", "REQUEST_DEADLINE_MAX_SECONDS": "600"})
+
+
+def _is_degraded(response: requests.Response) -> bool:
+    if response.headers.get("X-Degraded"):
+        return True
+    if response.headers.get("Content-Type", "").startswith("application/json"):
+        try:
+            body = response.json()
+        except ValueError:
+            return False
+        return isinstance(body, dict) and bool(body.get("degraded"))
+    return False
+
+
+class PhaseRecorder:
+    """Latencies, statuses and degraded counts per (phase, scenario)."""
+
+    def __init__(self):
+        self.phase = None
+        self.phase_started = 0.0
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    def start_phase(self, name: str):
+        with self._lock:
+            self.phase = name
+            self.phase_started = time.perf_counter()
+
+    def record(self, scenario: str, elapsed: float, status: str, degraded: bool):
+        with self._lock:
+            row = self.rows.setdefault((self.phase, scenario), {
+                "latencies": [], "statuses": {}, "degraded": 0, "first_full_s": None,
+            })
+            row["latencies"].append(elapsed)
+            row["statuses"][status] = row["statuses"].get(status, 0) + 1
+            row["degraded"] += int(degraded)
+            if status.startswith("2") and not degraded and row["first_full_s"] is None:
+                row["first_full_s"] = round(time.perf_counter() - self.phase_started, 2)
+
+
+def client_loop(name: str, ctx: ScenarioContext, recorder: PhaseRecorder, stop: threading.Event,
+                timeout: float, deadline_header: str):
+    session = requests.Session()
+    session.request = _with_timeout(session.request, timeout)
+    if deadline_header:
+        session.headers["X-Request-Timeout"] = deadline_header
+    scenario = SCENARIOS[name]
+    i = 0
+    while not stop.is_set():
+        i += 1
+        start = time.perf_counter()
+        degraded = False
+        try:
+            response = scenario(session, ctx, i)
+            status = str(response.status_code)
+            degraded = _is_degraded(response)
+        except requests.RequestException:
+            status = "client_timeout"
+        recorder.record(name, time.perf_counter() - start, status, degraded)
+
+
+def poll_dependencies(base_url: str, stop: threading.Event, timeline: list, started: float):
+    last = {}
+    while not stop.wait(0.25):
+        try:
+            deps = requests.get(f"{base_url}/api/admin/dependencies", timeout=2,
+                                headers={"X-Admin-Token": ADMIN_TOKEN}).json()["dependencies"]
+        except (requests.RequestException, ValueError, KeyError):
+            continue
+        for dep in deps:
+            if last.get(dep["name"]) != dep["state"]:
+                last[dep["name"]] = dep["state"]
+                timeline.append({"t_s": round(time.perf_counter() - started, 2),
+                                 "dependency": dep["name"], "state": dep["state"]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1000, help="library size to seed")
+    parser.add_argument("--phase-seconds", type=float, default=20.0)
+    parser.add_argument("--local-clients", type=int, default=2, help="clients per SQLite-only scenario")
+    parser.add_argument("--upstream-clients", type=int, default=12, help="clients per upstream scenario")
+    parser.add_argument("--hang-ms", type=float, default=30000, help="stub latency during the outage")
+    parser.add_argument("--timeout", type=float, default=15.0, help="client timeout per request (s)")
+    parser.add_argument("--request-deadline", default="5",
+                        help="X-Request-Timeout sent by clients ('' to use the server default)")
+    parser.add_argument("--recovery-seconds", type=float, default=5.0,
+                        help="circuit breaker open time before a half-open probe")
+    parser.add_argument("--baseline", action="store_true", help="effectively disable the guards")
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    arxiv = ArxivStub(FaultProfile(latency_ms=50, jitter_ms=20))
+    gemini = GeminiStub(FaultProfile(latency_ms=300, jitter_ms=100))
+    env = {f"{prefix}_RECOVERY_SECONDS": str(args.recovery_seconds)
+           for prefix in ("ARXIV_API", "ARXIV_PDF", "GEMINI")}
+    if args.baseline:
+        env.update(BASELINE_ENV)
+    deadline_header = "" if args.baseline else args.request_deadline
+
+    results = []
+    timeline = []
+    with arxiv, gemini, tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "papers.db")
+        ids = seed_library(db_path, args.size, fixture_papers=fixture_papers(arxiv))
+        process, base_url = start_api(db_path, workdir, arxiv, gemini, env)
+        recorder = PhaseRecorder()
+        stop = threading.Event()
+        try:
+            ctx = ScenarioContext(base_url, ids)
+            recorder.start_phase("healthy")
+            started = time.perf_counter()
+            threads = [threading.Thread(target=poll_dependencies, args=(base_url, stop, timeline, started))]
+            for name in LOCAL_SCENARIOS + UPSTREAM_SCENARIOS:
+                clients = args.local_clients if name in LOCAL_SCENARIOS else args.upstream_clients
+                for _ in range(clients):
+                    threads.append(threading.Thread(
+                        target=client_loop,
+                        args=(name, ctx, recorder, stop, args.timeout, deadline_header),
+                    ))
+            for thread in threads:
+                thread.start()
+
+            time.sleep(args.phase_seconds)
+            for faults in (arxiv.faults, gemini.faults):
+                faults.latency_ms = args.hang_ms
+                faults.down = True
+            recorder.start_phase("outage")
+            print(f"outage started at {time.perf_counter() - started:.1f}s")
+
+            time.sleep(args.phase_seconds)
+            arxiv.faults.latency_ms, gemini.faults.latency_ms = 50, 300
+            for faults in (arxiv.faults, gemini.faults):
+                faults.down = False
+            recorder.start_phase("recovery")
+            print(f"recovery started at {time.perf_counter() - started:.1f}s")
+
+            time.sleep(args.phase_seconds)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            stop.set()
+            stop_api(process)
+
+    print(f"\n{'phase':<10}{'scenario':<15}{'reqs':>6}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'degraded':>10}{'1st full s':>12}  statuses")
+    for phase in ("healthy", "outage", "recovery"):
+        for name in LOCAL_SCENARIOS + UPSTREAM_SCENARIOS:
+            row = recorder.rows.get((phase, name))
+            if row is None:
+                continue
+            errors = sum(n for status, n in row["statuses"].items() if not status.startswith("2"))
+            summary = summarize_latencies(row["latencies"], args.phase_seconds, errors)
+            first_full = "-" if row["first_full_s"] is None else row["first_full_s"]
+            print(f"{phase:<10}{name:<15}{summary['requests']:>6}{summary['p50_ms']:>10}{summary['p99_ms']:>10}"
+                  f"{row['degraded']:>10}{first_full:>12}  {row['statuses']}")
+            results.append({"phase": phase, "scenario": name, **summary, "status_counts": row["statuses"],
+                            "degraded": row["degraded"], "first_full_answer_s": row["first_full_s"]})
+
+    print("\nbreaker timeline")
+    for event in timeline:
+        print(f"  {event['t_s']:>7.2f}s  {event['dependency']:<10} {event['state']}")
+    results.append({"phase": "timeline", "events": timeline})
+
+    path = write_results("resilience", vars(args), results, output=args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
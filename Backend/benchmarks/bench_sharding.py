@@ -0,0 +1,169 @@
+"""
+Write-throughput benchmark for per-user sharding.
+
+Concurrent users each save papers in a loop (connect through the shard
+router, insert, commit), first into a single database and then into 2, 4,
+... shards. SQLite allows one writer per database file, so with one shard
+every commit queues behind the others; with more shards, users on
+different shards commit in parallel and throughput should grow with the
+shard count until the disk or CPU saturates.
+
+A final run keeps the writers going while the router rebalances from
+``--rebalance-from`` to ``--rebalance-to`` shards. It reports the write
+stall during moves and checks afterwards that no row was lost or
+duplicated and that every user's rows sit on the shard the router now
+picks for them.
+
+The databases are created under ``--dir`` (default: a temporary
+directory). Point it at the disk the API uses for realistic fsync costs.
+
+Usage:
+    python benchmarks/bench_sharding.py --users 32 --seconds 5 --shards 1 2 4 8
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sharding
+from common import summarize_latencies, write_results
+from seed import create_schema
+
+INSERT = """
+    INSERT INTO saved_papers (paper_id, title, authors, abstract, publication_date, doi, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def build_router(workdir: str, template: str, shard_count: int) -> sharding.ShardRouter:
+    os.makedirs(workdir)
+    primary = os.path.join(workdir, "papers.db")
+    sharding.clone_schema(template, primary)
+    router = sharding.ShardRouter.open(os.path.join(workdir, "shard_map.db"), primary)
+    if shard_count > 1:
+        router.rebalance(shard_count, os.path.join(workdir, "shards"))
+    return router
+
+
+class Writers:
+    """``users`` threads, each saving papers for its own user until stopped."""
+
+    def __init__(self, router: sharding.ShardRouter, users: int):
+        self.router = router
+        self.user_ids = [f"bench_user_{i}" for i in range(users)]
+        self.latencies = []
+        self.commits = {user_id: 0 for user_id in self.user_ids}
+        self.errors = 0
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, args=(u,)) for u in self.user_ids]
+
+    def _run(self, user_id: str):
+        i = 0
+        while not self.stop.is_set():
+            start = time.perf_counter()
+            try:
+                conn = self.router.connect(user_id, timeout=30)
+                try:
+                    conn.execute(INSERT, (
+                        f"2400.{i:05d}v1", f"Benchmark paper {i} of {user_id}", "Author A, Author B",
+                        "Sharded write benchmark abstract. " * 10, "2024", "", user_id,
+                    ))
+                    conn.commit()
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                with self._lock:
+                    self.errors += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.latencies.append(elapsed)
+                self.commits[user_id] += 1
+            i += 1
+
+    def run_for(self, seconds: float, during=None) -> dict:
+        start = time.perf_counter()
+        for thread in self._threads:
+            thread.start()
+        if during is not None:
+            during()
+        time.sleep(max(seconds - (time.perf_counter() - start), 0))
+        self.stop.set()
+        for thread in self._threads:
+            thread.join()
+        return summarize_latencies(self.latencies, time.perf_counter() - start, self.errors)
+
+
+def verify(router: sharding.ShardRouter, writers: Writers) -> dict:
+    """Checks that each user's rows all live, exactly once, on their routed shard."""
+    counts = router.scatter(lambda conn: dict(conn.execute(
+        "SELECT user_id, COUNT(*) FROM saved_papers GROUP BY user_id"
+    ).fetchall()))
+    misplaced = lost = 0
+    for user_id, expected in writers.commits.items():
+        home = router.shard_for(user_id)
+        misplaced += sum(1 for name, users in counts.items() if name != home and users.get(user_id))
+        lost += expected - counts[home].get(user_id, 0)
+    return {"misplaced_users": misplaced, "row_difference": lost}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=32, help="concurrent writing users")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each run")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8], help="shard counts to compare")
+    parser.add_argument("--rebalance-from", type=int, default=2)
+    parser.add_argument("--rebalance-to", type=int, default=4)
+    parser.add_argument("--dir", help="where to create the databases (default: a temporary directory)")
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        template = os.path.join(workdir, "template.db")
+        create_schema(template)
+
+        print(f"{'shards':>6}{'commits/s':>12}{'speedup':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        single = None
+        for shard_count in args.shards:
+            router = build_router(os.path.join(workdir, f"run-{shard_count}"), template, shard_count)
+            stats = Writers(router, args.users).run_for(args.seconds)
+            single = single or stats["throughput_rps"]
+            speedup = round(stats["throughput_rps"] / single, 2) if single else 0.0
+            results.append({"run": "write", "shards": shard_count, "users": args.users,
+                            "speedup": speedup, **stats})
+            print(f"{shard_count:>6}{stats['throughput_rps']:>12}{speedup:>10}{stats['p50_ms']:>10}"
+                  f"{stats['p99_ms']:>10}{stats['errors']:>8}")
+
+        router = build_router(os.path.join(workdir, "rebalance"), template, args.rebalance_from)
+        writers = Writers(router, args.users)
+        rebalance = {}
+
+        def rebalance_midway():
+            time.sleep(args.seconds / 4)
+            rebalance.update(router.rebalance(args.rebalance_to, os.path.join(workdir, "rebalance", "shards")))
+
+        stats = writers.run_for(args.seconds, during=rebalance_midway)
+        check = verify(router, writers)
+        results.append({"run": "rebalance_under_load", "from_shards": args.rebalance_from,
+                        "to_shards": args.rebalance_to, "rebalance": rebalance, **check, **stats})
+        print(f"\nrebalance {args.rebalance_from} -> {args.rebalance_to} shards under load: "
+              f"{rebalance['users_moved']} users / {rebalance['papers_moved']} papers moved "
+              f"in {rebalance['elapsed_s']}s ({rebalance['retries']} retries)")
+        print(f"  writes: {stats['throughput_rps']} commits/s, p99 {stats['p99_ms']} ms, "
+              f"max {stats['max_ms']} ms, {stats['errors']} errors")
+        print(f"  check: {check['misplaced_users']} misplaced users, row difference {check['row_difference']}")
+
+    path = write_results("sharding", vars(args), results, output=args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
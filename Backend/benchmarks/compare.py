@@ -0,0 +1,78 @@
+"""
+Compares two benchmark result files and flags regressions.
+
+Rows are matched on every non-metric field (e.g. ``library_size`` and
+``scenario`` for load tests). A row regresses when a latency percentile
+grows, or a throughput figure drops, by more than ``--threshold`` percent.
+Exits non-zero if anything regressed, so it can gate CI.
+
+Usage:
+    python benchmarks/compare.py results/load-OLD.json results/load-NEW.json --threshold 15
+"""
+
+import argparse
+import json
+import sys
+
+# Metric name -> True if higher is better
+METRICS = {
+    "throughput_rps": True,
+    "records_per_s": True,
+    "papers_per_min": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+}
+
+
+def _key(row: dict) -> tuple:
+    return tuple(sorted(
+        (k, v) for k, v in row.items()
+        if isinstance(v, (str, int)) and not isinstance(v, bool) and k not in METRICS
+        and k not in ("requests", "errors", "records", "papers")
+    ))
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    base_rows = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for row in candidate["results"]:
+        key = _key(row)
+        base = base_rows.get(key)
+        if base is None:
+            continue
+        label = " ".join(f"{k}={v}" for k, v in key)
+        for metric, higher_is_better in METRICS.items():
+            if metric not in row or metric not in base or not base[metric]:
+                continue
+            change = (row[metric] - base[metric]) / base[metric] * 100
+            regressed = change < -threshold if higher_is_better else change > threshold
+            marker = "REGRESSION" if regressed else ""
+            print(f"{label:<48}{metric:<16}{base[metric]:>12}{row[metric]:>12}{change:>+9.1f}%  {marker}")
+            if regressed:
+                regressions.append((label, metric, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed change in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    if baseline.get("benchmark") != candidate.get("benchmark"):
+        sys.exit("Result files come from different benchmarks")
+
+    print(f"baseline {baseline.get('git_commit')}  ->  candidate {candidate.get('git_commit')}\n")
+    regressions = compare(baseline, candidate, args.threshold)
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+End-to-end load test of the API against local arXiv and Gemini stand-ins.
+
+For every library size the script seeds a fresh SQLite database, starts the
+API under uvicorn with its upstreams pointed at the stubs, and drives each
+scenario with a pool of concurrent clients. Throughput and p50/p95/p99
+latency per endpoint are printed and written to a JSON result file that
+``compare.py`` can diff against an earlier run.
+
+Usage:
+    python benchmarks/run_load.py --sizes 100,1000,10000 --requests 200 --concurrency 8
+    python benchmarks/run_load.py --scenarios search,citation --gemini-error-rate 0.1
+"""
+
+import argparse
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common import BACKEND_DIR, summarize_latencies, write_results
+from seed import seed_library
+from stubs import ArxivStub, FaultProfile, GeminiStub
+
+# Admin endpoints (/api/admin/*) are closed unless the API has a token
+ADMIN_TOKEN = "bench-admin"
+
+
+# ==============================
+# 🎬 SCENARIOS
+# ==============================
+
+class ScenarioContext:
+    def __init__(self, base_url: str, ids: dict):
+        self.base_url = base_url
+        self.paper_ids = ids["paper_ids"]
+        self.list_ids = ids["list_ids"]
+        self.fixture_ids = ids["fixture_ids"]
+        self._counter = itertools.count()
+
+    def pick(self, values: list, i: int):
+        return values[i % len(values)]
+
+    def next_id(self) -> int:
+        return next(self._counter)
+
+
+SCENARIOS = {
+    "health": lambda s, ctx, i: s.get(f"{ctx.base_url}/health"),
+    "list_papers": lambda s, ctx, i: s.get(f"{ctx.base_url}/api/papers"),
+    "list_papers_in_list": lambda s, ctx, i: s.get(
+        f"{ctx.base_url}/api/papers", params={"reading_list_id": ctx.pick(ctx.list_ids, i)}),
+    "paper_detail": lambda s, ctx, i: s.get(
+        f"{ctx.base_url}/api/papers/{ctx.pick(ctx.paper_ids, i * 7919)}"),
+    "reading_lists": lambda s, ctx, i: s.get(f"{ctx.base_url}/api/reading-lists"),
+    "save_paper": lambda s, ctx, i: s.post(f"{ctx.base_url}/api/papers/save", json={"paper": {
+        "id": f"load.{ctx.next_id():07d}", "title": "Load test paper", "authors": ["Load Tester"],
+        "abstract": "Inserted by the load test.", "publication_date": "2024", "doi": "",
+    }}),
+    "search": lambda s, ctx, i: s.post(f"{ctx.base_url}/api/search", json={"query": "transformer"}),
+    "download_pdf": lambda s, ctx, i: s.get(
+        f"{ctx.base_url}/api/papers/download/{ctx.pick(ctx.fixture_ids, i)}"),
+    "citation": lambda s, ctx, i: s.get(
+        f"{ctx.base_url}/api/papers/{ctx.pick(ctx.fixture_ids, i)}/citation", params={"format": "APA"}),
+    "related": lambda s, ctx, i: s.get(f"{ctx.base_url}/api/papers/{ctx.pick(ctx.fixture_ids, i)}/related"),
+}
+
+
+def run_scenario(name: str, ctx: ScenarioContext, total: int, concurrency: int, timeout: float) -> dict:
+    scenario = SCENARIOS[name]
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i: int):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.request = _with_timeout(local.session.request, timeout)
+        start = time.perf_counter()
+        try:
+            status = scenario(local.session, ctx, i).status_code
+        except requests.RequestException:
+            status = "connection_error"
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+
+    errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+    summary = summarize_latencies(latencies, elapsed, errors)
+    summary["status_counts"] = statuses
+    return summary
+
+
+def _with_timeout(request, timeout: float):
+    def wrapped(method, url, **kwargs):
+        kwargs.setdefault("timeout", timeout)
+        return request(method, url, **kwargs)
+    return wrapped
+
+
+# ==============================
+# 🖥️ SERVER UNDER TEST
+# ==============================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(db_path: str, workdir: str, arxiv: ArxivStub, gemini: GeminiStub, extra_env: dict):
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "DB_PATH": db_path,
+        "SHARD_MAP_PATH": os.path.join(workdir, "shard_map.db"),
+        "DB_SHARD_DIR": os.path.join(workdir, "shards"),
+        "PDF_CACHE_DIR": os.path.join(workdir, "pdf_cache"),
+        "ARXIV_API_URL": arxiv.api_url,
+        "ARXIV_PDF_URL": arxiv.pdf_url_template,
+        "GEMINI_API_ENDPOINT": gemini.url,
+        "GOOGLE_API_KEY": env.get("GOOGLE_API_KEY") or "stub-key",
+        "RATE_LIMIT_PER_MINUTE": "1000000",
+        "ADMIN_TOKEN": ADMIN_TOKEN,
+    })
+    env.update(extra_env)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API process exited during startup")
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API did not become healthy within 30s")
+
+
+def stop_api(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def fixture_papers(arxiv: ArxivStub) -> list:
+    """Turns the recorded arXiv entries into saved-paper rows."""
+    import xml.etree.ElementTree as ET
+    from stubs import ATOM_NS
+
+    ns = {"atom": ATOM_NS}
+    root = ET.fromstring(arxiv.search_feed)
+    papers = []
+    for entry in root.findall("atom:entry", ns):
+        arxiv_id = entry.find("atom:id", ns).text.split("/")[-1]
+        papers.append({
+            "id": arxiv_id,
+            "title": " ".join(entry.find("atom:title", ns).text.split()),
+            "authors": [a.find("atom:name", ns).text for a in entry.findall("atom:author", ns)],
+            "abstract": " ".join(entry.find("atom:summary", ns).text.split()),
+            "publication_date": entry.find("atom:published", ns).text[:4],
+            "doi": f"https://arxiv.org/abs/{arxiv_id}",
+        })
+    return papers
+
+
+# ==============================
+# 🏁 DRIVER
+# ==============================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated library sizes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout per request (s)")
+    parser.add_argument("--arxiv-latency-ms", type=float, default=50)
+    parser.add_argument("--arxiv-jitter-ms", type=float, default=20)
+    parser.add_argument("--arxiv-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-error-status", type=int, default=429)
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    arxiv = ArxivStub(FaultProfile(args.arxiv_latency_ms, args.arxiv_jitter_ms, args.arxiv_error_rate))
+    gemini = GeminiStub(FaultProfile(args.gemini_latency_ms, args.gemini_jitter_ms,
+                                     args.gemini_error_rate, args.gemini_error_status))
+    results = []
+
+    with arxiv, gemini:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            with tempfile.TemporaryDirectory() as workdir:
+                db_path = os.path.join(workdir, "papers.db")
+                ids = seed_library(db_path, size, fixture_papers=fixture_papers(arxiv))
+                process, base_url = start_api(db_path, workdir, arxiv, gemini, {})
+                try:
+                    ctx = ScenarioContext(base_url, ids)
+                    print(f"\nlibrary size {size}")
+                    print(f"{'scenario':<22}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+                    for name in scenarios:
+                        summary = run_scenario(name, ctx, args.requests, args.concurrency, args.timeout)
+                        print(f"{name:<22}{summary['throughput_rps']:>9}{summary['p50_ms']:>10}"
+                              f"{summary['p95_ms']:>10}{summary['p99_ms']:>10}{summary['errors']:>8}")
+                        results.append({"library_size": size, "scenario": name, **summary})
+                finally:
+                    stop_api(process)
+
+    path = write_results("load", vars(args), results, output=args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Seeded SQLite fixtures for the load tests.
+
+Builds a deterministic library of ``size`` papers spread over reading lists
+for the mock user, plus a second user's papers so ownership checks and
+shared-table scans see realistic data. The papers from the recorded arXiv
+feed are always included so citation/related scenarios hit the database.
+
+Usage:
+    python benchmarks/seed.py --size 10000 --output /tmp/library.db
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MOCK_USER_ID = "user_123"
+OTHER_USER_ID = "user_other"
+TOPICS = ["transformers", "graph neural networks", "retrieval", "reinforcement learning",
+          "diffusion models", "speech recognition", "federated learning", "program synthesis"]
+
+
+def create_schema(db_path: str):
+    """Creates the API schema by running the app's own initializer."""
+    os.environ["DB_PATH"] = db_path
+    # Keep the shard map next to the database rather than in the cwd
+    os.environ.setdefault("SHARD_MAP_PATH", os.path.join(os.path.dirname(os.path.abspath(db_path)), "shard_map.db"))
+    import main
+
+    main.DB_PATH = db_path
+    main.init_db()
+
+
+def _paper_row(rng: random.Random, index: int, user_id: str, list_ids: list) -> tuple:
+    topic = rng.choice(TOPICS)
+    paper_id = f"{2300 + index // 100000}.{index % 100000:05d}v{rng.randint(1, 3)}"
+    return (
+        paper_id,
+        f"Scalable {topic} study number {index}",
+        ", ".join(f"Author {rng.randint(1, 5000)}" for _ in range(rng.randint(1, 6))),
+        f"We study {topic} at scale. " * rng.randint(5, 20),
+        str(rng.randint(2005, 2025)),
+        f"https://arxiv.org/abs/{paper_id}",
+        user_id,
+        rng.choice(list_ids) if list_ids and rng.random() < 0.7 else None,
+    )
+
+
+def seed_library(db_path: str, size: int, lists: int = 20, fixture_papers: list = (), seed: int = 42) -> dict:
+    """
+    Seeds ``db_path`` and returns ids the scenarios need
+    (``paper_ids``, ``list_ids``, ``fixture_ids``).
+    """
+    create_schema(db_path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    list_ids = []
+    for i in range(lists):
+        cursor.execute(
+            "INSERT INTO reading_lists (name, description, user_id) VALUES (?, ?, ?)",
+            (f"List {i}", f"Seeded list {i}", MOCK_USER_ID)
+        )
+        list_ids.append(cursor.lastrowid)
+
+    insert = """
+        INSERT INTO saved_papers
+        (paper_id, title, authors, abstract, publication_date, doi, user_id, reading_list_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    paper_ids = []
+    batch = []
+    for i in range(size):
+        row = _paper_row(rng, i, MOCK_USER_ID, list_ids)
+        paper_ids.append(row[0])
+        batch.append(row)
+        if len(batch) >= 5000:
+            cursor.executemany(insert, batch)
+            batch = []
+    for i in range(size // 2):
+        batch.append(_paper_row(rng, size + i, OTHER_USER_ID, []))
+        if len(batch) >= 5000:
+            cursor.executemany(insert, batch)
+            batch = []
+    cursor.executemany(insert, batch)
+
+    fixture_ids = []
+    for paper in fixture_papers:
+        cursor.execute(insert, (
+            paper["id"], paper["title"], ", ".join(paper["authors"]), paper["abstract"],
+            paper["publication_date"], paper["doi"], MOCK_USER_ID, list_ids[0] if list_ids else None
+        ))
+        fixture_ids.append(paper["id"])
+
+    conn.commit()
+    conn.close()
+    return {"paper_ids": paper_ids, "list_ids": list_ids, "fixture_ids": fixture_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--lists", type=int, default=20)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        sys.exit(f"{args.output} already exists")
+    ids = seed_library(args.output, args.size, args.lists)
+    print(f"Seeded {len(ids['paper_ids'])} papers in {len(ids['list_ids'])} lists into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Local stand-ins for arXiv and Gemini.
+
+``ArxivStub`` replays the recorded Atom feed in ``fixtures/`` for search and
+``id_list`` queries and serves synthetic PDFs. ``GeminiStub`` answers the
+``generateContent`` REST call with canned citations (single or batched) or
+related-paper JSON built from the prompt, optionally truncating some JSON
+answers. Both inject configurable latency and errors so
+scenarios can model a slow or flaky upstream.
+
+Point the API at them with ``ARXIV_API_URL``, ``ARXIV_PDF_URL`` and
+``GEMINI_API_ENDPOINT`` (see ``run_load.py``).
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from common import BENCH_DIR, build_synthetic_pdf
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+ATOM_NS = "http://www.w3.org/2005/Atom"
+
+ET.register_namespace("", ATOM_NS)
+ET.register_namespace("opensearch", "http://a9.com/-/spec/opensearch/1.1/")
+ET.register_namespace("arxiv", "http://arxiv.org/schemas/atom")
+
+
+class FaultProfile:
+    """Latency and error injection shared by the stub handlers."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # Hard outage: every request hangs for ``latency_ms`` then errors
+        self.down = False
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self):
+        """Sleeps for the configured latency; returns an HTTP status to fail with, if any."""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self.down or self._random.random() < self.error_rate
+        delay = max(self.latency_ms + jitter, 0.0) / 1000
+        if delay:
+            time.sleep(delay)
+        return self.error_status if fail else None
+
+
+class _StubServer:
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, faults: FaultProfile = None, host: str = "127.0.0.1", port: int = 0):
+        self.faults = faults or FaultProfile()
+        self.requests_served = 0
+        handler = type("Handler", (self.handler_class,), {"stub": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    stub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up first (e.g. a timeout during an injected hang)
+            pass
+
+
+# ==============================
+# 📚 ARXIV
+# ==============================
+
+class _ArxivHandler(_Handler):
+    def do_GET(self):
+        self.stub.requests_served += 1
+        status = self.stub.faults.apply()
+        if status:
+            self._send(status, b"Service Unavailable", "text/plain")
+            return
+
+        parsed = urlparse(self.path)
+        if parsed.path.startswith("/pdf/"):
+            self._send(200, self.stub.pdf_bytes, "application/pdf")
+            return
+
+        params = parse_qs(parsed.query)
+        if "id_list" in params:
+            body = self.stub.feed_for_id(params["id_list"][0])
+        else:
+            body = self.stub.search_feed
+        self._send(200, body, "application/atom+xml; charset=utf-8")
+
+
+class ArxivStub(_StubServer):
+    handler_class = _ArxivHandler
+
+    def __init__(self, faults: FaultProfile = None, pdf_pages: int = 8, **kwargs):
+        super().__init__(faults, **kwargs)
+        with open(os.path.join(FIXTURES_DIR, "arxiv_search.xml"), "rb") as f:
+            self.search_feed = f.read()
+        self.pdf_bytes = build_synthetic_pdf(pdf_pages)
+
+        root = ET.fromstring(self.search_feed)
+        self._entries = {}
+        for entry in root.findall(f"{{{ATOM_NS}}}entry"):
+            versioned = entry.find(f"{{{ATOM_NS}}}id").text.rsplit("/", 1)[-1]
+            self._entries[versioned] = entry
+            self._entries[re.sub(r"v\d+$", "", versioned)] = entry
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api/query"
+
+    @property
+    def pdf_url_template(self) -> str:
+        return f"{self.url}/pdf/{{paper_id}}.pdf"
+
+    @property
+    def paper_ids(self) -> list:
+        return sorted(k for k in self._entries if re.search(r"v\d+$", k))
+
+    def feed_for_id(self, arxiv_id: str) -> bytes:
+        feed = ET.Element(f"{{{ATOM_NS}}}feed")
+        title = ET.SubElement(feed, f"{{{ATOM_NS}}}title")
+        title.text = f"ArXiv Query: id_list={arxiv_id}"
+        entry = self._entries.get(arxiv_id)
+        if entry is not None:
+            feed.append(entry)
+        return ET.tostring(feed, encoding="utf-8", xml_declaration=True)
+
+
+# ==============================
+# 🤖 GEMINI
+# ==============================
+
+class _GeminiHandler(_Handler):
+    def do_POST(self):
+        self.stub.requests_served += 1
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        status = self.stub.faults.apply()
+        if status:
+            if status == 429:
+                error = {"error": {"code": status, "message": "Resource has been exhausted (e.g. check quota).",
+                                   "status": "RESOURCE_EXHAUSTED"}}
+            else:
+                error = {"error": {"code": status, "message": "The service is currently unavailable.",
+                                   "status": "UNAVAILABLE"}}
+            self._send(status, json.dumps(error).encode(), "application/json")
+            return
+
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        body = {
+            "candidates": [{
+                "content": {"parts": [{"text": self.stub.complete(prompt)}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": 40},
+        }
+        self._send(200, json.dumps(body).encode(), "application/json")
+
+
+class GeminiStub(_StubServer):
+    handler_class = _GeminiHandler
+
+    def __init__(self, faults: FaultProfile = None, malformed_rate: float = 0.0, seed: int = 0, **kwargs):
+        super().__init__(faults, **kwargs)
+        # Fraction of JSON answers cut off midway, as a model hitting its
+        # output limit would return them
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _maybe_truncate(self, text: str) -> str:
+        with self._lock:
+            truncate = self._random.random() < self.malformed_rate
+        return text[:len(text) // 2] if truncate else text
+
+    def complete(self, prompt: str) -> str:
+        """Fakes a completion shaped like the one the prompt asks for."""
+        if "Candidates:" in prompt:
+            ids = re.findall(r"^\s*ID: (.+)$", prompt, re.MULTILINE)
+            return self._maybe_truncate(json.dumps([
+                {"id": pid.strip(), "similarity": 90 - i * 7, "reason": "Shares methods and topic."}
+                for i, pid in enumerate(ids[:3])
+            ]))
+
+        if "Citation requests:" in prompt:
+            entries = []
+            for block in prompt.split("Key: ")[1:]:
+                fields = dict(re.findall(r"^([A-Za-z ]+): (.*)$", "Key: " + block, re.MULTILINE))
+                for fmt in fields.get("Formats", "APA").split(", "):
+                    entries.append({
+                        "key": fields["Key"].strip(),
+                        "format": fmt.strip(),
+                        "citation": f"{fields.get('Authors', 'Unknown')} ({fields.get('Publication Year', 'n.d.')}). "
+                                    f"{fields.get('Title', 'Untitled')}. arXiv. [{fmt.strip()}]",
+                    })
+            return self._maybe_truncate(json.dumps(entries))
+
+        title = re.search(r"Title: (.+)", prompt)
+        authors = re.search(r"Authors: (.+)", prompt)
+        year = re.search(r"Publication Year: (.+)", prompt)
+        return (
+            f"{authors.group(1).strip() if authors else 'Unknown'} "
+            f"({year.group(1).strip() if year else 'n.d.'}). "
+            f"{title.group(1).strip() if title else 'Untitled'}. arXiv."
+        )
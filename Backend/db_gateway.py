@@ -0,0 +1,141 @@
+"""
+Async gateway for blocking SQLite work.
+
+``async def`` endpoints must not call ``sqlite3`` directly: a slow query or
+a writer waiting on the database lock would freeze the event loop, and with
+it every other in-flight request. The gateway runs that work on threads
+instead and lets the endpoint await the result:
+
+- reads go to a bounded pool of ``read_workers`` threads,
+- writes go to a single writer thread per database file (a "lane"), so
+  they queue in-process in order instead of contending for SQLite's lock
+  (and busy-waiting) on many threads. Shards get a lane each and write in
+  parallel.
+
+Each pool reports its queue depth (submitted but not yet started), running
+count and recent queue wait times. When ``max_queue`` is set, work beyond
+that depth is refused with ``DatabaseBusy`` rather than queued without bound.
+"""
+
+import asyncio
+import collections
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+WAIT_SAMPLES = 1000
+
+
+class DatabaseBusy(Exception):
+    """A pool's queue is full; the caller should shed the request."""
+
+    def __init__(self, pool: str, depth: int):
+        super().__init__(f"{pool} queue full ({depth} waiting)")
+        self.pool = pool
+        self.depth = depth
+
+
+class _Pool:
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"db-{name}")
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.waits = collections.deque(maxlen=WAIT_SAMPLES)
+        self._lock = threading.Lock()
+
+    async def submit(self, fn: Callable, args: tuple, kwargs: dict):
+        with self._lock:
+            if self.max_queue and self.queued >= self.max_queue:
+                self.rejected += 1
+                raise DatabaseBusy(self.name, self.queued)
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        # Carry the request's context (profiling, deadlines) onto the thread
+        ctx = contextvars.copy_context()
+        submitted = time.perf_counter()
+
+        def run():
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.waits.append(time.perf_counter() - submitted)
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        future = self.executor.submit(run)
+        # A caller cancelled while its work was still queued: run() will
+        # never start, so take the work off the queue count here
+        future.add_done_callback(self._forget_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _forget_if_cancelled(self, future):
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+                self.cancelled += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self.waits)
+            stats = {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "max_queue_depth": self.max_queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+            }
+        if waits:
+            stats["wait_p50_ms"] = round(waits[len(waits) // 2] * 1000, 3)
+            stats["wait_p99_ms"] = round(waits[min(int(len(waits) * 0.99), len(waits) - 1)] * 1000, 3)
+        return stats
+
+
+class DatabaseGateway:
+    """Runs blocking database calls off the event loop."""
+
+    def __init__(self, read_workers: int = 8, max_queue: int = 0):
+        self.max_queue = max_queue
+        self._readers = _Pool("read", read_workers, max_queue)
+        self._writers: Dict[str, _Pool] = {}
+        self._lock = threading.Lock()
+
+    def _writer(self, lane: str) -> _Pool:
+        pool = self._writers.get(lane)
+        if pool is None:
+            with self._lock:
+                pool = self._writers.setdefault(lane, _Pool(f"write-{lane}", 1, self.max_queue))
+        return pool
+
+    async def read(self, fn: Callable, *args, **kwargs):
+        """Awaits ``fn(*args, **kwargs)`` on a reader thread."""
+        return await self._readers.submit(fn, args, kwargs)
+
+    async def write(self, fn: Callable, *args, lane: str = "default", **kwargs):
+        """Awaits ``fn(*args, **kwargs)`` on ``lane``'s writer thread."""
+        return await self._writer(lane).submit(fn, args, kwargs)
+
+    def snapshot(self) -> dict:
+        return {
+            "read": self._readers.snapshot(),
+            "write": {lane: pool.snapshot() for lane, pool in list(self._writers.items())},
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._readers.executor.shutdown(wait=wait)
+        for pool in list(self._writers.values()):
+            pool.executor.shutdown(wait=wait)
@@ -0,0 +1,396 @@
+"""
+Near-duplicate and version detection for saved papers.
+
+Two papers are treated as the same work when either
+
+- their ids differ only by an arXiv version suffix (``2101.00001v1`` and
+  ``2101.00001v2``), or
+- the MinHash estimate of the Jaccard similarity of their title + abstract
+  word shingles reaches ``NEAR_DUPLICATE_THRESHOLD``.
+
+Signatures use one-permutation hashing (each shingle is hashed once and
+binned, with empty bins densified from their neighbours), so computing one
+costs a single pass over the text. They are split into LSH bands stored in
+``paper_lsh_buckets``; a lookup only compares against papers that share at
+least one band bucket, which keeps insert-time checks sub-linear in library
+size.
+
+Usage:
+    python dedup.py --db papers.db --action flag
+"""
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import struct
+from typing import List, Optional
+
+import fulltext
+
+NUM_HASHES = 64
+BANDS = 8
+ROWS_PER_BAND = NUM_HASHES // BANDS
+SHINGLE_SIZE = 3
+NEAR_DUPLICATE_THRESHOLD = 0.8
+MAX_CANDIDATES = 200
+
+_MASK64 = (1 << 64) - 1
+_EMPTY = _MASK64
+_SIGNATURE_FORMAT = f"<{NUM_HASHES}Q"
+
+VERSION_RE = re.compile(r"v(\d+)$")
+ARXIV_URL_RE = re.compile(r"arxiv\.org/(?:abs|pdf)/([^\s?#]+?)(?:\.pdf)?$")
+
+
+# ==============================
+# 🗄️ SCHEMA
+# ==============================
+
+def init_dedup_tables(conn: sqlite3.Connection):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS paper_minhash (
+            saved_paper_id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            base_paper_id TEXT NOT NULL,
+            signature BLOB
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_paper_minhash_base
+        ON paper_minhash (user_id, base_paper_id)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS paper_lsh_buckets (
+            user_id TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            saved_paper_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, band, bucket, saved_paper_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS paper_duplicates (
+            saved_paper_id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            duplicate_of INTEGER NOT NULL,
+            similarity REAL NOT NULL,
+            reason TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+# ==============================
+# 🔢 SIGNATURES
+# ==============================
+
+def base_paper_id(paper_id: str) -> str:
+    """Strips URL wrapping and the arXiv version suffix from an id."""
+    paper_id = paper_id.strip()
+    match = ARXIV_URL_RE.search(paper_id)
+    if match:
+        paper_id = match.group(1)
+    return VERSION_RE.sub("", paper_id).lower()
+
+
+def paper_version(paper_id: str) -> int:
+    match = VERSION_RE.search(paper_id.strip())
+    return int(match.group(1)) if match else 0
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return set(words)
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def compute_signature(title: str, abstract: Optional[str]) -> Optional[List[int]]:
+    """One-permutation MinHash signature, or None if there is no text."""
+    shingles = _shingles(f"{title} {abstract or ''}")
+    if not shingles:
+        return None
+
+    bins = [_EMPTY] * NUM_HASHES
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little")
+        slot = h % NUM_HASHES
+        value = h // NUM_HASHES
+        if value < bins[slot]:
+            bins[slot] = value
+
+    # Densification: an empty bin borrows the nearest non-empty bin to its
+    # right, offset by distance so borrowed values stay distinguishable.
+    for i in range(NUM_HASHES):
+        if bins[i] != _EMPTY:
+            continue
+        for step in range(1, NUM_HASHES):
+            donor = bins[(i + step) % NUM_HASHES]
+            if donor != _EMPTY:
+                bins[i] = (donor + step * 0x9E3779B97F4A7C15) & (_MASK64 >> 1)
+                break
+    return bins
+
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_HASHES
+
+
+def _pack(signature: List[int]) -> bytes:
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def _unpack(blob: bytes) -> List[int]:
+    return list(struct.unpack(_SIGNATURE_FORMAT, blob))
+
+
+def _band_buckets(signature: List[int]) -> List[tuple]:
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f"<{ROWS_PER_BAND}Q", *rows), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "little", signed=True)))
+    return buckets
+
+
+# ==============================
+# 🔎 INDEX OPERATIONS
+# ==============================
+
+def index_paper(conn: sqlite3.Connection, saved_paper_id: int, user_id: str, paper_id: str,
+                title: str, abstract: Optional[str], signature: Optional[List[int]] = None):
+    """Stores a paper's signature and band buckets. Runs in the caller's transaction."""
+    if signature is None:
+        signature = compute_signature(title, abstract)
+    conn.execute(
+        "INSERT OR REPLACE INTO paper_minhash (saved_paper_id, user_id, base_paper_id, signature) VALUES (?, ?, ?, ?)",
+        (saved_paper_id, user_id, base_paper_id(paper_id), _pack(signature) if signature else None)
+    )
+    if signature:
+        conn.executemany(
+            "INSERT OR IGNORE INTO paper_lsh_buckets (user_id, band, bucket, saved_paper_id) VALUES (?, ?, ?, ?)",
+            [(user_id, band, bucket, saved_paper_id) for band, bucket in _band_buckets(signature)]
+        )
+
+
+def _remove_signature(conn: sqlite3.Connection, saved_paper_id: int):
+    row = conn.execute(
+        "SELECT user_id, signature FROM paper_minhash WHERE saved_paper_id = ?", (saved_paper_id,)
+    ).fetchone()
+    if row and row[1]:
+        conn.executemany(
+            "DELETE FROM paper_lsh_buckets WHERE user_id = ? AND band = ? AND bucket = ? AND saved_paper_id = ?",
+            [(row[0], band, bucket, saved_paper_id) for band, bucket in _band_buckets(_unpack(row[1]))]
+        )
+    conn.execute("DELETE FROM paper_minhash WHERE saved_paper_id = ?", (saved_paper_id,))
+
+
+def unindex_paper(conn: sqlite3.Connection, saved_paper_id: int):
+    """Removes a paper's signature, buckets and duplicate links."""
+    _remove_signature(conn, saved_paper_id)
+    conn.execute(
+        "DELETE FROM paper_duplicates WHERE saved_paper_id = ? OR duplicate_of = ?",
+        (saved_paper_id, saved_paper_id)
+    )
+
+
+def find_duplicate(conn: sqlite3.Connection, user_id: str, paper_id: str, title: str,
+                   abstract: Optional[str], signature: Optional[List[int]] = None,
+                   before_id: Optional[int] = None) -> Optional[dict]:
+    """
+    Returns the best existing match for a paper as
+    ``{"saved_paper_id", "similarity", "reason"}``, or None.
+    Version matches win over content matches. With ``before_id`` only
+    papers saved before that row are considered.
+    """
+    before_id = before_id if before_id is not None else 2 ** 63 - 1
+    row = conn.execute("""
+        SELECT saved_paper_id FROM paper_minhash
+        WHERE user_id = ? AND base_paper_id = ? AND saved_paper_id < ?
+        ORDER BY saved_paper_id LIMIT 1
+    """, (user_id, base_paper_id(paper_id), before_id)).fetchone()
+    if row:
+        return {"saved_paper_id": row[0], "similarity": 1.0, "reason": "version"}
+
+    if signature is None:
+        signature = compute_signature(title, abstract)
+    if not signature:
+        return None
+
+    buckets = _band_buckets(signature)
+    placeholders = ", ".join("(?, ?)" for _ in buckets)
+    params = [v for pair in buckets for v in pair] + [user_id, before_id, MAX_CANDIDATES]
+    # Joining from a CTE lets every probe use the full primary key; a
+    # row-value IN only narrows on user_id.
+    candidates = conn.execute(f"""
+        WITH probe(band, bucket) AS (VALUES {placeholders})
+        SELECT DISTINCT pm.saved_paper_id, pm.signature
+        FROM probe
+        JOIN paper_lsh_buckets b ON b.user_id = ? AND b.band = probe.band AND b.bucket = probe.bucket
+        JOIN paper_minhash pm ON pm.saved_paper_id = b.saved_paper_id
+        WHERE b.saved_paper_id < ?
+        LIMIT ?
+    """, params).fetchall()
+
+    best = None
+    for saved_paper_id, blob in candidates:
+        similarity = estimate_similarity(signature, _unpack(blob))
+        if similarity >= NEAR_DUPLICATE_THRESHOLD and (best is None or similarity > best["similarity"]):
+            best = {"saved_paper_id": saved_paper_id, "similarity": similarity, "reason": "near_duplicate"}
+    return best
+
+
+def resolve_saved_paper(conn: sqlite3.Connection, user_id: str, paper_id: str) -> Optional[int]:
+    """
+    Row id of the user's saved copy of ``paper_id``. Falls back to another
+    saved version of the same arXiv paper, since merging versions keeps
+    only the newest id (saving v1 and then v2 leaves one row, ``v2``).
+    """
+    row = conn.execute(
+        "SELECT id FROM saved_papers WHERE user_id = ? AND paper_id = ? ORDER BY id LIMIT 1", (user_id, paper_id)
+    ).fetchone()
+    if not row:
+        row = conn.execute("""
+            SELECT saved_paper_id FROM paper_minhash
+            WHERE user_id = ? AND base_paper_id = ?
+            ORDER BY saved_paper_id LIMIT 1
+        """, (user_id, base_paper_id(paper_id))).fetchone()
+    return row[0] if row else None
+
+
+def flag_duplicate(conn: sqlite3.Connection, user_id: str, saved_paper_id: int, match: dict):
+    conn.execute("""
+        INSERT OR REPLACE INTO paper_duplicates (saved_paper_id, user_id, duplicate_of, similarity, reason)
+        VALUES (?, ?, ?, ?, ?)
+    """, (saved_paper_id, user_id, match["saved_paper_id"], match["similarity"], match["reason"]))
+
+
+def merge_into(conn: sqlite3.Connection, canonical_id: int, paper: dict) -> Optional[str]:
+    """
+    Folds ``paper`` into the canonical saved row: a newer arXiv version
+    replaces the stored metadata, and a missing reading list is filled in.
+    Returns the row's previous ``paper_id`` if the newer version replaced
+    it, so the caller can re-key data stored under the old id.
+    """
+    row = conn.execute(
+        "SELECT paper_id, reading_list_id, user_id FROM saved_papers WHERE id = ?", (canonical_id,)
+    ).fetchone()
+    if not row:
+        return None
+    renamed = None
+    if base_paper_id(row[0]) == base_paper_id(paper["id"]) and paper_version(paper["id"]) > paper_version(row[0]):
+        conn.execute("""
+            UPDATE saved_papers
+            SET paper_id = ?, title = ?, authors = ?, abstract = ?, publication_date = ?, doi = ?
+            WHERE id = ?
+        """, (paper["id"], paper["title"], ", ".join(paper["authors"]), paper["abstract"],
+              paper["publication_date"], paper["doi"], canonical_id))
+        # The abstract may have changed between versions
+        _remove_signature(conn, canonical_id)
+        index_paper(conn, canonical_id, row[2], paper["id"], paper["title"], paper["abstract"])
+        renamed = row[0]
+    if row[1] is None and paper.get("reading_list_id") is not None:
+        conn.execute(
+            "UPDATE saved_papers SET reading_list_id = ? WHERE id = ?", (paper["reading_list_id"], canonical_id)
+        )
+    return renamed
+
+
+# ==============================
+# 🧹 BATCH CLEANUP
+# ==============================
+
+def dedup_library(db_path: str, user_id: Optional[str] = None, action: str = "flag",
+                  batch_size: int = 1000) -> dict:
+    """
+    Scans saved papers in insertion order, indexing any that lack a
+    signature, and flags or merges each one that duplicates an earlier
+    paper of the same user. Commits once per batch.
+
+    ``stats["renamed"]`` lists ``(user_id, old_paper_id, new_paper_id)``
+    for rows that took a newer version's id; full-text entries stored under
+    the old ids need re-keying (``fulltext.rename_paper``).
+    """
+    if action not in ("flag", "merge"):
+        raise ValueError("action must be 'flag' or 'merge'")
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    init_dedup_tables(conn)
+    stats = {"scanned": 0, "indexed": 0, "flagged": 0, "merged": 0, "renamed": []}
+    last_id = 0
+
+    try:
+        while True:
+            query = """
+                SELECT sp.id, sp.paper_id, sp.title, sp.authors, sp.abstract, sp.publication_date,
+                       sp.doi, sp.user_id, sp.reading_list_id, pm.signature, pm.saved_paper_id AS indexed
+                FROM saved_papers sp
+                LEFT JOIN paper_minhash pm ON pm.saved_paper_id = sp.id
+                WHERE sp.id > ?
+            """
+            params = [last_id]
+            if user_id is not None:
+                query += " AND sp.user_id = ?"
+                params.append(user_id)
+            query += " ORDER BY sp.id LIMIT ?"
+            params.append(batch_size)
+            rows = conn.execute(query, params).fetchall()
+            if not rows:
+                break
+
+            with conn:
+                for row in rows:
+                    stats["scanned"] += 1
+                    signature = _unpack(row["signature"]) if row["signature"] else None
+                    if row["indexed"] is None:
+                        signature = compute_signature(row["title"], row["abstract"])
+                        index_paper(conn, row["id"], row["user_id"], row["paper_id"],
+                                    row["title"], row["abstract"], signature)
+                        stats["indexed"] += 1
+
+                    match = find_duplicate(conn, row["user_id"], row["paper_id"], row["title"],
+                                           row["abstract"], signature, before_id=row["id"])
+                    # Only earlier rows are canonical, so each pair is handled once
+                    if not match:
+                        continue
+
+                    if action == "merge":
+                        old_id = merge_into(conn, match["saved_paper_id"], {
+                            "id": row["paper_id"], "title": row["title"],
+                            "authors": row["authors"].split(", ") if row["authors"] else [],
+                            "abstract": row["abstract"], "publication_date": row["publication_date"],
+                            "doi": row["doi"], "reading_list_id": row["reading_list_id"],
+                        })
+                        if old_id is not None:
+                            stats["renamed"].append((row["user_id"], old_id, row["paper_id"]))
+                        unindex_paper(conn, row["id"])
+                        conn.execute("DELETE FROM saved_papers WHERE id = ?", (row["id"],))
+                        stats["merged"] += 1
+                    else:
+                        flag_duplicate(conn, row["user_id"], row["id"], match)
+                        stats["flagged"] += 1
+
+            last_id = rows[-1]["id"]
+    finally:
+        conn.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="papers.db")
+    parser.add_argument("--user", help="only clean this user's library")
+    parser.add_argument("--action", choices=["flag", "merge"], default="flag")
+    args = parser.parse_args()
+    stats = dedup_library(args.db, args.user, args.action)
+    # The CLI works on papers.db, which also holds the full-text index
+    for user_id, old_id, new_id in stats.pop("renamed"):
+        fulltext.rename_paper(args.db, user_id, old_id, new_id)
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+PDF full-text extraction and indexing pipeline.
+
+Each saved paper gets a row in ``paper_fulltext_jobs`` that records how far
+ingestion got. PDFs are downloaded once into a local cache, parsed on a
+process pool so text extraction runs on every core, split into overlapping
+chunks and stored in the ``paper_chunks`` FTS5 index. Jobs that were
+interrupted (e.g. by a restart) are picked up again by ``resume()`` and
+skip any stage whose output already exists.
+"""
+
+import multiprocessing
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Optional
+
+import requests
+
+ARXIV_PDF_URL = os.getenv("ARXIV_PDF_URL", "https://arxiv.org/pdf/{paper_id}.pdf")
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# A PDF the parser chokes on must not hold its job forever
+EXTRACT_TIMEOUT = 300.0
+
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+
+# Title and abstract words used to look for related papers in full text
+RELATED_QUERY_TERMS = 32
+
+STATUS_PENDING = "pending"
+STATUS_DOWNLOADING = "downloading"
+STATUS_EXTRACTING = "extracting"
+STATUS_INDEXED = "indexed"
+STATUS_FAILED = "failed"
+
+
+def init_fulltext_tables(conn: sqlite3.Connection):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS paper_fulltext_jobs (
+            user_id TEXT NOT NULL,
+            paper_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            chunk_count INTEGER DEFAULT 0,
+            error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, paper_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS paper_chunks USING fts5(
+            user_id UNINDEXED,
+            paper_id UNINDEXED,
+            chunk_index UNINDEXED,
+            content
+        )
+    """)
+
+
+# ==============================
+# ⚙️ WORKER-SIDE FUNCTIONS
+# ==============================
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """Extracts plain text from a PDF. Runs inside a worker process."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    pages = []
+    for page in reader.pages:
+        try:
+            pages.append(page.extract_text() or "")
+        except Exception:
+            # One broken page should not sink the whole paper
+            pages.append("")
+    return "\n".join(pages)
+
+
+def chunk_text(text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    words = text.split()
+    if not words:
+        return []
+    step = max(size - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return chunks
+
+
+# ==============================
+# 🏭 PIPELINE
+# ==============================
+
+class FullTextPipeline:
+    """Background ingestion of saved papers into the full-text index."""
+
+    def __init__(self, db_path: str, cache_dir: str = "pdf_cache",
+                 workers: Optional[int] = None, download_concurrency: int = 4,
+                 extract_timeout: float = EXTRACT_TIMEOUT):
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.download_concurrency = download_concurrency
+        self.extract_timeout = extract_timeout
+        self._process_pool = None
+        self._job_pool = None
+        self._lock = threading.Lock()
+        self._in_flight = set()
+
+    # ---- lifecycle ----
+
+    def _pools(self):
+        with self._lock:
+            if self._process_pool is None:
+                # spawn, not fork: the server process is multi-threaded
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                # Job threads mostly wait on downloads and on the process
+                # pool, so allow enough of them to keep every worker busy.
+                self._job_pool = ThreadPoolExecutor(
+                    max_workers=self.workers + self.download_concurrency,
+                    thread_name_prefix="fulltext",
+                )
+            return self._process_pool, self._job_pool
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            process_pool, job_pool = self._process_pool, self._job_pool
+            self._process_pool = self._job_pool = None
+        # Outside the lock: finishing jobs need it to clear their in-flight flag
+        if job_pool is not None:
+            job_pool.shutdown(wait=wait, cancel_futures=not wait)
+            process_pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    # ---- job bookkeeping ----
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _set_status(self, user_id: str, paper_id: str, status: str,
+                    error: Optional[str] = None, chunk_count: Optional[int] = None):
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                INSERT INTO paper_fulltext_jobs (user_id, paper_id, status, error, chunk_count)
+                VALUES (?, ?, ?, ?, COALESCE(?, 0))
+                ON CONFLICT (user_id, paper_id) DO UPDATE SET
+                    status = excluded.status,
+                    error = excluded.error,
+                    chunk_count = COALESCE(?, chunk_count),
+                    updated_at = CURRENT_TIMESTAMP
+            """, (user_id, paper_id, status, error, chunk_count, chunk_count))
+        conn.close()
+
+    def get_status(self, user_id: str, paper_id: str) -> Optional[dict]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT * FROM paper_fulltext_jobs WHERE user_id = ? AND paper_id = ?",
+            (user_id, paper_id)
+        ).fetchone()
+        conn.close()
+        if not row:
+            return None
+        return {
+            "paper_id": row["paper_id"],
+            "status": row["status"],
+            "chunk_count": row["chunk_count"],
+            "error": row["error"],
+            "updated_at": row["updated_at"],
+        }
+
+    # ---- scheduling ----
+
+    def enqueue(self, user_id: str, paper_id: str, force: bool = False) -> bool:
+        """
+        Schedules ingestion of one paper. Returns False if it is already
+        running, or already indexed and ``force`` is not set.
+        """
+        key = (user_id, paper_id)
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            status = self.get_status(user_id, paper_id)
+            if status and status["status"] == STATUS_INDEXED and not force:
+                return False
+            self._in_flight.add(key)
+
+        if not status or force or status["status"] == STATUS_FAILED:
+            self._set_status(user_id, paper_id, STATUS_PENDING)
+
+        process_pool, job_pool = self._pools()
+        job_pool.submit(self._run_job, user_id, paper_id, process_pool)
+        return True
+
+    def resume(self) -> int:
+        """Re-schedules every job that did not reach a terminal state."""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT user_id, paper_id FROM paper_fulltext_jobs WHERE status NOT IN (?, ?)",
+            (STATUS_INDEXED, STATUS_FAILED)
+        ).fetchall()
+        conn.close()
+        return sum(1 for row in rows if self.enqueue(row["user_id"], row["paper_id"]))
+
+    # ---- stages ----
+
+    def pdf_path(self, paper_id: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", paper_id)
+        return os.path.join(self.cache_dir, f"{safe_name}.pdf")
+
+    def _download(self, paper_id: str) -> str:
+        path = self.pdf_path(paper_id)
+        if os.path.exists(path):
+            return path
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        response = requests.get(
+            ARXIV_PDF_URL.format(paper_id=paper_id),
+            headers={"User-Agent": USER_AGENT},
+            timeout=60,
+            stream=True,
+        )
+        if response.status_code != 200:
+            raise Exception(f"PDF download returned HTTP {response.status_code}")
+
+        # Write to a temp file first so a crash never leaves a truncated PDF
+        # that a resumed job would mistake for a finished download. Each
+        # download gets its own, since other users may fetch the same paper.
+        tmp = tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, prefix=os.path.basename(path) + ".", suffix=".part", delete=False
+        )
+        try:
+            with tmp:
+                for block in response.iter_content(chunk_size=64 * 1024):
+                    tmp.write(block)
+            os.replace(tmp.name, path)
+        except BaseException:
+            os.remove(tmp.name)
+            raise
+        finally:
+            response.close()
+        return path
+
+    def _index(self, user_id: str, paper_id: str, chunks: List[str]):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM paper_chunks WHERE user_id = ? AND paper_id = ?",
+                (user_id, paper_id)
+            )
+            conn.executemany(
+                "INSERT INTO paper_chunks (user_id, paper_id, chunk_index, content) VALUES (?, ?, ?, ?)",
+                [(user_id, paper_id, i, chunk) for i, chunk in enumerate(chunks)]
+            )
+            conn.execute("""
+                UPDATE paper_fulltext_jobs
+                SET status = ?, chunk_count = ?, error = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = ? AND paper_id = ?
+            """, (STATUS_INDEXED, len(chunks), user_id, paper_id))
+        conn.close()
+
+    def _run_job(self, user_id: str, paper_id: str, process_pool: ProcessPoolExecutor):
+        try:
+            self._set_status(user_id, paper_id, STATUS_DOWNLOADING)
+            path = self._download(paper_id)
+
+            self._set_status(user_id, paper_id, STATUS_EXTRACTING)
+            future = process_pool.submit(extract_pdf_text, path)
+            try:
+                text = future.result(timeout=self.extract_timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                raise Exception(f"Text extraction timed out after {self.extract_timeout:g}s")
+
+            self._index(user_id, paper_id, chunk_text(text))
+        except Exception as e:
+            print(f"Full-text ingestion failed for {paper_id}: {e}")
+            self._set_status(user_id, paper_id, STATUS_FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._in_flight.discard((user_id, paper_id))
+
+
+# ==============================
+# 🔎 QUERYING
+# ==============================
+
+def search_fulltext(db_path: str, user_id: str, query: str, limit: int = 20) -> list:
+    """Ranks a user's indexed chunks against ``query`` and returns one hit per paper."""
+    # Quote each term so user input cannot inject FTS5 query syntax
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return []
+    match = " ".join(f'"{t}"' for t in terms)
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    # Over-fetch chunks, then keep the best-ranked chunk of each paper
+    rows = conn.execute("""
+        SELECT paper_id, rank, snippet(paper_chunks, 3, '[', ']', '...', 24) AS snippet
+        FROM paper_chunks
+        WHERE paper_chunks MATCH ? AND user_id = ?
+        ORDER BY rank
+        LIMIT ?
+    """, (match, user_id, limit * 5)).fetchall()
+    conn.close()
+
+    results = []
+    seen = set()
+    for row in rows:
+        if row["paper_id"] in seen:
+            continue
+        seen.add(row["paper_id"])
+        results.append({"paper_id": row["paper_id"], "score": -row["rank"], "snippet": row["snippet"]})
+        if len(results) >= limit:
+            break
+    return results
+
+
+def fulltext_similarity(db_path: str, user_id: str, paper: dict, limit: int = 50) -> dict:
+    """
+    Scores a user's other indexed papers by how well their full text matches
+    ``paper``'s title and abstract. Returns ``{paper_id: score}`` with the
+    best match scoring 1.0.
+    """
+    text = f"{paper.get('title', '')} {paper.get('abstract', '')}".lower()
+    terms = list(dict.fromkeys(t for t in re.findall(r"\w+", text) if len(t) > 3))[:RELATED_QUERY_TERMS]
+    if not terms:
+        return {}
+    match = " OR ".join(f'"{t}"' for t in terms)
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        SELECT paper_id, MIN(rank) AS best
+        FROM (
+            SELECT paper_id, rank FROM paper_chunks
+            WHERE paper_chunks MATCH ? AND user_id = ?
+            ORDER BY rank
+            LIMIT ?
+        )
+        WHERE paper_id != ?
+        GROUP BY paper_id
+    """, (match, user_id, limit * 5, paper.get("id", ""))).fetchall()
+    conn.close()
+
+    # FTS5 ranks are negative bm25 scores: lower is better
+    scores = {paper_id: -best for paper_id, best in rows if best < 0}
+    top = max(scores.values(), default=0.0)
+    return {paper_id: score / top for paper_id, score in scores.items()} if top else {}
+
+
+def rename_paper(db_path: str, user_id: str, old_id: str, new_id: str):
+    """
+    Re-keys a paper's job and chunks after its saved row took a newer
+    version's id. If the new id already has entries, the old ones are dropped.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    with conn:
+        exists = conn.execute(
+            "SELECT 1 FROM paper_fulltext_jobs WHERE user_id = ? AND paper_id = ?", (user_id, new_id)
+        ).fetchone()
+        for table in ("paper_fulltext_jobs", "paper_chunks"):
+            if exists:
+                conn.execute(f"DELETE FROM {table} WHERE user_id = ? AND paper_id = ?", (user_id, old_id))
+            else:
+                conn.execute(
+                    f"UPDATE {table} SET paper_id = ? WHERE user_id = ? AND paper_id = ?", (new_id, user_id, old_id)
+                )
+    conn.close()
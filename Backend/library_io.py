@@ -0,0 +1,554 @@
+"""
+Streaming import/export of saved-paper libraries.
+
+Exports walk ``saved_papers`` in keyset-paginated batches so memory stays
+constant regardless of library size. Imports parse the uploaded file one
+record at a time and insert in batched transactions, skipping any
+``paper_id`` the user already has and running the same version and
+near-duplicate checks as saving a single paper.
+"""
+
+import json
+import re
+import sqlite3
+from typing import Iterable, Iterator, Optional, TextIO
+
+import dedup
+
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 500
+
+EXPORT_MEDIA_TYPES = {
+    "bibtex": "application/x-bibtex",
+    "ris": "application/x-research-info-systems",
+    "jsonl": "application/x-ndjson",
+}
+
+EXPORT_EXTENSIONS = {
+    "bibtex": "bib",
+    "ris": "ris",
+    "jsonl": "jsonl",
+}
+
+ARXIV_URL_RE = re.compile(r"arxiv\.org/(?:abs|pdf)/([^\s?#]+?)(?:\.pdf)?$")
+
+
+# ==============================
+# 📤 EXPORT
+# ==============================
+
+def iter_saved_papers(db_path: str, user_id: str, reading_list_id: Optional[int] = None,
+                      batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """
+    Yields a user's saved papers in insertion order.
+
+    Each batch uses a short-lived connection and resumes from the last seen
+    row id, so no read transaction is held open while the client downloads.
+    """
+    last_id = 0
+    while True:
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        query = """
+            SELECT id, paper_id, title, authors, abstract, publication_date, doi
+            FROM saved_papers
+            WHERE user_id = ? AND id > ?
+        """
+        params = [user_id, last_id]
+        if reading_list_id is not None:
+            query += " AND reading_list_id = ?"
+            params.append(reading_list_id)
+        query += " ORDER BY id LIMIT ?"
+        params.append(batch_size)
+
+        cursor.execute(query, tuple(params))
+        rows = cursor.fetchall()
+        conn.close()
+
+        if not rows:
+            return
+
+        for row in rows:
+            yield {
+                "id": row["paper_id"],
+                "title": row["title"],
+                "authors": row["authors"].split(", ") if row["authors"] else [],
+                "abstract": row["abstract"] or "",
+                "publication_date": row["publication_date"] or "",
+                "doi": row["doi"] or "",
+            }
+
+        last_id = rows[-1]["id"]
+        if len(rows) < batch_size:
+            return
+
+
+# Braces not escaped with a backslash delimit BibTeX values
+_BIBTEX_BRACE = re.compile(r"(?<!\\)[{}]")
+
+
+def _balanced(text: str) -> bool:
+    depth = 0
+    for match in _BIBTEX_BRACE.finditer(text):
+        depth += 1 if match.group() == "{" else -1
+        if depth < 0:
+            return False
+    return depth == 0
+
+
+def _bibtex_value(value: str) -> str:
+    # Balanced braces are kept so they still protect case ("On {B}ayes");
+    # a stray one would end the value early, so then every brace is escaped
+    if not _balanced(value):
+        value = _BIBTEX_BRACE.sub(lambda match: "\\" + match.group(), value)
+    # A trailing backslash would escape the closing brace
+    return value + " " if value.endswith("\\") else value
+
+
+def _bibtex_unescape(value: str) -> str:
+    return value.replace("\\{", "{").replace("\\}", "}")
+
+
+def _bibtex_key(paper_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.:-]", "_", paper_id) or "paper"
+
+
+def format_bibtex(paper: dict) -> str:
+    fields = [
+        ("title", paper["title"]),
+        ("author", " and ".join(paper["authors"])),
+        ("year", paper["publication_date"]),
+        ("eprint", paper["id"]),
+    ]
+    doi = paper["doi"]
+    if doi.startswith("http"):
+        fields.append(("url", doi))
+    elif doi:
+        fields.append(("doi", doi))
+    fields.append(("abstract", paper["abstract"]))
+
+    body = ",\n".join(f"  {name} = {{{_bibtex_value(value)}}}" for name, value in fields if value)
+    return f"@article{{{_bibtex_key(paper['id'])},\n{body}\n}}\n\n"
+
+
+def format_ris(paper: dict) -> str:
+    lines = ["TY  - JOUR", f"ID  - {paper['id']}", f"TI  - {paper['title']}"]
+    for author in paper["authors"]:
+        lines.append(f"AU  - {author}")
+    if paper["publication_date"]:
+        lines.append(f"PY  - {paper['publication_date']}")
+    if paper["abstract"]:
+        # Later lines of a multi-line abstract go out as continuation lines
+        first, *rest = paper["abstract"].splitlines() or [""]
+        lines.append(f"AB  - {first}")
+        lines.extend(rest)
+    doi = paper["doi"]
+    if doi.startswith("http"):
+        lines.append(f"UR  - {doi}")
+    elif doi:
+        lines.append(f"DO  - {doi}")
+    lines.append("ER  - ")
+    return "\n".join(lines) + "\n\n"
+
+
+def format_jsonl(paper: dict) -> str:
+    return json.dumps(paper, ensure_ascii=False) + "\n"
+
+
+FORMATTERS = {
+    "bibtex": format_bibtex,
+    "ris": format_ris,
+    "jsonl": format_jsonl,
+}
+
+
+def stream_export(papers: Iterable[dict], fmt: str) -> Iterator[str]:
+    """Renders papers one by one in the requested format."""
+    formatter = FORMATTERS[fmt]
+    for paper in papers:
+        yield formatter(paper)
+
+
+# ==============================
+# 📝 LOCAL CITATIONS
+# ==============================
+
+def _surname(author: str) -> str:
+    return author.split()[-1] if author.split() else author
+
+
+def _initials(author: str) -> str:
+    return " ".join(f"{name[0]}." for name in author.split()[:-1])
+
+
+def _author_list(authors: list, style: str) -> str:
+    if not authors:
+        return "Anonymous"
+    if style == "APA":
+        names = [f"{_surname(a)}, {_initials(a)}".rstrip(", ") for a in authors[:20]]
+        return names[0] if len(names) == 1 else ", ".join(names[:-1]) + ", & " + names[-1]
+    if style == "IEEE":
+        names = [f"{_initials(a)} {_surname(a)}".strip() for a in authors[:6]]
+        return ", ".join(names) + (" et al." if len(authors) > 6 else "")
+    # MLA, Chicago and Harvard lead with "Surname, Given"
+    first = authors[0].split()
+    lead = f"{first[-1]}, {' '.join(first[:-1])}".rstrip(", ") if first else authors[0]
+    if len(authors) == 1:
+        return lead
+    if len(authors) == 2 and style != "MLA":
+        return f"{lead} and {authors[1]}"
+    return f"{lead}, et al."
+
+
+def format_citation(paper: dict, fmt: str) -> str:
+    """
+    Template-based citation in one of the supported styles. Used when the
+    LLM is unavailable; less polished, but always available.
+    """
+    title = paper["title"].rstrip(".")
+    year = paper.get("publication_date") or "n.d."
+    url = f"https://arxiv.org/abs/{paper['id']}"
+    authors = paper.get("authors") or []
+
+    if fmt == "BibTeX":
+        return format_bibtex({**paper, "doi": paper.get("doi") or "", "abstract": ""}).strip()
+    if fmt == "APA":
+        return f"{_author_list(authors, 'APA')} ({year}). {title}. arXiv. {url}"
+    if fmt == "MLA":
+        return f"{_author_list(authors, 'MLA').rstrip('.')}. \"{title}.\" arXiv, {year}, {url}."
+    if fmt == "Chicago":
+        return f"{_author_list(authors, 'Chicago').rstrip('.')}. {year}. \"{title}.\" arXiv. {url}."
+    if fmt == "Harvard":
+        return f"{_author_list(authors, 'Harvard')} ({year}) '{title}', arXiv. Available at: {url}."
+    if fmt == "IEEE":
+        return f"{_author_list(authors, 'IEEE')}, \"{title},\" arXiv:{paper['id']}, {year}."
+    raise ValueError(f"Unsupported citation format: {fmt}")
+
+
+# ==============================
+# 📥 IMPORT PARSERS
+# ==============================
+
+def _paper_id_from_url(url: str) -> Optional[str]:
+    match = ARXIV_URL_RE.search(url.strip())
+    return match.group(1) if match else None
+
+
+def _normalize_record(paper_id: Optional[str], title: Optional[str], authors: list,
+                      abstract: Optional[str], year: Optional[str], doi: Optional[str]) -> Optional[dict]:
+    """Builds a saved-paper dict, or None if the record is unusable."""
+    doi = (doi or "").strip()
+    if not paper_id and doi:
+        paper_id = _paper_id_from_url(doi) or doi
+    if not paper_id or not title:
+        return None
+    return {
+        "id": paper_id.strip(),
+        "title": " ".join(title.split()),
+        "authors": [a.strip() for a in authors if a.strip()],
+        "abstract": (abstract or "").strip(),
+        "publication_date": (year or "").strip()[:4],
+        "doi": doi,
+    }
+
+
+def parse_jsonl(stream: TextIO) -> Iterator[Optional[dict]]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        if not isinstance(data, dict):
+            yield None
+            continue
+        authors = data.get("authors") or []
+        if isinstance(authors, str):
+            authors = authors.split(", ")
+        yield _normalize_record(
+            data.get("id") or data.get("paper_id"),
+            data.get("title"),
+            authors,
+            data.get("abstract"),
+            str(data.get("publication_date") or ""),
+            data.get("doi"),
+        )
+
+
+RIS_LINE_RE = re.compile(r"^([A-Z][A-Z0-9])  -(?: (.*))?$")
+
+
+def parse_ris(stream: TextIO) -> Iterator[Optional[dict]]:
+    record = None
+    last_tag = None
+    for raw in stream:
+        line = raw.rstrip("\r\n")
+        match = RIS_LINE_RE.match(line)
+        if not match:
+            # Continuation line: the value carries on over a line break
+            if record is not None and last_tag:
+                record[last_tag][-1] += "\n" + line.strip()
+            continue
+
+        tag, value = match.group(1), (match.group(2) or "").strip()
+        if tag == "TY":
+            record = {}
+            last_tag = None
+            continue
+        if record is None:
+            continue
+        if tag == "ER":
+            yield _ris_to_paper(record)
+            record = None
+            last_tag = None
+            continue
+        record.setdefault(tag, []).append(value)
+        last_tag = tag
+
+    if record:
+        yield _ris_to_paper(record)
+
+
+def _ris_first(record: dict, *tags: str) -> Optional[str]:
+    for tag in tags:
+        if record.get(tag):
+            return record[tag][0]
+    return None
+
+
+def _ris_to_paper(record: dict) -> Optional[dict]:
+    url = _ris_first(record, "UR", "L1")
+    doi = _ris_first(record, "DO") or url
+    paper_id = _ris_first(record, "ID") or (_paper_id_from_url(url) if url else None)
+    return _normalize_record(
+        paper_id,
+        _ris_first(record, "TI", "T1"),
+        record.get("AU", []) + record.get("A1", []),
+        _ris_first(record, "AB", "N2"),
+        _ris_first(record, "PY", "Y1", "DA"),
+        doi,
+    )
+
+
+def _split_bibtex_fields(body: str) -> dict:
+    """Parses ``name = {value}`` / ``"value"`` / bare pairs of one entry body."""
+    fields = {}
+    i, n = 0, len(body)
+    while i < n:
+        eq = body.find("=", i)
+        if eq == -1:
+            break
+        name = body[i:eq].strip().strip(",").strip().lower()
+        j = eq + 1
+        while j < n and body[j].isspace():
+            j += 1
+        if j >= n:
+            break
+
+        if body[j] == "{":
+            depth, k = 0, j
+            while k < n:
+                if body[k - 1] == "\\":
+                    pass
+                elif body[k] == "{":
+                    depth += 1
+                elif body[k] == "}":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                k += 1
+            value = body[j + 1:k]
+            i = k + 1
+        elif body[j] == '"':
+            k = body.find('"', j + 1)
+            k = n if k == -1 else k
+            value = body[j + 1:k]
+            i = k + 1
+        else:
+            k = body.find(",", j)
+            k = n if k == -1 else k
+            value = body[j:k].strip()
+            i = k
+
+        # Skip to the next field
+        comma = body.find(",", i)
+        i = n if comma == -1 else comma + 1
+        if name:
+            fields[name] = value.strip()
+    return fields
+
+
+def _bibtex_to_paper(entry: str) -> Optional[dict]:
+    open_brace = entry.find("{")
+    if open_brace == -1:
+        return None
+    entry_type = entry[1:open_brace].strip().lower()
+    if entry_type in ("comment", "preamble", "string"):
+        return None
+
+    inner = entry[open_brace + 1:entry.rfind("}")]
+    key, _, body = inner.partition(",")
+    fields = _split_bibtex_fields(body)
+
+    title = fields.get("title", "")
+    # Braces protecting words ("On {B}ayes") are kept; only a pair wrapping
+    # the whole title ({{Title}}) is dropped
+    if title.startswith("{") and title.endswith("}") and _balanced(title[1:-1]):
+        title = title[1:-1]
+    fields = {name: _bibtex_unescape(value) for name, value in fields.items()}
+
+    url = fields.get("url", "")
+    doi = fields.get("doi") or url
+    paper_id = fields.get("eprint") or (_paper_id_from_url(url) if url else None) or key.strip()
+    authors = re.split(r"\s+and\s+", fields.get("author", "")) if fields.get("author") else []
+    return _normalize_record(
+        paper_id,
+        _bibtex_unescape(title),
+        authors,
+        fields.get("abstract"),
+        fields.get("year"),
+        doi,
+    )
+
+
+def parse_bibtex(stream: TextIO) -> Iterator[Optional[dict]]:
+    buffer = []
+    depth = 0
+    for line in stream:
+        if not buffer:
+            at = line.find("@")
+            if at == -1:
+                continue
+            line = line[at:]
+        buffer.append(line)
+        braces = _BIBTEX_BRACE.findall(line)
+        depth += braces.count("{") - braces.count("}")
+        if depth <= 0 and "{" in "".join(buffer):
+            entry = "".join(buffer).strip()
+            buffer = []
+            depth = 0
+            kind = entry[1:entry.find("{")].strip().lower()
+            if kind in ("comment", "preamble", "string"):
+                continue
+            yield _bibtex_to_paper(entry)
+
+    if buffer:
+        yield _bibtex_to_paper("".join(buffer).strip())
+
+
+PARSERS = {
+    "bibtex": parse_bibtex,
+    "ris": parse_ris,
+    "jsonl": parse_jsonl,
+}
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    if not filename:
+        return None
+    ext = filename.rsplit(".", 1)[-1].lower()
+    return {
+        "bib": "bibtex",
+        "bibtex": "bibtex",
+        "ris": "ris",
+        "jsonl": "jsonl",
+        "ndjson": "jsonl",
+    }.get(ext)
+
+
+# ==============================
+# 💾 BATCHED INSERT
+# ==============================
+
+def _insert_batch(conn: sqlite3.Connection, batch: list, user_id: str,
+                  reading_list_id: Optional[int], near_duplicate_action: str, stats: dict):
+    cursor = conn.cursor()
+    placeholders = ", ".join("?" for _ in batch)
+    cursor.execute(
+        f"SELECT paper_id FROM saved_papers WHERE user_id = ? AND paper_id IN ({placeholders})",
+        (user_id, *[p["id"] for p in batch]),
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+
+    with conn:
+        for paper in batch:
+            if paper["id"] in existing:
+                stats["skipped"] += 1
+                continue
+            existing.add(paper["id"])
+
+            # Same checks as saving a single paper. Rows inserted earlier in
+            # this transaction are visible, so v1 and v2 in one file merge too.
+            signature = dedup.compute_signature(paper["title"], paper["abstract"])
+            match = dedup.find_duplicate(
+                conn, user_id, paper["id"], paper["title"], paper["abstract"], signature
+            )
+            if match and (match["reason"] == "version" or near_duplicate_action == "merge"):
+                old_id = dedup.merge_into(conn, match["saved_paper_id"], {**paper, "reading_list_id": reading_list_id})
+                if old_id is not None:
+                    stats["renamed"].append((user_id, old_id, paper["id"]))
+                stats["merged"] += 1
+                continue
+
+            cursor.execute("""
+                INSERT INTO saved_papers
+                (paper_id, title, authors, abstract, publication_date, doi, user_id, reading_list_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                paper["id"],
+                paper["title"],
+                ", ".join(paper["authors"]),
+                paper["abstract"],
+                paper["publication_date"],
+                paper["doi"],
+                user_id,
+                reading_list_id,
+            ))
+            saved_id = cursor.lastrowid
+            dedup.index_paper(conn, saved_id, user_id, paper["id"], paper["title"], paper["abstract"], signature)
+            stats["imported"] += 1
+            if match:
+                dedup.flag_duplicate(conn, user_id, saved_id, match)
+                stats["flagged"] += 1
+
+
+def import_papers(db_path: str, stream: TextIO, fmt: str, user_id: str,
+                  reading_list_id: Optional[int] = None,
+                  batch_size: int = IMPORT_BATCH_SIZE,
+                  near_duplicate_action: str = "flag") -> dict:
+    """
+    Parses ``stream`` incrementally and inserts papers in batched transactions.
+
+    Papers whose ``paper_id`` is already saved for the user (or repeated in
+    the file) are skipped. Other arXiv versions of a saved paper are merged
+    into it; near-duplicates are flagged, or merged with
+    ``near_duplicate_action="merge"``. Returns import statistics;
+    ``stats["renamed"]`` lists ``(user_id, old_paper_id, new_paper_id)``
+    for saved rows that took a newer version's id.
+    """
+    parser = PARSERS[fmt]
+    conn = sqlite3.connect(db_path)
+    stats = {"imported": 0, "skipped": 0, "invalid": 0, "merged": 0, "flagged": 0, "renamed": []}
+    batch = []
+
+    try:
+        for paper in parser(stream):
+            if paper is None:
+                stats["invalid"] += 1
+                continue
+            batch.append(paper)
+            if len(batch) >= batch_size:
+                _insert_batch(conn, batch, user_id, reading_list_id, near_duplicate_action, stats)
+                batch = []
+
+        if batch:
+            _insert_batch(conn, batch, user_id, reading_list_id, near_duplicate_action, stats)
+    finally:
+        conn.close()
+
+    return stats
@@ -0,0 +1,272 @@
+"""
+Materialized reading-list summaries.
+
+``reading_list_summaries`` holds one row per reading list with its paper
+count, the save time of its newest paper and a short preview of the newest
+titles. SQLite triggers on ``reading_lists`` and ``saved_papers`` keep it in
+step inside the writing transaction, so the list view is a single indexed
+read instead of a join and aggregate over the whole library.
+
+Counts are adjusted incrementally. The preview and last-added time are
+re-read from ``idx_saved_papers_list``, which touches at most
+``PREVIEW_SIZE`` index entries.
+
+Usage:
+    python list_summaries.py --db papers.db            # report drift
+    python list_summaries.py --db papers.db --repair   # report and fix
+"""
+
+import argparse
+import sqlite3
+from typing import Optional
+
+PREVIEW_SIZE = 3
+# Preview titles are stored joined by the ASCII unit separator, which is
+# several times cheaper to split on read than decoding a JSON array.
+PREVIEW_SEPARATOR = "\x1f"
+
+# Newest papers of a list, re-read through idx_saved_papers_list
+_PREVIEW_SQL = f"""
+    (SELECT COALESCE(group_concat(title, char(31)), '') FROM (
+        SELECT title FROM saved_papers
+        WHERE reading_list_id = {{list_id}}
+        ORDER BY id DESC LIMIT {PREVIEW_SIZE}
+    ))
+"""
+_LAST_ADDED_SQL = """
+    (SELECT created_at FROM saved_papers
+     WHERE reading_list_id = {list_id}
+     ORDER BY id DESC LIMIT 1)
+"""
+
+
+def _refresh(list_id: str, count_delta: str) -> str:
+    """UPDATE statement used by the triggers to refresh one summary row."""
+    return f"""
+        UPDATE reading_list_summaries
+        SET paper_count = paper_count {count_delta},
+            last_added_at = {_LAST_ADDED_SQL.format(list_id=list_id)},
+            recent_titles = {_PREVIEW_SQL.format(list_id=list_id)}
+        WHERE reading_list_id = {list_id};
+    """
+
+
+TRIGGERS = {
+    "trg_reading_lists_insert": """
+        AFTER INSERT ON reading_lists
+        BEGIN
+            INSERT OR REPLACE INTO reading_list_summaries
+            (reading_list_id, user_id, name, description, created_at, paper_count, last_added_at, recent_titles)
+            VALUES (NEW.id, NEW.user_id, NEW.name, NEW.description, NEW.created_at, 0, NULL, '');
+        END
+    """,
+    "trg_reading_lists_update": """
+        AFTER UPDATE OF name, description ON reading_lists
+        BEGIN
+            UPDATE reading_list_summaries
+            SET name = NEW.name, description = NEW.description
+            WHERE reading_list_id = NEW.id;
+        END
+    """,
+    "trg_reading_lists_delete": """
+        AFTER DELETE ON reading_lists
+        BEGIN
+            DELETE FROM reading_list_summaries WHERE reading_list_id = OLD.id;
+        END
+    """,
+    "trg_saved_papers_insert": f"""
+        AFTER INSERT ON saved_papers
+        WHEN NEW.reading_list_id IS NOT NULL
+        BEGIN
+            {_refresh("NEW.reading_list_id", "+ 1")}
+        END
+    """,
+    "trg_saved_papers_delete": f"""
+        AFTER DELETE ON saved_papers
+        WHEN OLD.reading_list_id IS NOT NULL
+        BEGIN
+            {_refresh("OLD.reading_list_id", "- 1")}
+        END
+    """,
+    "trg_saved_papers_move": f"""
+        AFTER UPDATE OF reading_list_id ON saved_papers
+        WHEN OLD.reading_list_id IS NOT NEW.reading_list_id
+        BEGIN
+            {_refresh("OLD.reading_list_id", "- 1")}
+            {_refresh("NEW.reading_list_id", "+ 1")}
+        END
+    """,
+    # A merged newer version can retitle a paper that is in the preview
+    "trg_saved_papers_retitle": f"""
+        AFTER UPDATE OF title ON saved_papers
+        WHEN NEW.reading_list_id IS NOT NULL AND OLD.reading_list_id IS NEW.reading_list_id
+        BEGIN
+            {_refresh("NEW.reading_list_id", "+ 0")}
+        END
+    """,
+}
+
+
+# ==============================
+# 🗄️ SCHEMA
+# ==============================
+
+def init_summary_tables(conn: sqlite3.Connection):
+    """Creates the summary table, its triggers and backfills missing rows."""
+    cursor = conn.cursor()
+    # Membership lookups (counts, previews, list deletes) go through this
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_saved_papers_list
+        ON saved_papers (reading_list_id, id)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reading_list_summaries (
+            reading_list_id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP,
+            paper_count INTEGER NOT NULL DEFAULT 0,
+            last_added_at TIMESTAMP,
+            recent_titles TEXT NOT NULL DEFAULT ''
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reading_list_summaries_user
+        ON reading_list_summaries (user_id, created_at DESC, reading_list_id DESC)
+    """)
+    for name, body in TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    # Databases created before the summaries existed
+    cursor.execute("""
+        SELECT rl.id FROM reading_lists rl
+        WHERE NOT EXISTS (SELECT 1 FROM reading_list_summaries s WHERE s.reading_list_id = rl.id)
+    """)
+    missing = [row[0] for row in cursor.fetchall()]
+    if missing:
+        rebuild_summaries(conn, missing)
+
+
+def rebuild_summaries(conn: sqlite3.Connection, list_ids: Optional[list] = None):
+    """Recomputes summary rows from the base tables (all lists by default)."""
+    query = f"""
+        INSERT OR REPLACE INTO reading_list_summaries
+        (reading_list_id, user_id, name, description, created_at, paper_count, last_added_at, recent_titles)
+        SELECT rl.id, rl.user_id, rl.name, rl.description, rl.created_at,
+               (SELECT COUNT(*) FROM saved_papers WHERE reading_list_id = rl.id),
+               {_LAST_ADDED_SQL.format(list_id="rl.id")},
+               {_PREVIEW_SQL.format(list_id="rl.id")}
+        FROM reading_lists rl
+    """
+    if list_ids is None:
+        conn.execute(query)
+        return
+    for start in range(0, len(list_ids), 500):
+        chunk = list_ids[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        conn.execute(f"{query} WHERE rl.id IN ({placeholders})", chunk)
+
+
+# ==============================
+# 📖 READS
+# ==============================
+
+def _split_preview(value: str) -> list:
+    return value.split(PREVIEW_SEPARATOR) if value else []
+
+
+def list_summaries(conn: sqlite3.Connection, user_id: str, list_id: Optional[int] = None) -> list:
+    """A user's list summaries, newest first; only ``list_id``'s if given."""
+    query = """
+        SELECT reading_list_id, name, description, created_at, paper_count, last_added_at, recent_titles
+        FROM reading_list_summaries
+        WHERE user_id = ?
+    """
+    params = [user_id]
+    if list_id is not None:
+        query += " AND reading_list_id = ?"
+        params.append(list_id)
+    cursor = conn.execute(query + " ORDER BY created_at DESC, reading_list_id DESC", params)
+    return [{
+        "id": row[0],
+        "name": row[1],
+        "description": row[2],
+        "paper_count": row[4],
+        "created_at": row[3],
+        "last_added_at": row[5],
+        "recent_titles": _split_preview(row[6]),
+    } for row in cursor.fetchall()]
+
+
+# ==============================
+# 🩺 CONSISTENCY CHECK
+# ==============================
+
+def check_summaries(conn: sqlite3.Connection, user_id: Optional[str] = None, repair: bool = False) -> list:
+    """
+    Compares every summary row with a fresh aggregate over the base tables.
+    Returns one ``{"reading_list_id", "field", "expected", "actual"}`` entry
+    per mismatch, and rewrites the affected rows when ``repair`` is set.
+    """
+    user_filter = "WHERE rl.user_id = ?" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+    cursor = conn.execute(f"""
+        SELECT rl.id, rl.name, rl.description,
+               (SELECT COUNT(*) FROM saved_papers WHERE reading_list_id = rl.id),
+               {_LAST_ADDED_SQL.format(list_id="rl.id")},
+               {_PREVIEW_SQL.format(list_id="rl.id")},
+               s.reading_list_id, s.name, s.description, s.paper_count, s.last_added_at, s.recent_titles
+        FROM reading_lists rl
+        LEFT JOIN reading_list_summaries s ON s.reading_list_id = rl.id
+        {user_filter}
+    """, params)
+
+    fields = ("name", "description", "paper_count", "last_added_at", "recent_titles")
+    problems = []
+    for row in cursor.fetchall():
+        list_id = row[0]
+        if row[6] is None:
+            problems.append({"reading_list_id": list_id, "field": "row", "expected": "present", "actual": None})
+            continue
+        for field, expected, actual in zip(fields, row[1:6], row[7:12]):
+            if field == "recent_titles":
+                expected, actual = _split_preview(expected), _split_preview(actual)
+            if expected != actual:
+                problems.append({"reading_list_id": list_id, "field": field,
+                                 "expected": expected, "actual": actual})
+
+    orphan_filter = "AND s.user_id = ?" if user_id is not None else ""
+    cursor = conn.execute(f"""
+        SELECT s.reading_list_id FROM reading_list_summaries s
+        WHERE NOT EXISTS (SELECT 1 FROM reading_lists rl WHERE rl.id = s.reading_list_id) {orphan_filter}
+    """, params)
+    orphans = [row[0] for row in cursor.fetchall()]
+    problems.extend({"reading_list_id": list_id, "field": "row", "expected": None, "actual": "present"}
+                    for list_id in orphans)
+
+    if repair and problems:
+        with conn:
+            conn.executemany("DELETE FROM reading_list_summaries WHERE reading_list_id = ?",
+                             [(list_id,) for list_id in orphans])
+            rebuild_summaries(conn, sorted({p["reading_list_id"] for p in problems} - set(orphans)))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="papers.db")
+    parser.add_argument("--user", help="only check this user's lists")
+    parser.add_argument("--repair", action="store_true", help="rebuild rows that drifted")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    problems = check_summaries(conn, args.user, args.repair)
+    conn.close()
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} mismatch(es){' repaired' if args.repair and problems else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Batched multi-paper LLM prompts.
+
+Packs many citation requests (papers x formats) or related-paper
+candidates into as few model calls as a token budget allows. Sizes come
+from a local token estimator, so no tokenizer round trip is needed.
+Responses are structured JSON keyed back to each request. When a response
+cannot be parsed, or only covers part of the batch, the missing requests
+are retried in smaller batches, down to one request per call, at most
+``MAX_SPLIT_DEPTH`` splits deep and ``MAX_RETRIES_PER_BATCH`` retries per
+packed batch. Whatever is still unanswered then is reported as failed, and
+the caller falls back to its local answer for it.
+
+The model call itself is injected as ``complete(prompt) -> str``, so this
+module does not depend on a particular client. Errors raised by
+``complete`` (quota, network) propagate unchanged; only unusable output
+triggers a split. Packing, prompt building and parsing are profiled as
+``llm.pack``, ``llm.build`` and ``llm.parse`` stages.
+"""
+
+import json
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import profiling
+
+# Room for the related view's 60 trimmed candidates (~15k tokens) in one call
+PROMPT_TOKEN_BUDGET = 20000
+OUTPUT_TOKEN_BUDGET = 4000
+CITATION_OUTPUT_TOKENS = 90
+RELATED_OUTPUT_TOKENS = 300
+TARGET_ABSTRACT_TOKENS = 400
+CANDIDATE_ABSTRACT_TOKENS = 220
+MAX_RELATED_RESULTS = 3
+MAX_SPLIT_DEPTH = 3
+MAX_RETRIES_PER_BATCH = 6
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+# ==============================
+# 🔢 TOKEN BUDGETS
+# ==============================
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximates a subword tokenizer: one token per punctuation mark and
+    per short word, plus one for every further six characters of a word.
+    Errs slightly high for English prose.
+    """
+    tokens = 0
+    for piece in _TOKEN_RE.findall(text):
+        tokens += 1 + (len(piece) - 1) // 6
+    return tokens
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text at a word boundary so it fits in ``max_tokens``."""
+    text = " ".join((text or "").split())
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for word in text.split(" "):
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens:
+            break
+        kept.append(word)
+        used += cost
+    return " ".join(kept) + " ..."
+
+
+def pack_batches(items: list, costs: List[Tuple[int, int]], prompt_budget: int,
+                 output_budget: int, base_cost: int) -> List[list]:
+    """
+    Greedily groups ``items`` in order. ``costs[i]`` is the (prompt, output)
+    token estimate of item i; a batch is closed when either budget would
+    be exceeded. An item too large for an empty batch still gets its own.
+    """
+    batches = []
+    current = []
+    prompt_used = base_cost
+    output_used = 0
+    for item, (prompt_cost, output_cost) in zip(items, costs):
+        if current and (prompt_used + prompt_cost > prompt_budget or output_used + output_cost > output_budget):
+            batches.append(current)
+            current = []
+            prompt_used = base_cost
+            output_used = 0
+        current.append(item)
+        prompt_used += prompt_cost
+        output_used += output_cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _extract_json_array(text: str):
+    """Parses the JSON array in a model response, tolerating code fences."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```[a-zA-Z]*\s*|\s*```$", "", text)
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        raise ValueError("no JSON array in response")
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, list):
+        raise ValueError("response is not a JSON array")
+    return data
+
+
+# ==============================
+# 📚 CITATIONS
+# ==============================
+
+CITATION_HEADER = """
+You are an academic citation expert.
+Generate citations for every request below, in each of the formats it lists.
+
+Rules:
+- Format each citation strictly according to its style's standards.
+- Do NOT include explanations, markdown, or labels inside citations.
+- Return ONLY a raw JSON array (no markdown) with one object per citation:
+  [{"key": "<request key>", "format": "<format>", "citation": "<citation text>"}]
+
+Citation requests:
+"""
+
+
+def _citation_block(key: str, paper: dict, formats: List[str]) -> str:
+    return (
+        f"Key: {key}\n"
+        f"Formats: {', '.join(formats)}\n"
+        f"Title: {paper['title']}\n"
+        f"Authors: {', '.join(paper['authors'])}\n"
+        f"Publication Year: {paper['publication_date']}\n"
+        f"Journal/Source: arXiv\n"
+        f"DOI: {paper['doi']}\n"
+        f"URL: https://arxiv.org/abs/{paper['id']}\n"
+    )
+
+
+def build_citation_prompt(units: List[tuple]) -> str:
+    """``units`` are ``(key, paper, formats)`` tuples."""
+    return CITATION_HEADER + "\n".join(_citation_block(*unit) for unit in units)
+
+
+def parse_citation_response(text: str, units: List[tuple]) -> Dict[tuple, str]:
+    """Maps ``(key, format)`` to citation text for every usable entry."""
+    wanted = {(key, fmt) for key, _, formats in units for fmt in formats}
+    found = {}
+    for entry in _extract_json_array(text):
+        if not isinstance(entry, dict):
+            continue
+        pair = (str(entry.get("key", "")).strip(), str(entry.get("format", "")).strip())
+        citation = entry.get("citation")
+        if pair in wanted and isinstance(citation, str) and citation.strip():
+            found[pair] = citation.strip()
+    return found
+
+
+def batch_citations(requests: List[Tuple[dict, List[str]]], complete: Callable[[str], str],
+                    prompt_budget: int = PROMPT_TOKEN_BUDGET,
+                    output_budget: int = OUTPUT_TOKEN_BUDGET,
+                    unavailable: Tuple[type, ...] = (),
+                    on_result: Optional[Callable[[dict, str, str], None]] = None
+                    ) -> Tuple[List[Dict[str, Optional[str]]], dict]:
+    """
+    Generates citations for ``(paper, formats)`` requests. Returns one
+    ``{format: citation or None}`` dict per request, in order, and call
+    statistics ``{"calls", "retries", "failed", "unavailable"}``. A citation
+    is None, and counted in ``failed``, when the retry caps ran out before
+    the model answered it, or when ``complete`` raised one of the
+    ``unavailable`` exceptions for its batch (counted in ``unavailable``);
+    the other batches still run. ``on_result(paper, format, citation)`` is
+    called as each citation arrives.
+    """
+    units = [(f"p{i}", paper, list(formats)) for i, (paper, formats) in enumerate(requests)]
+    with profiling.stage("llm.pack"):
+        costs = [
+            (estimate_tokens(_citation_block(*unit)), CITATION_OUTPUT_TOKENS * len(unit[2]))
+            for unit in units
+        ]
+        base_cost = estimate_tokens(CITATION_HEADER)
+        batches = pack_batches(units, costs, prompt_budget, output_budget, base_cost)
+    results: Dict[tuple, str] = {}
+    stats = {"calls": 0, "retries": 0, "failed": 0, "unavailable": 0}
+
+    def run(batch: List[tuple], depth: int, retries: dict):
+        with profiling.stage("llm.build"):
+            prompt = build_citation_prompt(batch)
+        try:
+            text = complete(prompt)
+        except unavailable:
+            # Refused or timed out upstream: answers already in hand are kept
+            stats["unavailable"] += 1
+            stats["failed"] += sum(len(formats) for _, _, formats in batch)
+            return
+        stats["calls"] += 1
+        stats["retries"] += int(depth > 0)
+        with profiling.stage("llm.parse"):
+            try:
+                found = parse_citation_response(text, batch)
+            except ValueError:
+                found = {}
+                # A lone single-format request may come back as plain text
+                if len(batch) == 1 and len(batch[0][2]) == 1 and text.strip() and not text.lstrip().startswith(("[", "{", "```")):
+                    found = {(batch[0][0], batch[0][2][0]): text.strip()}
+        results.update(found)
+        if on_result is not None:
+            papers = {key: paper for key, paper, _ in batch}
+            for (key, fmt), citation in found.items():
+                on_result(papers[key], fmt, citation)
+
+        missing = []
+        for key, paper, formats in batch:
+            left = [fmt for fmt in formats if (key, fmt) not in found]
+            if left:
+                missing.append((key, paper, left))
+        if not missing:
+            return
+        if depth >= MAX_SPLIT_DEPTH or retries["left"] <= 0 or (
+                not found and len(missing) == 1 and len(missing[0][2]) == 1):
+            stats["failed"] += sum(len(formats) for _, _, formats in missing)
+            return
+        if found:
+            # Partial answer: the rest gets a fresh, smaller batch
+            parts = [missing]
+        elif len(missing) > 1:
+            mid = len(missing) // 2
+            parts = [missing[:mid], missing[mid:]]
+        else:
+            key, paper, formats = missing[0]
+            parts = [[(key, paper, [fmt])] for fmt in formats]
+        for i, part in enumerate(parts):
+            if retries["left"] <= 0:
+                stats["failed"] += sum(len(formats) for part in parts[i:] for _, _, formats in part)
+                return
+            retries["left"] -= 1
+            run(part, depth + 1, retries)
+
+    for batch in batches:
+        run(batch, 0, {"left": MAX_RETRIES_PER_BATCH})
+
+    output = [{fmt: results.get((key, fmt)) for fmt in formats} for key, _, formats in units]
+    return output, stats
+
+
+# ==============================
+# 🔗 RELATED PAPERS
+# ==============================
+
+def _words(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", (text or "").lower()) if len(w) > 3}
+
+
+def rank_by_overlap(target: dict, candidates: list,
+                    boost: Optional[Dict[str, float]] = None) -> List[Tuple[float, dict]]:
+    """
+    ``(score, paper)`` pairs, most word overlap with the target first. The
+    score is the Jaccard similarity plus ``boost[paper["id"]]``, if any
+    (e.g. a full-text match score).
+    """
+    target_words = _words(f"{target['title']} {target.get('abstract', '')}")
+    boost = boost or {}
+    scored = []
+    for paper in candidates:
+        words = _words(f"{paper['title']} {paper.get('abstract', '')}")
+        union = len(words | target_words)
+        jaccard = len(words & target_words) / union if union else 0.0
+        scored.append((jaccard + boost.get(paper.get("id"), 0.0), paper))
+    scored.sort(key=lambda pair: pair[0], reverse=True)
+    return scored
+
+
+def prefilter_candidates(target: dict, candidates: list, limit: int,
+                         boost: Optional[Dict[str, float]] = None) -> list:
+    """Keeps the ``limit`` candidates ``rank_by_overlap`` ranks highest."""
+    if len(candidates) <= limit:
+        return candidates
+    return [paper for _, paper in rank_by_overlap(target, candidates, boost)[:limit]]
+
+
+def _related_header(target: dict) -> str:
+    return f"""
+You are a research similarity expert.
+
+Target Paper:
+Title: {target['title']}
+Abstract: {trim_to_tokens(target.get('abstract', ''), TARGET_ABSTRACT_TOKENS)}
+
+Task:
+Identify up to {MAX_RELATED_RESULTS} papers from the Candidates list most related to the Target Paper.
+
+Return ONLY a raw JSON array (no markdown formatting).
+Format:
+[
+  {{ "id": "paper_id", "similarity": 85, "reason": "Short reason" }}
+]
+
+If none are related, return [].
+
+Candidates:
+"""
+
+
+def _candidate_block(paper: dict) -> str:
+    return (
+        f"ID: {paper['id']}\n"
+        f"Title: {paper['title']}\n"
+        f"Abstract: {trim_to_tokens(paper.get('abstract', ''), CANDIDATE_ABSTRACT_TOKENS)}\n"
+    )
+
+
+def parse_related_response(text: str, batch: list) -> List[dict]:
+    by_id = {p["id"]: p for p in batch}
+    related = []
+    for entry in _extract_json_array(text):
+        if not isinstance(entry, dict) or entry.get("id") not in by_id:
+            continue
+        try:
+            similarity = float(entry.get("similarity", 0))
+        except (TypeError, ValueError):
+            similarity = 0.0
+        related.append({
+            "paper": by_id[entry["id"]],
+            "similarity": similarity,
+            "reason": entry.get("reason") or "Similarity detected.",
+        })
+    return related
+
+
+def batch_related(target: dict, candidates: list, complete: Callable[[str], str],
+                  prompt_budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[List[dict], dict]:
+    """
+    Scores candidates against ``target`` in as few calls as fit the budget
+    and returns the overall top ``MAX_RELATED_RESULTS`` as
+    ``{"paper", "similarity", "reason"}`` dicts, plus call statistics
+    (``failed`` counts candidates left unscored).
+
+    A model only ranks within the prompt it sees, so when the candidates
+    span several calls, the finalists of each are scored again together in
+    one last call.
+    """
+    header = _related_header(target)
+    base_cost = estimate_tokens(header)
+    stats = {"calls": 0, "retries": 0, "failed": 0}
+
+    def run(batch: list, depth: int, retries: dict, found: list):
+        stats["calls"] += 1
+        stats["retries"] += int(depth > 0)
+        with profiling.stage("llm.build"):
+            prompt = header + "\n".join(_candidate_block(p) for p in batch)
+        text = complete(prompt)
+        try:
+            with profiling.stage("llm.parse"):
+                found.extend(parse_related_response(text, batch))
+            return
+        except ValueError:
+            pass
+        if len(batch) == 1 or depth >= MAX_SPLIT_DEPTH or retries["left"] < 2:
+            stats["failed"] += len(batch)
+            return
+        retries["left"] -= 2
+        mid = len(batch) // 2
+        run(batch[:mid], depth + 1, retries, found)
+        run(batch[mid:], depth + 1, retries, found)
+
+    def score(batch: list) -> List[dict]:
+        found = []
+        run(batch, 0, {"left": MAX_RETRIES_PER_BATCH}, found)
+        found.sort(key=lambda r: r["similarity"], reverse=True)
+        return found
+
+    # Each call returns at most a few ids, so only the prompt side is budgeted
+    with profiling.stage("llm.pack"):
+        costs = [(estimate_tokens(_candidate_block(p)), 0) for p in candidates]
+        batches = pack_batches(candidates, costs, prompt_budget, RELATED_OUTPUT_TOKENS, base_cost)
+    per_batch = [score(batch)[:MAX_RELATED_RESULTS] for batch in batches]
+    related = [r for found in per_batch for r in found]
+    related.sort(key=lambda r: r["similarity"], reverse=True)
+
+    if sum(1 for found in per_batch if found) > 1 and len(related) > MAX_RELATED_RESULTS:
+        failed = stats["failed"]
+        reranked = score([r["paper"] for r in related])
+        # Finalists the last call could not score keep their batch scores
+        stats["failed"] = failed
+        if reranked:
+            related = reranked
+    return related[:MAX_RELATED_RESULTS], stats
@@ -1,8 +1,10 @@
+import io
 import os
 import re
-import json
 import time
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Optional
 from dotenv import load_dotenv
@@ -14,24 +16,36 @@ if not os.getenv("GOOGLE_API_KEY"):
 else:
     print("SUCCESS: GOOGLE_API_KEY loaded.")
 
-import requests
 import xml.etree.ElementTree as ET
 import google.generativeai as genai
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import Response
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from urllib.parse import unquote
 
+import db_gateway
+import dedup
+import fulltext
+import library_io
+import list_summaries
+import llm_batch
+import profiling
+import resilience
+import sharding
+from arxiv_mirror import ArxivMirror
+
 # ==============================
 # 🗄️ DATABASE INITIALIZATION
 # ==============================
 
-DB_PATH = "papers.db"
+DB_PATH = os.getenv("DB_PATH", "papers.db")
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
+def init_db(db_path: Optional[str] = None):
+    conn = sqlite3.connect(db_path or DB_PATH)
+    # WAL lets the reader threads keep going while the writer commits
+    conn.execute("PRAGMA journal_mode = WAL")
     cursor = conn.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS saved_papers (
@@ -56,11 +70,33 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    # Lookups and import dedup are always scoped by (user_id, paper_id)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_saved_papers_user_paper
+        ON saved_papers (user_id, paper_id)
+    """)
+    fulltext.init_fulltext_tables(conn)
+    dedup.init_dedup_tables(conn)
+    list_summaries.init_summary_tables(conn)
     conn.commit()
     conn.close()
 
 init_db()
 
+# Each user's papers and lists live in one shard, picked by consistent
+# hashing. Without a shard map, papers.db is the only shard. Full-text
+# tables stay in papers.db (shard-0).
+SHARD_MAP_PATH = os.getenv("SHARD_MAP_PATH", "shard_map.db")
+SHARD_DIR = os.getenv("DB_SHARD_DIR", "shards")
+shards = sharding.ShardRouter.open(SHARD_MAP_PATH, DB_PATH, init_shard=init_db)
+
+# Async endpoints await their SQLite work here instead of running it on the
+# event loop: reads on a bounded pool, writes on one writer thread per shard
+db = db_gateway.DatabaseGateway(
+    read_workers=int(os.getenv("DB_READ_WORKERS", "8")),
+    max_queue=int(os.getenv("DB_MAX_QUEUE", "0"))
+)
+
 
 # ==============================
 # 🛡️ RATE LIMIT PROTECTOR
@@ -83,7 +119,7 @@ class RateLimiter:
         self.history[client_ip].append(now)
         return True
 
-limiter = RateLimiter(requests_per_minute=20)
+limiter = RateLimiter(requests_per_minute=int(os.getenv("RATE_LIMIT_PER_MINUTE", "20")))
 
 
 # ==============================
@@ -116,6 +152,8 @@ class ReadingList(BaseModel):
     description: Optional[str] = None
     paper_count: int = 0
     created_at: str
+    last_added_at: Optional[str] = None
+    recent_titles: List[str] = []
 
 
 # ==============================
@@ -145,6 +183,112 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# ==============================
+# 🩺 REQUEST PROFILING
+# ==============================
+
+# Profiling is off unless PROFILE_TOKEN is set and a request sends it in
+# X-Profile, or PROFILE_SAMPLE_RATE samples the request
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+slow_requests = profiling.SlowRequestBuffer(capacity=int(os.getenv("PROFILE_KEEP", "50")))
+
+app.add_middleware(
+    profiling.ProfilingMiddleware,
+    buffer=slow_requests,
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    token=PROFILE_TOKEN,
+    interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+)
+
+def check_profile_token(client_request: Request):
+    if not PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling is disabled")
+    if client_request.headers.get("x-profile-token") != PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+# Admin routes that read across users need their own credential and are
+# closed unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def check_admin_token(client_request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin access is disabled")
+    if client_request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/api/admin/profiles")
+def list_profiles(client_request: Request, limit: int = 20):
+    check_profile_token(client_request)
+    profiles = slow_requests.slowest(limit)
+    return {
+        "success": True,
+        "count": len(profiles),
+        "profiles": [p.summary() for p in profiles]
+    }
+
+@app.get("/api/admin/profiles/{profile_id}")
+def get_profile(profile_id: int, client_request: Request):
+    check_profile_token(client_request)
+    profile = slow_requests.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"success": True, "profile": profile.detail()}
+
+@app.delete("/api/admin/profiles")
+def clear_profiles(client_request: Request):
+    check_profile_token(client_request)
+    slow_requests.clear()
+    return {"success": True, "message": "Profiles cleared"}
+
+
+# ==============================
+# 🛟 UPSTREAM RESILIENCE
+# ==============================
+
+# Each upstream gets its own timeout, circuit breaker and concurrency cap
+# (override with ARXIV_API_*, ARXIV_PDF_* and GEMINI_* variables), so a
+# hung dependency cannot tie up the worker threads SQLite endpoints need.
+arxiv_api = resilience.Dependency.from_env("arxiv_api", "ARXIV_API", timeout=10, max_concurrent=8)
+arxiv_pdf = resilience.Dependency.from_env("arxiv_pdf", "ARXIV_PDF", timeout=30, max_concurrent=4)
+gemini = resilience.Dependency.from_env("gemini", "GEMINI", timeout=30, max_concurrent=4)
+
+app.add_middleware(
+    resilience.DeadlineMiddleware,
+    default_seconds=float(os.getenv("REQUEST_DEADLINE_SECONDS", "25")),
+    max_seconds=float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "60")),
+)
+
+@app.exception_handler(resilience.DependencyUnavailable)
+def dependency_unavailable_handler(client_request: Request, exc: resilience.DependencyUnavailable):
+    headers = {"Retry-After": str(int(exc.retry_after or 5) + 1)}
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Upstream service unavailable ({exc.dependency}). Please try again shortly."},
+        headers=headers
+    )
+
+@app.exception_handler(db_gateway.DatabaseBusy)
+def database_busy_handler(client_request: Request, exc: db_gateway.DatabaseBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy. Please try again shortly."},
+        headers={"Retry-After": "1"}
+    )
+
+@app.get("/api/admin/db")
+def get_db_gateway_stats(client_request: Request):
+    check_admin_token(client_request)
+    return {"success": True, "pools": db.snapshot()}
+
+@app.get("/api/admin/dependencies")
+def get_dependencies(client_request: Request):
+    check_admin_token(client_request)
+    return {
+        "success": True,
+        "dependencies": [d.snapshot() for d in (arxiv_api, arxiv_pdf, gemini)]
+    }
+
 # ==============================
 # 📌 BASIC ENDPOINTS
 # ==============================
@@ -178,48 +322,34 @@ async def random_quote():
 # ==============================
 
 def create_reading_list(name: str, description: str, user_id: str):
-    conn = sqlite3.connect(DB_PATH)
+    conn = shards.connect(user_id)
     cursor = conn.cursor()
+    # Ids are allocated across shards so they survive a move to another shard
+    list_id = shards.new_list_id()
     cursor.execute(
-        "INSERT INTO reading_lists (name, description, user_id) VALUES (?, ?, ?)",
-        (name, description, user_id)
+        "INSERT INTO reading_lists (id, name, description, user_id) VALUES (?, ?, ?, ?)",
+        (list_id, name, description, user_id)
     )
-    list_id = cursor.lastrowid
     conn.commit()
     conn.close()
     return list_id
 
 def get_all_reading_lists(user_id: str):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Get lists with paper count
-    cursor.execute("""
-        SELECT rl.*, COUNT(sp.id) as paper_count
-        FROM reading_lists rl
-        LEFT JOIN saved_papers sp ON rl.id = sp.reading_list_id
-        WHERE rl.user_id = ?
-        GROUP BY rl.id
-        ORDER BY rl.created_at DESC
-    """, (user_id,))
+    conn = shards.connect(user_id)
     
-    rows = cursor.fetchall()
+    # Counts and previews are kept up to date by triggers
+    results = list_summaries.list_summaries(conn, user_id)
     conn.close()
-    
-    results = []
-    for row in rows:
-        results.append({
-            "id": row["id"],
-            "name": row["name"],
-            "description": row["description"],
-            "paper_count": row["paper_count"],
-            "created_at": row["created_at"]
-        })
     return results
 
+def get_reading_list_summary(list_id: int, user_id: str):
+    conn = shards.connect(user_id)
+    results = list_summaries.list_summaries(conn, user_id, list_id)
+    conn.close()
+    return results[0] if results else None
+
 def get_reading_list_by_id(list_id: int, user_id: str):
-    conn = sqlite3.connect(DB_PATH)
+    conn = shards.connect(user_id)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM reading_lists WHERE id = ? AND user_id = ?", (list_id, user_id))
@@ -236,7 +366,7 @@ def get_reading_list_by_id(list_id: int, user_id: str):
     return None
 
 def delete_reading_list_by_id(list_id: int, user_id: str):
-    conn = sqlite3.connect(DB_PATH)
+    conn = shards.connect(user_id)
     cursor = conn.cursor()
     
     # Check ownership
@@ -245,11 +375,11 @@ def delete_reading_list_by_id(list_id: int, user_id: str):
         conn.close()
         return False
 
-    # Unassign papers
-    cursor.execute("UPDATE saved_papers SET reading_list_id = NULL WHERE reading_list_id = ?", (list_id,))
-    
-    # Delete list
+    # Delete list first so the summary row is gone before members move
     cursor.execute("DELETE FROM reading_lists WHERE id = ?", (list_id,))
+
+    # Unassign papers (only the list's own rows, via idx_saved_papers_list)
+    cursor.execute("UPDATE saved_papers SET reading_list_id = NULL WHERE reading_list_id = ?", (list_id,))
     
     conn.commit()
     conn.close()
@@ -263,7 +393,7 @@ def delete_reading_list_by_id(list_id: int, user_id: str):
 @app.get("/api/reading-lists")
 async def get_reading_lists_endpoint():
     mock_user_id = "user_123"
-    lists = get_all_reading_lists(mock_user_id)
+    lists = await db.read(get_all_reading_lists, mock_user_id)
     return {
         "success": True,
         "count": len(lists),
@@ -274,19 +404,21 @@ async def get_reading_lists_endpoint():
 async def create_reading_list_endpoint(list_data: ReadingListCreate):
     mock_user_id = "user_123"
     try:
-        new_id = create_reading_list(list_data.name, list_data.description, mock_user_id)
-        # Fetch back to return full object
-        new_list = get_reading_list_by_id(new_id, mock_user_id)
-        # Add paper_count = 0 for consistency
-        new_list["paper_count"] = 0
-        return new_list
+        new_id = await db.write(
+            create_reading_list, list_data.name, list_data.description, mock_user_id,
+            lane=shards.shard_for(mock_user_id)
+        )
+        # Fetch back in the same shape GET /api/reading-lists returns
+        return await db.read(get_reading_list_summary, new_id, mock_user_id)
+    except db_gateway.DatabaseBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/reading-lists/{list_id}")
 async def get_reading_list_detail(list_id: int):
     mock_user_id = "user_123"
-    rlist = get_reading_list_by_id(list_id, mock_user_id)
+    rlist = await db.read(get_reading_list_by_id, list_id, mock_user_id)
     if not rlist:
         raise HTTPException(status_code=404, detail="Reading list not found")
     return rlist
@@ -294,7 +426,9 @@ async def get_reading_list_detail(list_id: int):
 @app.delete("/api/reading-lists/{list_id}")
 async def delete_reading_list(list_id: int):
     mock_user_id = "user_123"
-    success = delete_reading_list_by_id(list_id, mock_user_id)
+    success = await db.write(
+        delete_reading_list_by_id, list_id, mock_user_id, lane=shards.shard_for(mock_user_id)
+    )
     if not success:
         raise HTTPException(status_code=404, detail="Reading list not found or access denied")
     return {"success": True, "message": "Reading list deleted"}
@@ -306,15 +440,14 @@ async def delete_reading_list(list_id: int):
 
 def get_paper_by_id(paper_id: str, user_id: str):
     """Helper to fetch a single paper with ownership check."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = shards.connect(user_id)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
-    # We check by paper_id (the string identifier) and user_id
-    cursor.execute("""
-        SELECT * FROM saved_papers 
-        WHERE paper_id = ? AND user_id = ?
-    """, (paper_id, user_id))
+    # We check by paper_id (the string identifier) and user_id. Another
+    # version of the paper also resolves, as merging keeps the newest id.
+    saved_id = dedup.resolve_saved_paper(conn, user_id, paper_id)
+    cursor.execute("SELECT * FROM saved_papers WHERE id = ?", (saved_id,))
     
     row = cursor.fetchone()
     conn.close()
@@ -334,6 +467,13 @@ def get_paper_by_id(paper_id: str, user_id: str):
     return None
 
 
+def paper_saved_by_anyone(paper_id: str) -> bool:
+    found = shards.scatter(lambda conn: conn.execute(
+        "SELECT id FROM saved_papers WHERE paper_id = ? LIMIT 1", (paper_id,)
+    ).fetchone())
+    return any(row is not None for row in found.values())
+
+
 @app.get("/api/papers/{paper_id}")
 async def get_paper_detail(paper_id: str):
     # Decode ID to handle slashes in DOIs
@@ -342,15 +482,11 @@ async def get_paper_detail(paper_id: str):
     # Mock authenticated user
     mock_user_id = "user_123"
     
-    paper = get_paper_by_id(paper_id, mock_user_id)
+    paper = await db.read(get_paper_by_id, paper_id, mock_user_id)
     
     if not paper:
         # Check if it exists for another user for 403 (Security Requirement)
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM saved_papers WHERE paper_id = ?", (paper_id,))
-        exists_for_other = cursor.fetchone()
-        conn.close()
+        exists_for_other = await db.read(paper_saved_by_anyone, paper_id)
         
         if exists_for_other:
             raise HTTPException(status_code=403, detail="Access denied to this paper")
@@ -363,47 +499,52 @@ async def get_paper_detail(paper_id: str):
     }
 
 
+def get_user_papers(user_id: str, reading_list_id: Optional[int] = None) -> list:
+    conn = shards.connect(user_id)
+    conn.row_factory = sqlite3.Row  # To return results as dictionaries
+    cursor = conn.cursor()
+    
+    query = """
+        SELECT id, paper_id, title, authors, abstract, publication_date, doi, reading_list_id 
+        FROM saved_papers 
+        WHERE user_id = ? 
+    """
+    params = [user_id]
+    
+    if reading_list_id is not None:
+        query += " AND reading_list_id = ?"
+        params.append(reading_list_id)
+        
+    query += " ORDER BY created_at DESC"
+    
+    cursor.execute(query, tuple(params))
+    
+    rows = cursor.fetchall()
+    
+    papers = []
+    for row in rows:
+        papers.append({
+            "id": row["paper_id"], # Returning paper_id as the primary identifier for the frontend
+            "db_id": row["id"],
+            "title": row["title"],
+            "authors": row["authors"].split(", "),
+            "abstract": row["abstract"],
+            "publication_date": row["publication_date"],
+            "doi": row["doi"],
+            "reading_list_id": row["reading_list_id"]
+        })
+        
+    conn.close()
+    return papers
+
+
 @app.get("/api/papers")
 async def get_saved_papers(reading_list_id: Optional[int] = None):
     # Mock authenticated user
     mock_user_id = "user_123"
     
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # To return results as dictionaries
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT id, paper_id, title, authors, abstract, publication_date, doi, reading_list_id 
-            FROM saved_papers 
-            WHERE user_id = ? 
-        """
-        params = [mock_user_id]
-        
-        if reading_list_id is not None:
-            query += " AND reading_list_id = ?"
-            params.append(reading_list_id)
-            
-        query += " ORDER BY created_at DESC"
-        
-        cursor.execute(query, tuple(params))
-        
-        rows = cursor.fetchall()
-        
-        papers = []
-        for row in rows:
-            papers.append({
-                "id": row["paper_id"], # Returning paper_id as the primary identifier for the frontend
-                "db_id": row["id"],
-                "title": row["title"],
-                "authors": row["authors"].split(", "),
-                "abstract": row["abstract"],
-                "publication_date": row["publication_date"],
-                "doi": row["doi"],
-                "reading_list_id": row["reading_list_id"]
-            })
-            
-        conn.close()
+        papers = await db.read(get_user_papers, mock_user_id, reading_list_id)
         
         return {
             "success": True,
@@ -411,6 +552,8 @@ async def get_saved_papers(reading_list_id: Optional[int] = None):
             "papers": papers
         }
         
+    except db_gateway.DatabaseBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
 
@@ -419,6 +562,204 @@ async def get_saved_papers(reading_list_id: Optional[int] = None):
 # 🔎 SEARCH FEATURE (#10)
 # ==============================
 
+# Overridable so benchmarks can point at local stand-ins
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "http://export.arxiv.org/api/query")
+SEARCH_MAX_RESULTS = 5
+
+# Local metadata mirror built with `python arxiv_mirror.py ingest ...`.
+# Used automatically once the database file exists.
+arxiv_mirror = ArxivMirror(os.getenv("ARXIV_MIRROR_PATH", "arxiv_mirror.db"))
+
+# Live top-ups for records newer than the mirror, cached per query. A
+# search only reads the cache; a missing or stale entry is refreshed in the
+# background for later searches. One worker keeps arXiv calls sequential.
+LIVE_TOPUP_TTL_SECONDS = 600
+LIVE_TOPUP_CACHE_SIZE = 1000
+LIVE_TOPUP_MAX_PENDING = 100
+live_topup_cache = {}
+live_topup_pending = set()
+live_topup_lock = threading.Lock()
+live_topup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arxiv-topup")
+
+# Last good live results per query, served when arXiv is unavailable
+SEARCH_FALLBACK_TTL_SECONDS = int(os.getenv("SEARCH_FALLBACK_TTL_SECONDS", "86400"))
+SEARCH_FALLBACK_CACHE_SIZE = 1000
+search_fallback_cache = {}
+
+
+def parse_arxiv_feed(content: bytes) -> list:
+    """Turns an arXiv Atom response into search result dicts."""
+    root = ET.fromstring(content)
+    ns = {"atom": "http://www.w3.org/2005/Atom"}
+
+    results = []
+
+    for entry in root.findall("atom:entry", ns):
+
+        id_url = entry.find("atom:id", ns).text
+        arxiv_id = id_url.split("/")[-1]
+
+        title = entry.find("atom:title", ns).text.strip()
+        abstract = entry.find("atom:summary", ns).text.strip()
+        published = entry.find("atom:published", ns).text[:4]
+
+        authors = []
+        for author in entry.findall("atom:author", ns):
+            authors.append(author.find("atom:name", ns).text)
+
+        results.append({
+            "id": arxiv_id,
+            "title": title,
+            "authors": authors,
+            "abstract": abstract,
+            "publication_date": published,
+            "doi": f"https://arxiv.org/abs/{arxiv_id}",
+            "pdf_url": f"https://arxiv.org/pdf/{arxiv_id}.pdf"
+        })
+
+    return results
+
+
+def search_arxiv_live(search_query: str, extra_params: str = "", timeout: Optional[float] = None) -> list:
+    url = (
+        f"{ARXIV_API_URL}?"
+        f"search_query={search_query}"
+        f"&start=0&max_results={SEARCH_MAX_RESULTS}"
+        f"{extra_params}"
+    )
+
+    with profiling.stage("arxiv.fetch"):
+        response = arxiv_api.get(url, timeout=timeout)
+
+    if resilience.is_upstream_error(response):
+        raise resilience.DependencyUnavailable("arxiv_api", f"HTTP {response.status_code}")
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to fetch results from arXiv"
+        )
+
+    with profiling.stage("arxiv.parse"):
+        return parse_arxiv_feed(response.content)
+
+
+def refresh_live_topup(query: str, latest: str):
+    """Fetches live results submitted on or after the mirror's newest date."""
+    cache_key = (query.strip().lower(), latest)
+    since = latest.replace("-", "") + "0000"
+    try:
+        results = search_arxiv_live(
+            f"all:{query} AND submittedDate:[{since} TO 999912312359]",
+            "&sortBy=submittedDate&sortOrder=descending"
+        )
+    except Exception as e:
+        # Keep serving the previous entry, if any, until the next refresh
+        print(f"arXiv live top-up failed: {e}")
+        return
+    finally:
+        with live_topup_lock:
+            live_topup_pending.discard(cache_key)
+
+    live_topup_cache[cache_key] = (time.time(), results)
+    if len(live_topup_cache) > LIVE_TOPUP_CACHE_SIZE:
+        # Dicts keep insertion order, so this drops the oldest entry
+        live_topup_cache.pop(next(iter(live_topup_cache)))
+
+
+def search_arxiv_newer_than_mirror(query: str) -> list:
+    """
+    Cached live results newer than the mirror. Never waits on arXiv: a
+    missing or stale entry is refreshed in the background, and the search
+    is answered with what is cached (possibly nothing) meanwhile.
+    """
+    latest = arxiv_mirror.latest_date()
+    if not latest:
+        return []
+
+    cache_key = (query.strip().lower(), latest)
+    cached = live_topup_cache.get(cache_key)
+    if not cached or time.time() - cached[0] >= LIVE_TOPUP_TTL_SECONDS:
+        with live_topup_lock:
+            schedule = cache_key not in live_topup_pending and len(live_topup_pending) < LIVE_TOPUP_MAX_PENDING
+            if schedule:
+                live_topup_pending.add(cache_key)
+        if schedule:
+            live_topup_pool.submit(refresh_live_topup, query, latest)
+    return cached[1] if cached else []
+
+
+def add_fulltext_matches(query: str, response: dict) -> dict:
+    """
+    Adds the user's saved papers whose indexed full text matches the query.
+    Results that are among them get the matching snippet and move to the top.
+    """
+    # Mock authenticated user
+    mock_user_id = "user_123"
+    try:
+        with profiling.stage("db.fulltext"):
+            hits = fulltext.search_fulltext(DB_PATH, mock_user_id, query, limit=SEARCH_MAX_RESULTS)
+    except Exception as e:
+        print(f"Full-text search failed: {e}")
+        return response
+    if not hits:
+        return response
+
+    snippets = {hit["paper_id"]: hit["snippet"] for hit in hits}
+    results = response["results"]
+    for paper in results:
+        if paper["id"] in snippets:
+            paper["fulltext_snippet"] = snippets[paper["id"]]
+    # sorted() is stable, so both groups keep their relevance order
+    response["results"] = sorted(results, key=lambda paper: "fulltext_snippet" not in paper)
+    response["fulltext_matches"] = hits
+    return response
+
+
+def remember_search_results(query: str, results: list):
+    search_fallback_cache[query.strip().lower()] = (time.time(), results)
+    if len(search_fallback_cache) > SEARCH_FALLBACK_CACHE_SIZE:
+        search_fallback_cache.pop(next(iter(search_fallback_cache)))
+
+
+def degraded_search(query: str) -> Optional[dict]:
+    """
+    Answers a search without arXiv: the last live results for the same
+    query if recent enough, otherwise matching papers from the library.
+    """
+    cached = search_fallback_cache.get(query.strip().lower())
+    if cached and time.time() - cached[0] < SEARCH_FALLBACK_TTL_SECONDS:
+        return {"success": True, "query": query, "source": "cache", "degraded": True, "results": cached[1]}
+
+    # Mock authenticated user
+    mock_user_id = "user_123"
+    pattern = f"%{query.strip()}%"
+    conn = shards.connect(mock_user_id)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT paper_id, title, authors, abstract, publication_date, doi
+        FROM saved_papers
+        WHERE user_id = ? AND (title LIKE ? OR abstract LIKE ?)
+        ORDER BY id DESC
+        LIMIT ?
+    """, (mock_user_id, pattern, pattern, SEARCH_MAX_RESULTS))
+    rows = cursor.fetchall()
+    conn.close()
+    if not rows:
+        return None
+
+    results = [{
+        "id": row["paper_id"],
+        "title": row["title"],
+        "authors": row["authors"].split(", ") if row["authors"] else [],
+        "abstract": row["abstract"] or "",
+        "publication_date": row["publication_date"] or "",
+        "doi": row["doi"] or "",
+        "pdf_url": fulltext.ARXIV_PDF_URL.format(paper_id=row["paper_id"])
+    } for row in rows]
+    return {"success": True, "query": query, "source": "library", "degraded": True, "results": results}
+
+
 @app.post("/api/search")
 def search_papers(request: SearchRequest, client_request: Request):
 
@@ -437,55 +778,49 @@ def search_papers(request: SearchRequest, client_request: Request):
             detail="Search query cannot be empty"
         )
 
-    try:
-        url = (
-            f"http://export.arxiv.org/api/query?"
-            f"search_query=all:{request.query}"
-            f"&start=0&max_results=5"
-        )
-
-        response = requests.get(url)
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to fetch results from arXiv"
-            )
-
-        root = ET.fromstring(response.content)
-        ns = {"atom": "http://www.w3.org/2005/Atom"}
-
-        results = []
-
-        for entry in root.findall("atom:entry", ns):
-
-            id_url = entry.find("atom:id", ns).text
-            arxiv_id = id_url.split("/")[-1]
-
-            title = entry.find("atom:title", ns).text.strip()
-            abstract = entry.find("atom:summary", ns).text.strip()
-            published = entry.find("atom:published", ns).text[:4]
-
-            authors = []
-            for author in entry.findall("atom:author", ns):
-                authors.append(author.find("atom:name", ns).text)
-
-            results.append({
-                "id": arxiv_id,
-                "title": title,
-                "authors": authors,
-                "abstract": abstract,
-                "publication_date": published,
-                "doi": f"https://arxiv.org/abs/{arxiv_id}",
-                "pdf_url": f"https://arxiv.org/pdf/{arxiv_id}.pdf"
+    if arxiv_mirror.available:
+        try:
+            with profiling.stage("mirror.search"):
+                mirrored = arxiv_mirror.search(request.query, limit=SEARCH_MAX_RESULTS)
+            with profiling.stage("arxiv.live_topup"):
+                newer = search_arxiv_newer_than_mirror(request.query)
+
+            # Newer live records first, then the best mirror matches
+            results = []
+            seen = set()
+            for paper in newer + mirrored:
+                base_id = re.sub(r"v\d+$", "", paper["id"])
+                if base_id not in seen:
+                    seen.add(base_id)
+                    results.append(paper)
+
+            return add_fulltext_matches(request.query, {
+                "success": True,
+                "query": request.query,
+                "source": "mirror",
+                "results": results[:SEARCH_MAX_RESULTS]
             })
+        except Exception as e:
+            # A broken mirror should not take search down; use the live API
+            print(f"arXiv mirror search failed: {e}")
 
-        return {
+    try:
+        results = search_arxiv_live(f"all:{request.query}")
+        remember_search_results(request.query, results)
+
+        return add_fulltext_matches(request.query, {
             "success": True,
             "query": request.query,
+            "source": "arxiv",
             "results": results
-        }
+        })
 
+    except resilience.DependencyUnavailable as e:
+        print(f"arXiv search degraded: {e}")
+        fallback = degraded_search(request.query)
+        if fallback is None:
+            raise
+        return add_fulltext_matches(request.query, fallback)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -497,6 +832,16 @@ def search_papers(request: SearchRequest, client_request: Request):
 # 💾 SAVE PAPER FEATURE (#11)
 # ==============================
 
+# What to do when a saved paper's text nearly matches an existing one:
+# "flag" keeps both and records the link, "merge" keeps only the existing
+# row. Other versions of the same arXiv paper are always merged.
+NEAR_DUPLICATE_ACTION = os.getenv("DEDUP_NEAR_DUPLICATE_ACTION", "flag")
+
+def rename_fulltext_entries(renamed: list):
+    """Re-keys full-text entries of saved rows that took a newer version's id."""
+    for user_id, old_id, new_id in renamed:
+        fulltext.rename_paper(DB_PATH, user_id, old_id, new_id)
+
 @app.post("/api/papers/save")
 def save_paper(request: SavePaperRequest):
     paper_id = request.paper.id
@@ -505,7 +850,7 @@ def save_paper(request: SavePaperRequest):
     mock_user_id = "user_123"
     
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = shards.connect(mock_user_id)
         cursor = conn.cursor()
         
         # Check if the paper is already saved for this user
@@ -514,6 +859,32 @@ def save_paper(request: SavePaperRequest):
             conn.close()
             return {"success": True, "message": "Paper was already saved"}
 
+        # Check for other versions and near-duplicates of the paper
+        signature = dedup.compute_signature(request.paper.title, request.paper.abstract)
+        match = dedup.find_duplicate(
+            conn, mock_user_id, paper_id, request.paper.title, request.paper.abstract, signature
+        )
+        if match and (match["reason"] == "version" or NEAR_DUPLICATE_ACTION == "merge"):
+            old_id = dedup.merge_into(conn, match["saved_paper_id"], {
+                **request.paper.model_dump(),
+                "reading_list_id": request.reading_list_id
+            })
+            cursor.execute("SELECT paper_id FROM saved_papers WHERE id = ?", (match["saved_paper_id"],))
+            merged_paper_id = cursor.fetchone()[0]
+            conn.commit()
+            conn.close()
+            if old_id is not None:
+                rename_fulltext_entries([(mock_user_id, old_id, merged_paper_id)])
+                if FULLTEXT_ON_SAVE:
+                    # The newer version has its own PDF
+                    fulltext_pipeline.enqueue(mock_user_id, merged_paper_id, force=True)
+            return {
+                "success": True,
+                "message": "Paper merged with an existing saved copy",
+                "paper_id": merged_paper_id,
+                "duplicate": match
+            }
+
         # Insert paper metadata
         cursor.execute("""
             INSERT INTO saved_papers 
@@ -529,15 +900,31 @@ def save_paper(request: SavePaperRequest):
             mock_user_id,
             request.reading_list_id
         ))
+        saved_id = cursor.lastrowid
+        dedup.index_paper(
+            conn, saved_id, mock_user_id, paper_id, request.paper.title, request.paper.abstract, signature
+        )
+        if match:
+            dedup.flag_duplicate(conn, mock_user_id, saved_id, match)
         
         conn.commit()
         conn.close()
+
+        if FULLTEXT_ON_SAVE:
+            try:
+                fulltext_pipeline.enqueue(mock_user_id, paper_id)
+            except Exception as e:
+                # The paper is saved either way; indexing can be retried
+                print(f"Could not queue full-text indexing for {paper_id}: {e}")
         
-        return {
+        response = {
             "success": True,
             "message": "Paper saved successfully",
             "paper_id": paper_id
         }
+        if match:
+            response["duplicate"] = match
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
@@ -551,19 +938,31 @@ def delete_paper_by_id(paper_id: str, user_id: str):
     """
     Helper function to delete a paper if it belongs to the user.
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = shards.connect(user_id)
     cursor = conn.cursor()
     
-    # Verify ownership
-    cursor.execute("SELECT id FROM saved_papers WHERE paper_id = ? AND user_id = ?", (paper_id, user_id))
-    if not cursor.fetchone():
+    # Verify ownership (another saved version of the paper also matches)
+    saved_id = dedup.resolve_saved_paper(conn, user_id, paper_id)
+    if saved_id is None:
         conn.close()
         raise HTTPException(status_code=404, detail="Paper not found or access denied")
+    cursor.execute("SELECT paper_id FROM saved_papers WHERE id = ?", (saved_id,))
+    paper_id = cursor.fetchone()[0]
+
+    cursor.execute("SELECT id FROM saved_papers WHERE paper_id = ? AND user_id = ?", (paper_id, user_id))
+    for row in cursor.fetchall():
+        dedup.unindex_paper(conn, row[0])
 
-    # Delete paper
     cursor.execute("DELETE FROM saved_papers WHERE paper_id = ? AND user_id = ?", (paper_id, user_id))
     conn.commit()
     conn.close()
+
+    # Full-text index entries live with the pipeline in DB_PATH (shard 0)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("DELETE FROM paper_chunks WHERE paper_id = ? AND user_id = ?", (paper_id, user_id))
+    conn.execute("DELETE FROM paper_fulltext_jobs WHERE paper_id = ? AND user_id = ?", (paper_id, user_id))
+    conn.commit()
+    conn.close()
     return True
 
 @app.delete("/api/papers")
@@ -579,15 +978,126 @@ async def delete_paper(paper_id: str):
         # If frontend sends ?paper_id=10.123%2F456, FastAPI usually sees "10.123/456".
         # Safe to keep unquote just in case? No, usually not needed for query params.
         
-        delete_paper_by_id(paper_id, mock_user_id)
+        await db.write(delete_paper_by_id, paper_id, mock_user_id, lane=shards.shard_for(mock_user_id))
         
         return {
             "success": True,
             "message": "Paper deleted successfully",
             "paper_id": paper_id
         }
-    except HTTPException as he:
-        raise he
+    except (HTTPException, db_gateway.DatabaseBusy):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
+
+
+# ==============================
+# 📚 LIBRARY IMPORT / EXPORT
+# ==============================
+
+def iter_user_papers(user_id: str, reading_list_id: Optional[int] = None):
+    """Streams a user's papers from their shard, keeping the user in place meanwhile."""
+    with shards.lease(user_id) as path:
+        yield from library_io.iter_saved_papers(path, user_id, reading_list_id)
+
+
+@app.get("/api/library/export")
+def export_library(format: str = "bibtex", reading_list_id: Optional[int] = None):
+    # Mock authenticated user
+    mock_user_id = "user_123"
+
+    fmt = format.lower()
+    if fmt not in library_io.FORMATTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format. Allowed: {', '.join(library_io.FORMATTERS)}"
+        )
+
+    papers = iter_user_papers(mock_user_id, reading_list_id)
+    filename = f"library.{library_io.EXPORT_EXTENSIONS[fmt]}"
+    return StreamingResponse(
+        library_io.stream_export(papers, fmt),
+        media_type=library_io.EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@app.post("/api/library/import")
+def import_library(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    reading_list_id: Optional[int] = None
+):
+    # Mock authenticated user
+    mock_user_id = "user_123"
+
+    fmt = format.lower() if format else library_io.detect_format(file.filename)
+    if fmt not in library_io.PARSERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported or undetected format. Allowed: {', '.join(library_io.PARSERS)}"
+        )
+
+    if reading_list_id is not None and not get_reading_list_by_id(reading_list_id, mock_user_id):
+        raise HTTPException(status_code=404, detail="Reading list not found")
+
+    try:
+        # The upload is spooled to disk by the framework; wrap it so the
+        # parser reads it line by line instead of loading it whole.
+        stream = io.TextIOWrapper(file.file, encoding="utf-8", errors="replace")
+        with shards.lease(mock_user_id) as path:
+            stats = library_io.import_papers(
+                path, stream, fmt, mock_user_id, reading_list_id,
+                near_duplicate_action=NEAR_DUPLICATE_ACTION
+            )
+        stream.detach()
+        rename_fulltext_entries(stats.pop("renamed"))
+        return {
+            "success": True,
+            "format": fmt,
+            **stats
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+
+@app.get("/api/library/duplicates")
+def get_duplicates():
+    # Mock authenticated user
+    mock_user_id = "user_123"
+
+    conn = shards.connect(mock_user_id)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT d.similarity, d.reason, d.created_at,
+               dup.paper_id AS paper_id, dup.title AS title,
+               orig.paper_id AS duplicate_of, orig.title AS duplicate_of_title
+        FROM paper_duplicates d
+        JOIN saved_papers dup ON dup.id = d.saved_paper_id
+        JOIN saved_papers orig ON orig.id = d.duplicate_of
+        WHERE d.user_id = ?
+        ORDER BY d.created_at DESC
+    """, (mock_user_id,))
+    duplicates = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    return {"success": True, "count": len(duplicates), "duplicates": duplicates}
+
+
+@app.post("/api/library/dedup")
+def dedup_library_endpoint(action: str = "flag"):
+    # Mock authenticated user
+    mock_user_id = "user_123"
+
+    if action not in ("flag", "merge"):
+        raise HTTPException(status_code=400, detail="Unsupported action. Allowed: flag, merge")
+
+    try:
+        with shards.lease(mock_user_id) as path:
+            stats = dedup.dedup_library(path, mock_user_id, action)
+        rename_fulltext_entries(stats.pop("renamed"))
+        return {"success": True, "action": action, **stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
 
@@ -596,12 +1106,37 @@ async def delete_paper(paper_id: str):
 # 📥 PDF DOWNLOAD PROXY
 # ==============================
 
+def cached_pdf_response(paper_id: str) -> Optional[Response]:
+    """Serves a PDF the full-text pipeline already downloaded, if any."""
+    path = fulltext_pipeline.pdf_path(paper_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        content = f.read()
+    return Response(
+        content=content,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename={paper_id}.pdf",
+            "X-Degraded": "cache"
+        }
+    )
+
+
 @app.get("/api/papers/download/{paper_id}")
 def download_pdf(paper_id: str):
     try:
-        pdf_url = f"https://arxiv.org/pdf/{paper_id}.pdf"
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
-        response = requests.get(pdf_url, headers=headers)
+        pdf_url = fulltext.ARXIV_PDF_URL.format(paper_id=paper_id)
+        headers = {"User-Agent": fulltext.USER_AGENT}
+        try:
+            response = arxiv_pdf.get(pdf_url, headers=headers)
+            if resilience.is_upstream_error(response):
+                raise resilience.DependencyUnavailable("arxiv_pdf", f"HTTP {response.status_code}")
+        except resilience.DependencyUnavailable:
+            cached = cached_pdf_response(paper_id)
+            if cached is None:
+                raise
+            return cached
 
         if response.status_code != 200:
             raise HTTPException(
@@ -617,6 +1152,8 @@ def download_pdf(paper_id: str):
             }
         )
 
+    except (HTTPException, resilience.DependencyUnavailable):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -624,17 +1161,156 @@ def download_pdf(paper_id: str):
         )
 
 
+# ==============================
+# 📑 FULL-TEXT INDEXING
+# ==============================
+
+fulltext_pipeline = fulltext.FullTextPipeline(
+    DB_PATH,
+    cache_dir=os.getenv("PDF_CACHE_DIR", "pdf_cache"),
+    workers=int(os.getenv("FULLTEXT_WORKERS", "0")) or None,
+    extract_timeout=float(os.getenv("FULLTEXT_EXTRACT_TIMEOUT_SECONDS", str(fulltext.EXTRACT_TIMEOUT)))
+)
+
+# Saved papers are queued for indexing right away unless this is "0"
+FULLTEXT_ON_SAVE = os.getenv("FULLTEXT_ON_SAVE", "1") != "0"
+
+
+@app.on_event("startup")
+def resume_fulltext_jobs():
+    resumed = fulltext_pipeline.resume()
+    if resumed:
+        print(f"Resumed {resumed} full-text ingestion job(s).")
+
+
+@app.on_event("shutdown")
+def stop_fulltext_pipeline():
+    fulltext_pipeline.shutdown(wait=False)
+
+
+@app.on_event("shutdown")
+def stop_live_topups():
+    live_topup_pool.shutdown(wait=False, cancel_futures=True)
+
+
+@app.on_event("shutdown")
+def stop_db_gateway():
+    db.shutdown(wait=True)
+
+
+@app.post("/api/papers/{paper_id}/fulltext")
+def index_paper_fulltext(paper_id: str, force: bool = False):
+    paper_id = unquote(paper_id)
+
+    # Mock authenticated user
+    mock_user_id = "user_123"
+
+    paper = get_paper_by_id(paper_id, mock_user_id)
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found")
+
+    # Index under the saved id, which may be a newer version than requested
+    paper_id = paper["id"]
+    queued = fulltext_pipeline.enqueue(mock_user_id, paper_id, force=force)
+    return {
+        "success": True,
+        "queued": queued,
+        "job": fulltext_pipeline.get_status(mock_user_id, paper_id)
+    }
+
+
+@app.get("/api/papers/{paper_id}/fulltext")
+def get_paper_fulltext_status(paper_id: str):
+    paper_id = unquote(paper_id)
+
+    # Mock authenticated user
+    mock_user_id = "user_123"
+
+    job = fulltext_pipeline.get_status(mock_user_id, paper_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Paper has not been queued for indexing")
+    return {"success": True, "job": job}
+
+
+@app.get("/api/fulltext/search")
+def search_fulltext_endpoint(q: str, limit: int = 20):
+    # Mock authenticated user
+    mock_user_id = "user_123"
+
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query cannot be empty")
+
+    try:
+        hits = fulltext.search_fulltext(DB_PATH, mock_user_id, q, limit=min(limit, 100))
+        return {"success": True, "query": q, "count": len(hits), "results": hits}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
+
+
 # ==============================
 # 🤖 LLM CITATION GENERATION
 # ==============================
 
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+def configure_gemini(api_key: str):
+    """Configures the Gemini client, optionally against a custom endpoint."""
+    if GEMINI_API_ENDPOINT:
+        genai.configure(
+            api_key=api_key,
+            transport="rest",
+            client_options={"api_endpoint": GEMINI_API_ENDPOINT}
+        )
+    else:
+        genai.configure(api_key=api_key)
+
+def complete_with_gemini(prompt: str) -> str:
+    """Sends one prompt to Gemini and returns the response text."""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        # Callers answer from their local fallback, as when the breaker is open
+        raise resilience.DependencyUnavailable("gemini", "GOOGLE_API_KEY not set")
+
+    configure_gemini(api_key)
+    # Use flash model for speed and cost
+    model = genai.GenerativeModel("gemini-flash-latest")
+    with profiling.stage("llm.generate"):
+        try:
+            # retry=None: the client's own retries on 503 would outlast the
+            # timeout and hide failures from the breaker
+            response = gemini.call(
+                lambda limit: model.generate_content(prompt, request_options={"timeout": limit, "retry": None})
+            )
+        except resilience.DependencyUnavailable as e:
+            # Quota errors keep their own 429 handling; they still count
+            # against the breaker
+            if e.__cause__ is not None and is_rate_limit_error(e.__cause__):
+                raise e.__cause__
+            raise
+    return response.text
+
+def is_rate_limit_error(e: Exception) -> bool:
+    err_msg = str(e)
+    return "429" in err_msg or "ResourceExhausted" in err_msg or "quota" in err_msg.lower()
+
 def fetch_arxiv_details(arxiv_id: str) -> dict:
     """
-    Fetches paper metadata directly from arXiv API.
+    Fetches paper metadata from the local mirror, or directly from arXiv API.
     """
+    if arxiv_mirror.available:
+        try:
+            paper = arxiv_mirror.get(arxiv_id)
+            if paper:
+                return paper
+        except Exception as e:
+            print(f"Error reading arXiv mirror: {e}")
+
     try:
-        url = f"http://export.arxiv.org/api/query?id_list={arxiv_id}"
-        response = requests.get(url)
+        url = f"{ARXIV_API_URL}?id_list={arxiv_id}"
+        with profiling.stage("arxiv.details"):
+            response = arxiv_api.get(url)
+        if resilience.is_upstream_error(response):
+            raise resilience.DependencyUnavailable("arxiv_api", f"HTTP {response.status_code}")
         if response.status_code != 200:
             return None
         
@@ -667,6 +1343,8 @@ def fetch_arxiv_details(arxiv_id: str) -> dict:
             "doi": doi,
             "abstract": summary
         }
+    except resilience.DependencyUnavailable:
+        raise
     except Exception as e:
         print(f"Error fetching from arXiv: {e}")
         return None
@@ -675,15 +1353,6 @@ def generate_citation_with_llm(paper: dict, fmt: str) -> str:
     """
     Uses Google Gemini (direct API) to generate an academic citation.
     """
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise Exception("GOOGLE_API_KEY not found in environment variables")
-
-    genai.configure(api_key=api_key)
-    
-    # Use flash model for speed and cost
-    model = genai.GenerativeModel('gemini-flash-latest')
-
     prompt = f"""
     You are an academic citation expert.
     Generate a citation for the following paper in {fmt} format.
@@ -703,22 +1372,44 @@ def generate_citation_with_llm(paper: dict, fmt: str) -> str:
     """
 
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return complete_with_gemini(prompt).strip()
+    except resilience.DependencyUnavailable:
+        raise
     except Exception as e:
-        err_msg = str(e)
-        if "429" in err_msg or "ResourceExhausted" in err_msg or "Quota" in err_msg:
+        if is_rate_limit_error(e):
              raise HTTPException(status_code=429, detail="AI request limit exceeded. Please try again later.")
-        raise Exception(f"Gemini API Error: {err_msg}")
+        raise Exception(f"Gemini API Error: {str(e)}")
+
+
+# Supported formats
+SUPPORTED_FORMATS = ["APA", "MLA", "Chicago", "Harvard", "IEEE", "BibTeX"]
 
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", str(llm_batch.PROMPT_TOKEN_BUDGET)))
+LLM_OUTPUT_TOKEN_BUDGET = int(os.getenv("LLM_OUTPUT_TOKEN_BUDGET", str(llm_batch.OUTPUT_TOKEN_BUDGET)))
+
+# Generated citations by (paper_id, format), reused when Gemini is unavailable
+CITATION_CACHE_SIZE = 5000
+citation_cache = {}
+
+
+def remember_citation(paper_id: str, fmt: str, citation: str):
+    citation_cache[(paper_id, fmt)] = citation
+    if len(citation_cache) > CITATION_CACHE_SIZE:
+        citation_cache.pop(next(iter(citation_cache)))
+
+
+def fallback_citation(paper: dict, fmt: str) -> tuple:
+    """A cached LLM citation if there is one, else a template-formatted one."""
+    cached = citation_cache.get((paper["id"], fmt))
+    if cached:
+        return cached, "cache"
+    return library_io.format_citation(paper, fmt), "local"
 
 @app.get("/api/papers/{paper_id}/citation")
 def get_paper_citation(paper_id: str, format: str = "APA"):
     # Decode ID
     paper_id = unquote(paper_id)
     
-    # Supported formats
-    SUPPORTED_FORMATS = ["APA", "MLA", "Chicago", "Harvard", "IEEE", "BibTeX"]
     if format not in SUPPORTED_FORMATS:
         raise HTTPException(
             status_code=400, 
@@ -741,111 +1432,171 @@ def get_paper_citation(paper_id: str, format: str = "APA"):
 
     try:
         citation_text = generate_citation_with_llm(paper, format)
+        remember_citation(paper["id"], format, citation_text)
         
         return {
             "success": True,
             "format": format,
             "citation": citation_text
         }
+    except resilience.DependencyUnavailable as e:
+        print(f"Citation degraded: {e}")
+        citation_text, source = fallback_citation(paper, format)
+        return {
+            "success": True,
+            "format": format,
+            "citation": citation_text,
+            "degraded": True,
+            "source": source
+        }
     except HTTPException as he:
         raise he
     except Exception as e:
         if "429" in str(e) or "quota" in str(e).lower():
             raise HTTPException(status_code=429, detail="AI request limit exceeded. Please try again later.")
-            
+
+        # A template citation beats an error page
+        print(f"Citation generation failed: {e}")
+        citation_text, source = fallback_citation(paper, format)
+        return {
+            "success": True,
+            "format": format,
+            "citation": citation_text,
+            "degraded": True,
+            "source": source
+        }
+
+
+@app.get("/api/reading-lists/{list_id}/citations")
+def get_reading_list_citations(list_id: int, formats: str = "APA"):
+    """Citations for every paper in a reading list, batched into few LLM calls."""
+    mock_user_id = "user_123"
+
+    format_list = [f.strip() for f in formats.split(",") if f.strip()]
+    unsupported = [f for f in format_list if f not in SUPPORTED_FORMATS]
+    if not format_list or unsupported:
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to generate citation: {str(e)}"
+            status_code=400,
+            detail=f"Unsupported format. Allowed: {', '.join(SUPPORTED_FORMATS)}"
         )
 
+    if not get_reading_list_by_id(list_id, mock_user_id):
+        raise HTTPException(status_code=404, detail="Reading list not found")
+
+    papers = list(iter_user_papers(mock_user_id, list_id))
+    if not papers:
+        return {"success": True, "formats": format_list, "count": 0, "citations": [], "llm_calls": 0}
+
+    degraded = False
+    try:
+        # Citations are cached as they arrive, so a batch that fails later
+        # (breaker open, deadline spent) costs only its own papers
+        results, stats = llm_batch.batch_citations(
+            [(paper, format_list) for paper in papers],
+            complete_with_gemini,
+            prompt_budget=LLM_PROMPT_TOKEN_BUDGET,
+            output_budget=LLM_OUTPUT_TOKEN_BUDGET,
+            unavailable=(resilience.DependencyUnavailable,),
+            on_result=lambda paper, fmt, citation: remember_citation(paper["id"], fmt, citation)
+        )
+    except Exception as e:
+        if is_rate_limit_error(e):
+            raise HTTPException(status_code=429, detail="AI request limit exceeded. Please try again later.")
+        raise HTTPException(status_code=500, detail=f"Failed to generate citations: {str(e)}")
+
+    if stats["unavailable"]:
+        print(f"Reading list citations degraded: {stats['unavailable']} batch(es) unavailable")
+    for paper, result in zip(papers, results):
+        for fmt, citation in result.items():
+            if not citation:
+                # Unanswered after the retry caps, or Gemini unavailable
+                result[fmt] = fallback_citation(paper, fmt)[0]
+                degraded = True
+
+    citations = [
+        {"paper_id": paper["id"], "title": paper["title"], "citations": result}
+        for paper, result in zip(papers, results)
+    ]
+    return {
+        "success": True,
+        "formats": format_list,
+        "count": len(citations),
+        "citations": citations,
+        "llm_calls": stats["calls"],
+        "failed": stats["failed"],
+        "degraded": degraded
+    }
+
 
 # ==============================
 # 🔗 RELATED PAPERS FEATURE
 # ==============================
 
-def find_related_papers_with_llm(current_paper: dict, other_papers: list) -> list:
-    """
-    Uses Google Gemini to find related papers using a single BATCHED call 
-    to avoid rate limits.
-    """
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("GOOGLE_API_KEY not found")
-        return []
-
-    genai.configure(api_key=api_key)
-    # Use flash model for speed
-    model = genai.GenerativeModel("gemini-flash-latest")
-    
-    # 1. Prepare candidates text
-    candidates_text = ""
-    # Create a quick lookup map
-    paper_map = {p['id']: p for p in other_papers}
-    
-    for i, p in enumerate(other_papers):
-        # Truncate abstract to save tokens
-        abstract_snippet = (p['abstract'][:300] + '...') if len(p['abstract']) > 300 else p['abstract']
-        candidates_text += f"ID: {p['id']}\nTitle: {p['title']}\nAbstract: {abstract_snippet}\n\n"
+# Saved papers read per request, and how many of the closest (by word
+# overlap) are sent to the LLM in token-budgeted batches
+RELATED_SCAN_LIMIT = int(os.getenv("RELATED_SCAN_LIMIT", "2000"))
+RELATED_MAX_CANDIDATES = int(os.getenv("RELATED_MAX_CANDIDATES", "60"))
 
-    # 2. Single Prompt
-    prompt = f"""
-    You are a research similarity expert.
-    
-    Target Paper:
-    Title: {current_paper['title']}
-    Abstract: {current_paper['abstract'][:500]}
+# Weight of a full-text match (0-1) next to title/abstract word overlap
+RELATED_FULLTEXT_WEIGHT = float(os.getenv("RELATED_FULLTEXT_WEIGHT", "0.5"))
 
-    Candidates:
-    {candidates_text}
+def fulltext_boost(scores: Optional[dict]) -> dict:
+    return {paper_id: score * RELATED_FULLTEXT_WEIGHT for paper_id, score in (scores or {}).items()}
 
-    Task:
-    Identify the top 3 most related papers from the Candidates list based on the Target Paper.
-    
-    Return a JSON array of objects (NO markdown formatting, just raw JSON).
-    Format:
-    [
-      {{ "id": "paper_id", "similarity": 85, "reason": "Short reason" }},
-      ...
-    ]
-    
-    If none are related, return [].
+def find_related_papers_with_llm(current_paper: dict, other_papers: list,
+                                 fulltext_scores: Optional[dict] = None) -> list:
+    """
+    Uses Google Gemini to find related papers. Candidates are pre-ranked
+    locally, then packed into as few calls as the prompt token budget allows.
     """
+    with profiling.stage("related.prefilter"):
+        candidates = llm_batch.prefilter_candidates(
+            current_paper, other_papers, RELATED_MAX_CANDIDATES, fulltext_boost(fulltext_scores)
+        )
 
     try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Clean markdown if present
-        if text.startswith("```json"):
-            text = text.replace("```json", "").replace("```", "")
-        
-        results = json.loads(text)
-        
-        related_results = []
-        for res in results:
-            pid = res.get("id")
-            if pid in paper_map:
-                paper_data = paper_map[pid]
-                related_results.append({
-                    "id": paper_data["id"],
-                    "title": paper_data["title"],
-                    "authors": paper_data["authors"],
-                    "similarity": res.get("similarity", 0),
-                    "reason": res.get("reason", "Similarity detected.")
-                })
-                
-        # Sort desc
-        related_results.sort(key=lambda x: x["similarity"], reverse=True)
-        return related_results
-
+        related, stats = llm_batch.batch_related(
+            current_paper, candidates, complete_with_gemini, prompt_budget=LLM_PROMPT_TOKEN_BUDGET
+        )
+        if stats["failed"]:
+            print(f"Related papers: {stats['failed']} candidate(s) left unscored after retries")
+            if not related:
+                return find_related_papers_locally(current_paper, other_papers, fulltext_scores)
+
+        return [{
+            "id": r["paper"]["id"],
+            "title": r["paper"]["title"],
+            "authors": r["paper"]["authors"],
+            "similarity": r["similarity"],
+            "reason": r["reason"]
+        } for r in related]
+
+    except resilience.DependencyUnavailable:
+        raise
     except Exception as e:
         print(f"Error in batch related papers: {e}")
         # Check for rate limit here too just in case we want to propagate it
-        if "429" in str(e) or "quota" in str(e).lower():
+        if is_rate_limit_error(e):
             raise Exception("Rate limit exceeded")
         return []
 
 
+def find_related_papers_locally(current_paper: dict, other_papers: list,
+                                fulltext_scores: Optional[dict] = None) -> list:
+    """Word-overlap ranking, used while Gemini is unavailable."""
+    with profiling.stage("related.rank_local"):
+        ranked = llm_batch.rank_by_overlap(
+            current_paper, other_papers, fulltext_boost(fulltext_scores)
+        )[:llm_batch.MAX_RELATED_RESULTS]
+    return [{
+        "id": paper["id"],
+        "title": paper["title"],
+        "authors": paper["authors"],
+        "similarity": round(min(score, 1.0) * 100, 1),
+        "reason": "Keyword overlap (AI ranking unavailable)"
+    } for score, paper in ranked if score > 0]
+
+
 @app.get("/api/papers/{paper_id}/related")
 def get_related_papers(paper_id: str):
     # Decode ID
@@ -856,7 +1607,8 @@ def get_related_papers(paper_id: str):
 
     try:
         # 1. Fetch current paper
-        paper = get_paper_by_id(paper_id, mock_user_id)
+        with profiling.stage("db.paper"):
+            paper = get_paper_by_id(paper_id, mock_user_id)
         
         if not paper:
             paper = fetch_arxiv_details(paper_id)
@@ -864,13 +1616,22 @@ def get_related_papers(paper_id: str):
                 raise HTTPException(status_code=404, detail="Paper not found")
 
         # 2. Fetch other papers from DB
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        # Fetch up to 10 other papers to compare against
-        cursor.execute("SELECT * FROM saved_papers WHERE paper_id != ? LIMIT 10", (paper_id,))
-        rows = cursor.fetchall()
-        conn.close()
+        with profiling.stage("db.candidates"):
+            conn = shards.connect(mock_user_id)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            # Fetch the user's most recent papers to compare against, skipping
+            # other versions of this paper and papers flagged as duplicates
+            cursor.execute("""
+                SELECT * FROM saved_papers
+                WHERE user_id = ? AND paper_id != ?
+                  AND id NOT IN (SELECT saved_paper_id FROM paper_minhash WHERE base_paper_id = ?)
+                  AND id NOT IN (SELECT saved_paper_id FROM paper_duplicates)
+                ORDER BY id DESC
+                LIMIT ?
+            """, (mock_user_id, paper_id, dedup.base_paper_id(paper_id), RELATED_SCAN_LIMIT))
+            rows = cursor.fetchall()
+            conn.close()
         
         other_papers = []
         for row in rows:
@@ -886,8 +1647,21 @@ def get_related_papers(paper_id: str):
         if not other_papers:
             return {"success": True, "count": 0, "related": []}
 
+        # Indexed PDFs that match this paper's title and abstract rank higher
+        try:
+            with profiling.stage("db.fulltext"):
+                fulltext_scores = fulltext.fulltext_similarity(DB_PATH, mock_user_id, paper)
+        except Exception as e:
+            print(f"Full-text related lookup failed: {e}")
+            fulltext_scores = {}
+
         # 3. Use LLM to find related
-        related = find_related_papers_with_llm(paper, other_papers)
+        try:
+            related = find_related_papers_with_llm(paper, other_papers, fulltext_scores)
+        except resilience.DependencyUnavailable as e:
+            print(f"Related papers degraded: {e}")
+            related = find_related_papers_locally(paper, other_papers, fulltext_scores)
+            return {"success": True, "count": len(related), "related": related, "degraded": True}
         
         return {
             "success": True, 
@@ -895,8 +1669,8 @@ def get_related_papers(paper_id: str):
             "related": related
         }
 
-    except HTTPException as he:
-        raise he
+    except (HTTPException, resilience.DependencyUnavailable):
+        raise
     except Exception as e:
         print(f"Related Papers Error: {e}")
         # Propagate 429
@@ -905,3 +1679,90 @@ def get_related_papers(paper_id: str):
              
         # Return empty list on failure instead of 500
         return {"success": False, "count": 0, "related": [], "error": str(e)}
+
+
+# ==============================
+# 🧩 SHARDING ADMIN
+# ==============================
+
+@app.get("/api/admin/shards")
+def get_shards(client_request: Request):
+    check_admin_token(client_request)
+    status = shards.status()
+    counts = shards.scatter(lambda conn: conn.execute("""
+        SELECT (SELECT COUNT(DISTINCT user_id) FROM saved_papers),
+               (SELECT COUNT(*) FROM saved_papers),
+               (SELECT COUNT(*) FROM reading_lists)
+    """).fetchone())
+    for shard in status["shards"]:
+        users, papers, lists = counts.get(shard["name"]) or (0, 0, 0)
+        shard.update({"users": users, "papers": papers, "reading_lists": lists})
+    return {"success": True, **status}
+
+@app.post("/api/admin/shards/rebalance")
+def rebalance_shards(client_request: Request, shards_count: int):
+    check_admin_token(client_request)
+    if shards_count < 1:
+        raise HTTPException(status_code=400, detail="shards_count must be at least 1")
+    status = shards.rebalance_status
+    if status and status["state"] not in ("done", "failed"):
+        raise HTTPException(status_code=409, detail="A rebalance is already running")
+
+    def run():
+        try:
+            shards.rebalance(shards_count, SHARD_DIR)
+        except Exception as e:
+            print(f"Shard rebalance failed: {e}")
+
+    # Only the user being copied waits; everyone else keeps being served
+    shards.rebalance_status = {"state": "starting", "target_shards": shards_count}
+    threading.Thread(target=run, name="shard-rebalance", daemon=True).start()
+    return {"success": True, "message": f"Rebalancing to {shards_count} shard(s)"}
+
+@app.get("/api/admin/related-candidates/{paper_id}")
+def get_global_related_candidates(paper_id: str, client_request: Request, limit: int = 20):
+    """Related-paper candidates from every user's library, across all shards."""
+    check_admin_token(client_request)
+    paper_id = unquote(paper_id)
+    base_id = dedup.base_paper_id(paper_id)
+
+    def newest_papers(conn):
+        return [dict(row) for row in conn.execute("""
+            SELECT paper_id, title, authors, abstract, publication_date, doi, user_id
+            FROM saved_papers ORDER BY id DESC LIMIT ?
+        """, (RELATED_SCAN_LIMIT,))]
+
+    rows = [row for shard_rows in shards.scatter(newest_papers).values() for row in shard_rows]
+    target = next((row for row in rows if row["paper_id"] == paper_id), None)
+    if target is None:
+        found = shards.scatter(lambda conn: conn.execute(
+            "SELECT title, abstract FROM saved_papers WHERE paper_id = ? LIMIT 1", (paper_id,)
+        ).fetchone())
+        target = next((dict(row) for row in found.values() if row is not None), None)
+    if target is None:
+        target = fetch_arxiv_details(paper_id)
+        if not target:
+            raise HTTPException(status_code=404, detail="Paper not found")
+
+    # One candidate per paper, however many users saved it
+    candidates = {}
+    for row in rows:
+        if dedup.base_paper_id(row["paper_id"]) == base_id:
+            continue
+        candidate = candidates.setdefault(row["paper_id"], {**row, "saved_by": 0})
+        candidate["saved_by"] += 1
+
+    ranked = llm_batch.rank_by_overlap(target, list(candidates.values()))[:max(limit, 0)]
+    results = [{
+        "id": paper["paper_id"],
+        "title": paper["title"],
+        "authors": paper["authors"].split(", "),
+        "saved_by": paper["saved_by"],
+        "similarity": round(score * 100, 1)
+    } for score, paper in ranked if score > 0]
+    return {
+        "success": True,
+        "count": len(results),
+        "shards_scanned": len(shards.paths),
+        "candidates": results
+    }
@@ -0,0 +1,293 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it carries an ``X-Profile`` header equal to
+``PROFILE_TOKEN`` or is picked by the ``PROFILE_SAMPLE_RATE`` sampler.
+Without a token the header is ignored, so only the operator's sample rate
+can turn profiling on. A profiled request gets:
+
+- per-stage wall-clock timings from ``with profiling.stage("name"):``
+  blocks placed around the interesting parts of a handler,
+- a sampled call-stack profile: a background thread snapshots the stacks of
+  the threads running one of the request's stages every
+  ``PROFILE_INTERVAL_MS`` and counts
+  collapsed stacks (the format flame graph tools read),
+- an ``X-Profile-Id`` response header.
+
+The ``PROFILE_KEEP`` slowest profiled requests are kept in memory for the
+admin endpoints.
+
+When a request is not profiled, the middleware does one header scan and
+``stage()`` does one ``ContextVar`` lookup.
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+MAX_STACK_DEPTH = 64
+MAX_STACKS_KEPT = 50
+
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+_profile_ids = itertools.count(1)
+
+
+# ==============================
+# ⏱️ STAGE TIMINGS
+# ==============================
+
+class RequestProfile:
+    """Timings and stack samples collected for one request."""
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = next(_profile_ids)
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.status = None
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.stages: List[dict] = []
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        # thread id -> number of this request's stages open on that thread
+        self.thread_ids: Dict[int, int] = {}
+        self._threads_lock = threading.Lock()
+        self._depth = 0
+
+    def _enter_thread(self, thread_id: int):
+        with self._threads_lock:
+            self.thread_ids[thread_id] = self.thread_ids.get(thread_id, 0) + 1
+
+    def _leave_thread(self, thread_id: int):
+        with self._threads_lock:
+            remaining = self.thread_ids[thread_id] - 1
+            if remaining:
+                self.thread_ids[thread_id] = remaining
+            else:
+                del self.thread_ids[thread_id]
+
+    def active_threads(self) -> tuple:
+        with self._threads_lock:
+            return tuple(self.thread_ids)
+
+    def summary(self) -> dict:
+        totals: Dict[str, float] = {}
+        for s in self.stages:
+            totals[s["name"]] = round(totals.get(s["name"], 0.0) + s["duration_ms"], 3)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "stage_totals_ms": totals,
+        }
+
+    def detail(self) -> dict:
+        top = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)[:MAX_STACKS_KEPT]
+        return {
+            **self.summary(),
+            "stages": self.stages,
+            "samples": self.samples,
+            "stacks": [{"stack": stack, "count": count} for stack, count in top],
+        }
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "start", "depth", "thread_id")
+
+    def __init__(self, profile: RequestProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        profile = self.profile
+        # Sample this thread only while it runs the stage; the loop and pool
+        # threads serve other requests the rest of the time
+        self.thread_id = threading.get_ident()
+        profile._enter_thread(self.thread_id)
+        self.depth = profile._depth
+        profile._depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        profile = self.profile
+        profile._depth -= 1
+        profile._leave_thread(self.thread_id)
+        profile.stages.append({
+            "name": self.name,
+            "depth": self.depth,
+            "offset_ms": round((self.start - profile.start) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+        })
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str):
+    """Times a block of the current request; a no-op when not profiling."""
+    profile = _current_profile.get()
+    if profile is None:
+        return _NULL_STAGE
+    return _Stage(profile, name)
+
+
+# ==============================
+# 📸 STACK SAMPLER
+# ==============================
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler(threading.Thread):
+    """
+    Samples the profile's active threads until ``stopped`` is set, then hands
+    the finished profile to the buffer, so the request never waits on it.
+    """
+
+    def __init__(self, profile: RequestProfile, buffer: "SlowRequestBuffer", interval_s: float):
+        super().__init__(name=f"profile-sampler-{profile.id}", daemon=True)
+        self.profile = profile
+        self.buffer = buffer
+        self.interval_s = interval_s
+        self.stopped = threading.Event()
+
+    def run(self):
+        profile = self.profile
+        while not self.stopped.wait(self.interval_s):
+            frames = sys._current_frames()
+            for thread_id in profile.active_threads():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _collapse(frame)
+                profile.stacks[stack] = profile.stacks.get(stack, 0) + 1
+                profile.samples += 1
+        self.buffer.add(profile)
+
+
+# ==============================
+# 🐢 SLOW REQUEST BUFFER
+# ==============================
+
+class SlowRequestBuffer:
+    """Keeps the ``capacity`` slowest profiles seen (a bounded min-heap)."""
+
+    def __init__(self, capacity: int = 50):
+        self.capacity = capacity
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        entry = (profile.duration_ms, profile.id, profile)
+        with self._lock:
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, entry)
+            elif entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self, limit: Optional[int] = None) -> List[RequestProfile]:
+        with self._lock:
+            profiles = [entry[2] for entry in sorted(self._heap, reverse=True)]
+        return profiles[:limit] if limit else profiles
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            for _, pid, profile in self._heap:
+                if pid == profile_id:
+                    return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+
+
+# ==============================
+# 🧩 ASGI MIDDLEWARE
+# ==============================
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body wrapping), so the
+    disabled path costs a header scan and a branch.
+    """
+
+    def __init__(self, app, buffer: SlowRequestBuffer, sample_rate: float = 0.0,
+                 token: Optional[str] = None, interval_ms: float = 5.0):
+        self.app = app
+        self.buffer = buffer
+        self.sample_rate = sample_rate
+        self.token = token.encode() if token else None
+        self.interval_s = interval_ms / 1000
+
+    def _reason(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                if self.token is not None and value == self.token:
+                    return "header"
+                break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        reason = self._reason(scope)
+        if reason is None:
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"], reason)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, str(profile.id).encode())
+                ]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        sampler = _Sampler(profile, self.buffer, self.interval_s)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.duration_ms = (time.perf_counter() - profile.start) * 1000
+            _current_profile.reset(token)
+            # The sampler adds the profile to the buffer once its last sample
+            # is in; joining here would block the event loop
+            sampler.stopped.set()
@@ -0,0 +1,244 @@
+"""
+Deadlines, circuit breakers and bulkheads for upstream dependencies.
+
+Every outbound call to arXiv or Gemini goes through a ``Dependency``, which
+combines three guards:
+
+- a deadline: each request gets a time budget (``REQUEST_DEADLINE_SECONDS``
+  or the client's ``X-Request-Timeout`` header, set by
+  ``DeadlineMiddleware``). A call's timeout is the smaller of the
+  dependency's own timeout and what is left of that budget.
+- a circuit breaker: after ``failure_threshold`` consecutive failures the
+  dependency is skipped for ``recovery_timeout`` seconds. A single probe
+  call is then let through (half-open); success closes the breaker again.
+- a bulkhead: a semaphore capping concurrent calls, so a hung upstream can
+  tie up at most ``max_concurrent`` worker threads.
+
+All refusals raise ``DependencyUnavailable`` so callers can switch to a
+degraded answer (cached or local results) instead of waiting.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+DEADLINE_HEADER = b"x-request-timeout"
+MIN_CALL_TIMEOUT = 0.05
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DependencyUnavailable(Exception):
+    """An upstream call was refused or failed; ``reason`` says why."""
+
+    def __init__(self, dependency: str, reason: str, retry_after: Optional[float] = None):
+        super().__init__(f"{dependency} unavailable: {reason}")
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ==============================
+# ⏳ DEADLINES
+# ==============================
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None outside a request."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware that starts each HTTP request's time budget."""
+
+    def __init__(self, app, default_seconds: float, max_seconds: float):
+        self.app = app
+        self.default_seconds = default_seconds
+        self.max_seconds = max_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        budget = self.default_seconds
+        for name, value in scope["headers"]:
+            if name == DEADLINE_HEADER:
+                try:
+                    budget = min(max(float(value), 0.0), self.max_seconds)
+                except ValueError:
+                    pass
+                break
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+
+
+# ==============================
+# 🔌 CIRCUIT BREAKER
+# ==============================
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                # Exactly one caller probes the upstream; the rest fail fast
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            return max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def release_probe(self):
+        """Returns an unused half-open probe so another caller can take it."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+# ==============================
+# 🚧 DEPENDENCY
+# ==============================
+
+def is_upstream_error(response: requests.Response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class Dependency:
+    """An upstream service guarded by a deadline, breaker and bulkhead."""
+
+    def __init__(self, name: str, timeout: float, max_concurrent: int, max_wait: float = 0.5,
+                 failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {"calls": 0, "failures": 0, "rejected_open": 0, "rejected_full": 0, "rejected_deadline": 0}
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, timeout: float, max_concurrent: int, **kwargs) -> "Dependency":
+        """Builds a dependency whose limits can be overridden by ``<PREFIX>_*`` variables."""
+        return cls(
+            name,
+            timeout=float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", timeout)),
+            max_concurrent=int(os.getenv(f"{prefix}_MAX_CONCURRENT", max_concurrent)),
+            failure_threshold=int(os.getenv(f"{prefix}_FAILURE_THRESHOLD", kwargs.pop("failure_threshold", 5))),
+            recovery_timeout=float(os.getenv(f"{prefix}_RECOVERY_SECONDS", kwargs.pop("recovery_timeout", 30.0))),
+            **kwargs,
+        )
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def call(self, fn: Callable[[float], object], is_failure: Callable[[object], bool] = None,
+             timeout: Optional[float] = None):
+        """
+        Runs ``fn(timeout)`` with the tightest of ``timeout``, the
+        dependency's timeout and the request deadline. Exceptions, and
+        results for which ``is_failure`` returns True, count against the
+        breaker.
+        """
+        left = remaining()
+        if left is not None and left < MIN_CALL_TIMEOUT:
+            self._count("rejected_deadline")
+            raise DependencyUnavailable(self.name, "request deadline exceeded")
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            raise DependencyUnavailable(self.name, "circuit open", self.breaker.retry_after())
+
+        wait = self.max_wait if left is None else min(self.max_wait, left)
+        if not self._slots.acquire(timeout=wait):
+            self.breaker.release_probe()
+            self._count("rejected_full")
+            raise DependencyUnavailable(self.name, "too many concurrent calls", 1.0)
+
+        with self._lock:
+            self.in_flight += 1
+            self.stats["calls"] += 1
+        try:
+            limit = self.timeout if timeout is None else min(self.timeout, timeout)
+            left = remaining()
+            if left is not None:
+                limit = max(min(limit, left), MIN_CALL_TIMEOUT)
+            try:
+                result = fn(limit)
+            except Exception as e:
+                self.breaker.record_failure()
+                self._count("failures")
+                raise DependencyUnavailable(self.name, str(e)) from e
+            if is_failure is not None and is_failure(result):
+                self.breaker.record_failure()
+                self._count("failures")
+            else:
+                self.breaker.record_success()
+            return result
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def get(self, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """``requests.get`` through the guards; 429 and 5xx count as failures."""
+        return self.call(
+            lambda limit: requests.get(url, timeout=limit, **kwargs),
+            is_failure=is_upstream_error,
+            timeout=timeout,
+        )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            in_flight = self.in_flight
+        return {
+            "name": self.name,
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": in_flight,
+            "max_concurrent": self.max_concurrent,
+            "timeout_s": self.timeout,
+            **stats,
+        }
@@ -0,0 +1,568 @@
+"""
+Per-tenant sharding of saved papers and reading lists.
+
+Each user's rows live in exactly one shard database. A consistent-hash ring
+over the shard names decides where a user lives, so changing the shard
+count moves only the users whose ring position changed (about 1/N of them
+when adding the Nth shard). Users that are mid-move, or were pinned during
+a rebalance, are recorded as placements that override the ring.
+
+The shard list and placements are kept in a small map database
+(``SHARD_MAP_PATH``). Without one, the router serves a single shard: the
+original ``papers.db``, which stays ``shard-0`` after sharding.
+
+Moves are online. Connections handed out by ``connect()`` hold a per-user
+lease. A user is moved once they hold no lease: new leases for that user
+wait only while their rows are copied to the target shard, the placement
+flips and the source rows are deleted. Users who stay busy (a long export,
+say) are skipped and retried, and end up pinned where they are. Other
+users are never blocked. The rings switch without stopping anyone: every
+user whose shard would change and who has not moved yet is pinned first.
+
+Reading-list ids come from ``new_list_id()``, which is unique across all
+shards, so a list keeps its id (and its URL) when its owner moves. Saved-
+paper row ids are only unique within a shard and change on a move;
+``paper_id`` strings do not.
+
+Full-text tables stay in ``shard-0`` with the full-text pipeline.
+
+Usage:
+    python sharding.py status --map shard_map.db --db papers.db
+    python sharding.py rebalance --map shard_map.db --db papers.db --shards 4 --dir shards
+"""
+
+import argparse
+import bisect
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_VNODES = 160
+DRAIN_TIMEOUT = 2.0
+MAX_DRAIN_ATTEMPTS = 10
+PRIMARY_SHARD = "shard-0"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+def shard_name(index: int) -> str:
+    return f"shard-{index}"
+
+
+# ==============================
+# 💍 HASH RING
+# ==============================
+
+class HashRing:
+    """Consistent hashing with ``vnodes`` points per shard to even out load."""
+
+    def __init__(self, nodes: List[str], vnodes: int = DEFAULT_VNODES):
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{v}"), node) for node in self.nodes for v in range(vnodes))
+        self._keys = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        i = bisect.bisect(self._keys, _hash(key))
+        return self._owners[i % len(self._owners)]
+
+
+# ==============================
+# 🗺️ SHARD MAP
+# ==============================
+
+def _open_map(map_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(map_path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS shards (
+            name TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS placements (
+            user_id TEXT PRIMARY KEY,
+            shard TEXT NOT NULL
+        )
+    """)
+    return conn
+
+
+def clone_schema(src_path: str, dst_path: str):
+    """Creates ``src_path``'s tables, indexes and triggers in a new database."""
+    src = sqlite3.connect(src_path)
+    statements = src.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+    """).fetchall()
+    src.close()
+    dst = sqlite3.connect(dst_path)
+    dst.execute("PRAGMA journal_mode = WAL")
+    for (sql,) in statements:
+        dst.execute(sql.replace("CREATE TABLE ", "CREATE TABLE IF NOT EXISTS ", 1)
+                       .replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1)
+                       .replace("CREATE TRIGGER ", "CREATE TRIGGER IF NOT EXISTS ", 1))
+    dst.commit()
+    dst.close()
+
+
+# ==============================
+# 🚚 MOVING A USER
+# ==============================
+
+def _delete_user_rows(conn: sqlite3.Connection, user_id: str):
+    conn.execute("DELETE FROM paper_lsh_buckets WHERE user_id = ?", (user_id,))
+    conn.execute("DELETE FROM paper_minhash WHERE user_id = ?", (user_id,))
+    conn.execute("DELETE FROM paper_duplicates WHERE user_id = ?", (user_id,))
+    # Lists first, so the summary triggers drop their rows instead of
+    # recounting them once per deleted paper
+    conn.execute("DELETE FROM reading_lists WHERE user_id = ?", (user_id,))
+    conn.execute("DELETE FROM saved_papers WHERE user_id = ?", (user_id,))
+
+
+def _copy_user_rows(src: sqlite3.Connection, dst: sqlite3.Connection, user_id: str) -> int:
+    """Copies a user's rows, papers under fresh ids; returns the number of papers copied."""
+    list_ids = {}
+    for old_id, name, description, created_at in src.execute(
+        "SELECT id, name, description, created_at FROM reading_lists WHERE user_id = ? ORDER BY id", (user_id,)
+    ).fetchall():
+        try:
+            # List ids are unique across shards (``new_list_id``), so they move as-is
+            cursor = dst.execute(
+                "INSERT INTO reading_lists (id, name, description, user_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                (old_id, name, description, user_id, created_at)
+            )
+        except sqlite3.IntegrityError:
+            # Lists created per shard before ids were global can collide
+            cursor = dst.execute(
+                "INSERT INTO reading_lists (name, description, user_id, created_at) VALUES (?, ?, ?, ?)",
+                (name, description, user_id, created_at)
+            )
+        list_ids[old_id] = cursor.lastrowid
+
+    paper_ids = {}
+    for row in src.execute("""
+        SELECT id, paper_id, title, authors, abstract, publication_date, doi, reading_list_id, created_at
+        FROM saved_papers WHERE user_id = ? ORDER BY id
+    """, (user_id,)).fetchall():
+        cursor = dst.execute("""
+            INSERT INTO saved_papers
+            (paper_id, title, authors, abstract, publication_date, doi, user_id, reading_list_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (*row[1:7], user_id, list_ids.get(row[7]), row[8]))
+        paper_ids[row[0]] = cursor.lastrowid
+
+    # Signatures and duplicate links carry over as-is under the new ids
+    dst.executemany(
+        "INSERT INTO paper_minhash (saved_paper_id, user_id, base_paper_id, signature) VALUES (?, ?, ?, ?)",
+        [(paper_ids[sid], user_id, base, signature) for sid, base, signature in src.execute(
+            "SELECT saved_paper_id, base_paper_id, signature FROM paper_minhash WHERE user_id = ?", (user_id,)
+        ) if sid in paper_ids]
+    )
+    dst.executemany(
+        "INSERT OR IGNORE INTO paper_lsh_buckets (user_id, band, bucket, saved_paper_id) VALUES (?, ?, ?, ?)",
+        [(user_id, band, bucket, paper_ids[sid]) for band, bucket, sid in src.execute(
+            "SELECT band, bucket, saved_paper_id FROM paper_lsh_buckets WHERE user_id = ?", (user_id,)
+        ) if sid in paper_ids]
+    )
+    dst.executemany("""
+        INSERT OR REPLACE INTO paper_duplicates (saved_paper_id, user_id, duplicate_of, similarity, reason, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(paper_ids[sid], user_id, paper_ids[dup], similarity, reason, created_at)
+          for sid, dup, similarity, reason, created_at in src.execute(
+              "SELECT saved_paper_id, duplicate_of, similarity, reason, created_at FROM paper_duplicates WHERE user_id = ?",
+              (user_id,)
+          ) if sid in paper_ids and dup in paper_ids])
+    return len(paper_ids)
+
+
+# ==============================
+# 🧭 ROUTER
+# ==============================
+
+class _LeasedConnection(sqlite3.Connection):
+    """A connection that releases its user's lease when closed."""
+
+    _release = None
+
+    def close(self):
+        super().close()
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __del__(self):
+        # Connections left open on error paths must not block moves forever
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+
+class ShardRouter:
+    """Maps users to shard databases and moves them between shards."""
+
+    def __init__(self, paths: Dict[str, str], active: List[str], placements: Dict[str, str],
+                 map_path: str, init_shard: Optional[Callable[[str], None]] = None,
+                 vnodes: int = DEFAULT_VNODES):
+        self.paths = dict(paths)
+        self.active = list(active)
+        self.placements = dict(placements)
+        self.map_path = map_path
+        self.init_shard = init_shard
+        self.vnodes = vnodes
+        self.ring = HashRing(self.active, vnodes)
+        self.rebalance_status: Optional[dict] = None
+        self._cond = threading.Condition()
+        self._in_flight = collections.Counter()
+        self._moving = set()
+        # Users a move is waiting for; their last lease hands them over
+        self._wanted = set()
+        # Users that opened a connection while a rebalance runs
+        self._touched: Optional[set] = None
+        self._rebalance_lock = threading.Lock()
+        self._id_lock = threading.Lock()
+        self._last_list_id = 0
+
+    @classmethod
+    def open(cls, map_path: str, default_path: str, init_shard: Optional[Callable[[str], None]] = None,
+             vnodes: int = DEFAULT_VNODES) -> "ShardRouter":
+        """
+        Loads the shard map, or serves ``default_path`` alone if there is
+        none. ``default_path`` is always ``shard-0``; a map that places
+        ``shard-0`` elsewhere is refused rather than silently followed.
+        """
+        if not os.path.exists(map_path):
+            return cls({PRIMARY_SHARD: default_path}, [PRIMARY_SHARD], {}, map_path, init_shard, vnodes)
+        conn = _open_map(map_path)
+        rows = conn.execute("SELECT name, path, active FROM shards ORDER BY rowid").fetchall()
+        placements = dict(conn.execute("SELECT user_id, shard FROM placements").fetchall())
+        conn.close()
+        primary = next((path for name, path, _ in rows if name == PRIMARY_SHARD), None)
+        if primary is not None and os.path.abspath(primary) != os.path.abspath(default_path):
+            raise ValueError(
+                f"Shard map {map_path} has {PRIMARY_SHARD} at {primary}, not {default_path}; "
+                "point SHARD_MAP_PATH at the map that belongs to this database"
+            )
+        router = cls({name: path for name, path, _ in rows}, [name for name, _, active in rows if active],
+                     placements, map_path, init_shard, vnodes)
+        if init_shard is not None:
+            for path in router.paths.values():
+                init_shard(path)
+        return router
+
+    def _save_map(self):
+        conn = _open_map(self.map_path)
+        with conn:
+            conn.execute("DELETE FROM shards")
+            conn.executemany(
+                "INSERT INTO shards (name, path, active) VALUES (?, ?, ?)",
+                [(name, path, int(name in self.active)) for name, path in self.paths.items()]
+            )
+            conn.execute("DELETE FROM placements")
+            conn.executemany("INSERT INTO placements (user_id, shard) VALUES (?, ?)", self.placements.items())
+        conn.close()
+
+    # --- Routing ---
+
+    def shard_for(self, user_id: str) -> str:
+        return self.placements.get(user_id) or self.ring.node_for(user_id)
+
+    def path_for(self, user_id: str) -> str:
+        return self.paths[self.shard_for(user_id)]
+
+    @property
+    def primary_path(self) -> str:
+        return self.paths[PRIMARY_SHARD]
+
+    def _acquire(self, user_id: str) -> str:
+        with self._cond:
+            while user_id in self._moving:
+                self._cond.wait()
+            self._in_flight[user_id] += 1
+            if self._touched is not None:
+                self._touched.add(user_id)
+            return self.paths[self.shard_for(user_id)]
+
+    def _release(self, user_id: str):
+        with self._cond:
+            self._in_flight[user_id] -= 1
+            if self._in_flight[user_id] <= 0:
+                del self._in_flight[user_id]
+                # Claimed before the lock is released, so a user who keeps
+                # reconnecting cannot slip in ahead of the move
+                if user_id in self._wanted:
+                    self._wanted.discard(user_id)
+                    self._moving.add(user_id)
+            self._cond.notify_all()
+
+    def connect(self, user_id: str, **kwargs) -> sqlite3.Connection:
+        """Opens the user's shard; the user cannot be moved until it is closed."""
+        path = self._acquire(user_id)
+        try:
+            conn = sqlite3.connect(path, factory=_LeasedConnection, **kwargs)
+        except Exception:
+            self._release(user_id)
+            raise
+        conn._release = lambda: self._release(user_id)
+        return conn
+
+    @contextmanager
+    def lease(self, user_id: str):
+        """Holds the user in place for path-based helpers; yields the shard path."""
+        path = self._acquire(user_id)
+        try:
+            yield path
+        finally:
+            self._release(user_id)
+
+    def new_list_id(self) -> int:
+        """A reading-list id never used on any shard."""
+        with self._id_lock:
+            # sqlite_sequence remembers ids of deleted lists too
+            used = self.scatter(lambda conn: conn.execute("""
+                SELECT MAX(COALESCE((SELECT MAX(id) FROM reading_lists), 0),
+                           COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'reading_lists'), 0))
+            """).fetchone()[0])
+            self._last_list_id = max(self._last_list_id, *used.values()) + 1
+            return self._last_list_id
+
+    # --- Cross-shard queries ---
+
+    def scatter(self, fn: Callable[[sqlite3.Connection], object]) -> Dict[str, object]:
+        """Runs ``fn(conn)`` on every shard in parallel and returns results by shard name."""
+        def run(path):
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            try:
+                return fn(conn)
+            finally:
+                conn.close()
+
+        names = list(self.paths)
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            results = pool.map(run, [self.paths[name] for name in names])
+            return dict(zip(names, results))
+
+    def users_in(self, name: str) -> List[str]:
+        conn = sqlite3.connect(self.paths[name])
+        rows = conn.execute(
+            "SELECT user_id FROM saved_papers UNION SELECT user_id FROM reading_lists"
+        ).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    # --- Moves ---
+
+    def _drain(self, user_id: str, timeout: float) -> bool:
+        """
+        Waits until the user holds no lease, then stops new ones. New leases
+        are not held up while waiting, so a busy user delays only the move.
+        """
+        with self._cond:
+            if self._in_flight[user_id] == 0:
+                self._moving.add(user_id)
+                return True
+            self._wanted.add(user_id)
+            deadline = time.monotonic() + timeout
+            while user_id not in self._moving:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    self._wanted.discard(user_id)
+                    return False
+                self._cond.wait(left)
+            return True
+
+    def _undrain(self, user_id: str):
+        with self._cond:
+            self._moving.discard(user_id)
+            self._cond.notify_all()
+
+    def _place(self, user_id: str, name: str):
+        if name == self.ring.node_for(user_id):
+            self.placements.pop(user_id, None)
+        else:
+            self.placements[user_id] = name
+
+    def move_user(self, user_id: str, dest: str, timeout: float = DRAIN_TIMEOUT) -> Optional[int]:
+        """
+        Moves a user's rows to shard ``dest``. Returns the number of papers
+        moved, or None if the user's open connections did not close in time.
+        """
+        if not self._drain(user_id, timeout):
+            return None
+        try:
+            source = self.shard_for(user_id)
+            if source == dest:
+                return 0
+            src = sqlite3.connect(self.paths[source], timeout=30)
+            dst = sqlite3.connect(self.paths[dest], timeout=30)
+            try:
+                # Clearing the target first makes a retried move idempotent
+                dst.execute("BEGIN IMMEDIATE")
+                _delete_user_rows(dst, user_id)
+                moved = _copy_user_rows(src, dst, user_id)
+                dst.commit()
+                with self._cond:
+                    self._place(user_id, dest)
+                    self._save_map()
+                src.execute("BEGIN IMMEDIATE")
+                _delete_user_rows(src, user_id)
+                src.commit()
+            finally:
+                src.close()
+                dst.close()
+            return moved
+        finally:
+            self._undrain(user_id)
+
+    def rebalance(self, shard_count: int, shard_dir: str, timeout: float = DRAIN_TIMEOUT) -> dict:
+        """
+        Moves to ``shard_count`` shards while the API keeps serving.
+        New shard files are created in ``shard_dir``; shards beyond the new
+        count are emptied and retired.
+        """
+        if not self._rebalance_lock.acquire(blocking=False):
+            raise RuntimeError("A rebalance is already running")
+        try:
+            target = [shard_name(i) for i in range(shard_count)]
+            os.makedirs(shard_dir, exist_ok=True)
+            for name in target:
+                if name not in self.paths:
+                    path = os.path.join(shard_dir, f"papers-{name}.db")
+                    if self.init_shard is not None:
+                        self.init_shard(path)
+                    else:
+                        clone_schema(self.primary_path, path)
+                    with self._cond:
+                        self.paths[name] = path
+            with self._cond:
+                self._save_map()
+
+            new_ring = HashRing(target, self.vnodes)
+            status = self.rebalance_status = {
+                "state": "moving", "target_shards": shard_count, "users_scanned": 0,
+                "users_moved": 0, "papers_moved": 0, "retries": 0, "started_at": time.time(),
+            }
+
+            def move_all(pending: list):
+                # Users still busy after the last attempt stay pinned where they are
+                for _ in range(MAX_DRAIN_ATTEMPTS):
+                    if not pending:
+                        return
+                    retry = []
+                    for user_id in pending:
+                        dest = new_ring.node_for(user_id)
+                        if self.shard_for(user_id) == dest:
+                            continue
+                        moved = self.move_user(user_id, dest, timeout)
+                        if moved is None:
+                            retry.append(user_id)
+                            status["retries"] += 1
+                        else:
+                            status["users_moved"] += 1
+                            status["papers_moved"] += moved
+                    pending = retry
+
+            # Anyone who holds or takes a lease from here on is known at the
+            # switch, even if the scan below misses their first rows
+            with self._cond:
+                self._touched = set(self._in_flight)
+
+            # 1. Move every user whose ring position changes, one at a time
+            users = []
+            for name in list(self.paths):
+                users.extend(u for u in self.users_in(name) if self.shard_for(u) == name)
+            status["users_scanned"] = len(users)
+            move_all(users)
+
+            # 2. Switch rings. Users whose shard would change are pinned where
+            #    they are first, so nobody has to stop
+            status["state"] = "switching"
+            with self._cond:
+                stragglers = []
+                for user_id in set(users) | self._touched:
+                    current = self.shard_for(user_id)
+                    if current != new_ring.node_for(user_id):
+                        self.placements[user_id] = current
+                        stragglers.append(user_id)
+                self._touched = None
+                self.ring = new_ring
+                self.active = target
+                self.placements = {u: s for u, s in self.placements.items() if s != new_ring.node_for(u)}
+                self._save_map()
+
+            # 3. Move the stragglers and retire shards that are now empty
+            status["state"] = "moving_stragglers"
+            status["users_scanned"] += len(stragglers)
+            move_all(stragglers)
+            with self._cond:
+                for name in [n for n in self.paths if n not in target and n != PRIMARY_SHARD]:
+                    if not self.users_in(name):
+                        del self.paths[name]
+                self._save_map()
+
+            status["state"] = "done"
+            status["elapsed_s"] = round(time.time() - status["started_at"], 2)
+            return status
+        except Exception as e:
+            if self.rebalance_status is not None:
+                self.rebalance_status.update({"state": "failed", "error": str(e)})
+            raise
+        finally:
+            with self._cond:
+                self._touched = None
+            self._rebalance_lock.release()
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "shards": [{"name": name, "path": path, "active": name in self.active}
+                           for name, path in self.paths.items()],
+                "placements": len(self.placements),
+                "moving": sorted(self._moving),
+                "rebalance": self.rebalance_status,
+            }
+
+
+# ==============================
+# 🖥️ CLI
+# ==============================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "rebalance"])
+    parser.add_argument("--map", default="shard_map.db", help="shard map database")
+    parser.add_argument("--db", default="papers.db", help="primary database (shard-0)")
+    parser.add_argument("--shards", type=int, help="target shard count (rebalance)")
+    parser.add_argument("--dir", default="shards", help="directory for new shard files")
+    args = parser.parse_args()
+
+    router = ShardRouter.open(args.map, args.db)
+    if args.command == "rebalance":
+        if not args.shards or args.shards < 1:
+            parser.error("rebalance needs --shards N")
+        # Offline use: the API must not be running against these files
+        router.rebalance(args.shards, args.dir)
+
+    status = router.status()
+    for name, counts in router.scatter(lambda conn: conn.execute(
+        "SELECT (SELECT COUNT(DISTINCT user_id) FROM saved_papers), (SELECT COUNT(*) FROM saved_papers)"
+    ).fetchone()).items():
+        shard = next(s for s in status["shards"] if s["name"] == name)
+        shard["users"], shard["papers"] = counts[0], counts[1]
+    print(json.dumps(status, indent=2))
+
+
+if __name__ == "__main__":
+    main()
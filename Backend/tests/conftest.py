@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# Guard limits for the API under test: short timeouts and a breaker that
+# trips and recovers within a test
+GUARD_ENV = {
+    "ARXIV_API_TIMEOUT_SECONDS": "1",
+    "ARXIV_PDF_TIMEOUT_SECONDS": "1",
+    "GEMINI_TIMEOUT_SECONDS": "1",
+    "GEMINI_FAILURE_THRESHOLD": "3",
+    "GEMINI_RECOVERY_SECONDS": "1",
+    "ARXIV_API_FAILURE_THRESHOLD": "3",
+    "ARXIV_API_RECOVERY_SECONDS": "1",
+}
+
+
+@pytest.fixture(scope="session")
+def stubs():
+    from stubs import ArxivStub, FaultProfile, GeminiStub
+
+    arxiv = ArxivStub(FaultProfile()).start()
+    gemini = GeminiStub(FaultProfile()).start()
+    yield arxiv, gemini
+    arxiv.stop()
+    gemini.stop()
+
+
+@pytest.fixture(scope="session")
+def main_module(stubs, tmp_path_factory):
+    """The API module, imported once against temporary databases and the stubs."""
+    arxiv, gemini = stubs
+    workdir = tmp_path_factory.mktemp("api")
+    os.environ.update({
+        "DB_PATH": str(workdir / "papers.db"),
+        "SHARD_MAP_PATH": str(workdir / "shard_map.db"),
+        "DB_SHARD_DIR": str(workdir / "shards"),
+        "ARXIV_MIRROR_PATH": str(workdir / "arxiv_mirror.db"),
+        "PDF_CACHE_DIR": str(workdir / "pdf_cache"),
+        "ARXIV_API_URL": arxiv.api_url,
+        "ARXIV_PDF_URL": arxiv.pdf_url_template,
+        "GEMINI_API_ENDPOINT": gemini.url,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY") or "stub-key",
+        "RATE_LIMIT_PER_MINUTE": "1000000",
+        "FULLTEXT_ON_SAVE": "0",
+        **GUARD_ENV,
+    })
+    import main
+
+    return main
+
+
+@pytest.fixture(scope="session")
+def client(main_module):
+    from fastapi.testclient import TestClient
+
+    return TestClient(main_module.app)
+
+
+@pytest.fixture(scope="session")
+def library(main_module, stubs):
+    """Seeds the user's library, including the recorded arXiv papers."""
+    from run_load import fixture_papers
+    from seed import seed_library
+
+    return seed_library(main_module.DB_PATH, 200, fixture_papers=fixture_papers(stubs[0]))
@@ -0,0 +1,31 @@
+import arxiv_mirror
+
+
+def records(count: int, seen: list, mirror: arxiv_mirror.ArxivMirror):
+    for i in range(count):
+        # Checked while earlier batches are already committed
+        seen.append(mirror.available)
+        yield {
+            "arxiv_id": f"2401.{i:05d}",
+            "latest_version": "v1",
+            "title": f"Graph networks {i}",
+            "authors": ["Ada Lovelace"],
+            "abstract": "We study graph neural networks.",
+            "categories": ["cs.LG"],
+            "doi": "",
+            "published": "2024-01-02",
+            "updated": "2024-01-03",
+        }
+
+
+def test_mirror_is_unavailable_until_the_ingest_completes(tmp_path):
+    db_path = str(tmp_path / "arxiv_mirror.db")
+    mirror = arxiv_mirror.ArxivMirror(db_path)
+    seen = []
+
+    arxiv_mirror.ingest(db_path, records(5, seen, mirror), batch_size=2)
+
+    assert seen == [False] * 5
+    assert mirror.available
+    assert mirror.latest_date() == "2024-01-03"
+    assert len(mirror.search("graph networks")) == 5
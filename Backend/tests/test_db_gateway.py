@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import db_gateway
+
+SLOW_QUERY_S = 1.0
+
+
+def slow_version(fn, started: threading.Event = None):
+    def slow(*args, **kwargs):
+        if started is not None:
+            started.set()
+        time.sleep(SLOW_QUERY_S)
+        return fn(*args, **kwargs)
+    return slow
+
+
+async def timed_get(client: httpx.AsyncClient, url: str):
+    start = time.perf_counter()
+    response = await client.get(url)
+    return response, time.perf_counter() - start
+
+
+def test_event_loop_keeps_serving_while_a_slow_query_runs(main_module, library, monkeypatch):
+    monkeypatch.setattr(main_module, "get_all_reading_lists", slow_version(main_module.get_all_reading_lists))
+
+    async def scenario():
+        # One ASGI app on one event loop, as under uvicorn
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            slow = [asyncio.create_task(client.get("/api/reading-lists")) for _ in range(2)]
+            await asyncio.sleep(0.1)
+            probes = [await timed_get(client, url) for url in ["/health", "/api/papers"] * 5]
+            still_running = not any(task.done() for task in slow)
+            slow_responses = await asyncio.gather(*slow)
+        return probes, still_running, slow_responses
+
+    probes, still_running, slow_responses = asyncio.run(scenario())
+    assert still_running
+    assert all(response.status_code == 200 for response, _ in probes)
+    assert max(elapsed for _, elapsed in probes) < SLOW_QUERY_S / 2
+    assert all(response.status_code == 200 for response in slow_responses)
+
+
+def test_full_queue_raises_database_busy():
+    gateway = db_gateway.DatabaseGateway(read_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(gateway.read(release.wait))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(gateway.read(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(db_gateway.DatabaseBusy) as busy:
+            await gateway.read(lambda: "refused")
+        release.set()
+        return busy.value, await running, await queued
+
+    try:
+        busy, running, queued = asyncio.run(scenario())
+    finally:
+        release.set()
+        gateway.shutdown()
+    assert busy.pool == "read" and busy.depth == 1
+    assert running is True and queued == "queued"
+    assert gateway.snapshot()["read"]["rejected"] == 1
+
+
+def test_api_sheds_reads_beyond_the_queue_limit(main_module, library, monkeypatch):
+    gateway = db_gateway.DatabaseGateway(read_workers=1, max_queue=1)
+    started = threading.Event()
+    monkeypatch.setattr(main_module, "db", gateway)
+    monkeypatch.setattr(main_module, "get_all_reading_lists",
+                        slow_version(main_module.get_all_reading_lists, started))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            running = asyncio.create_task(client.get("/api/reading-lists"))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            queued = asyncio.create_task(client.get("/api/reading-lists"))
+            await asyncio.sleep(0.05)
+            shed, elapsed = await timed_get(client, "/api/papers")
+            health, _ = await timed_get(client, "/health")
+            return shed, elapsed, health, await running, await queued
+
+    try:
+        shed, elapsed, health, running, queued = asyncio.run(scenario())
+    finally:
+        gateway.shutdown()
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert elapsed < SLOW_QUERY_S / 2
+    assert health.status_code == 200
+    assert running.status_code == 200 and queued.status_code == 200
+
+
+def test_cancelled_queued_work_leaves_the_queue():
+    gateway = db_gateway.DatabaseGateway(read_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(gateway.read(release.wait))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(gateway.read(lambda: "never"))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        depth = gateway.snapshot()["read"]["queue_depth"]
+        # The freed slot takes new work instead of raising DatabaseBusy
+        follow_up = asyncio.create_task(gateway.read(lambda: "ran"))
+        await asyncio.sleep(0.05)
+        release.set()
+        return depth, await running, await follow_up
+
+    try:
+        depth, running, follow_up = asyncio.run(scenario())
+    finally:
+        release.set()
+        gateway.shutdown()
+    assert depth == 0
+    assert running is True and follow_up == "ran"
+    stats = gateway.snapshot()["read"]
+    assert stats["queue_depth"] == 0 and stats["cancelled"] == 1 and stats["rejected"] == 0
@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import Future
+
+import fulltext
+
+
+class StuckPool:
+    """A process pool whose work never finishes."""
+
+    def submit(self, fn, *args):
+        return Future()
+
+
+def test_concurrent_downloads_of_one_paper_do_not_collide(stubs, tmp_path, monkeypatch):
+    arxiv = stubs[0]
+    monkeypatch.setattr(fulltext, "ARXIV_PDF_URL", arxiv.pdf_url_template)
+    pipelines = [fulltext.FullTextPipeline(str(tmp_path / "papers.db"), cache_dir=str(tmp_path / "pdf_cache"))
+                 for _ in range(8)]
+    errors = []
+
+    def download(pipeline):
+        try:
+            pipeline._download("2401.00001v1")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=download, args=(pipeline,)) for pipeline in pipelines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(p.name for p in (tmp_path / "pdf_cache").iterdir()) == ["2401.00001v1.pdf"]
+    assert (tmp_path / "pdf_cache" / "2401.00001v1.pdf").read_bytes() == arxiv.pdf_bytes
+
+
+def test_stuck_extraction_fails_the_job(main_module, stubs, tmp_path, monkeypatch):
+    monkeypatch.setattr(fulltext, "ARXIV_PDF_URL", stubs[0].pdf_url_template)
+    db_path = str(tmp_path / "papers.db")
+    main_module.init_db(db_path)
+    pipeline = fulltext.FullTextPipeline(db_path, cache_dir=str(tmp_path / "pdf_cache"), extract_timeout=0.2)
+
+    pipeline._run_job("user_123", "2401.00001v1", StuckPool())
+    status = pipeline.get_status("user_123", "2401.00001v1")
+    assert status["status"] == fulltext.STATUS_FAILED
+    assert "timed out" in status["error"]
@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+import library_io
+
+PAPER = {
+    "id": "2101.00001v2",
+    "title": "On {B}ayes Optimal {GAN}s",
+    "authors": ["Ada Lovelace", "Alan Turing"],
+    "abstract": "First paragraph of the abstract.\nSecond line, with a comma.\n\nA new paragraph.",
+    "publication_date": "2021",
+    "doi": "https://arxiv.org/abs/2101.00001v2",
+}
+
+
+@pytest.mark.parametrize("fmt", ["bibtex", "ris", "jsonl"])
+def test_export_then_import_round_trips(fmt):
+    exported = "".join(library_io.stream_export([PAPER, {**PAPER, "id": "2101.00002v1"}], fmt))
+    parsed = list(library_io.PARSERS[fmt](io.StringIO(exported)))
+    assert parsed == [PAPER, {**PAPER, "id": "2101.00002v1"}]
+
+
+def test_bibtex_escapes_unbalanced_braces():
+    papers = [
+        {**PAPER, "id": "2101.00001v1", "abstract": "Sets like {x | x > 0 are open."},
+        {**PAPER, "id": "2101.00002v1", "title": "Closing} brace", "abstract": "Ends with a backslash \\"},
+        {**PAPER, "id": "2101.00003v1"},
+    ]
+    exported = "".join(library_io.stream_export(papers, "bibtex"))
+    assert "like \\{x | x > 0" in exported and "Closing\\} brace" in exported
+    assert list(library_io.parse_bibtex(io.StringIO(exported))) == papers
+
+
+def test_bibtex_keeps_protective_braces():
+    entry = "@article{x,\n  title = {On {B}ayes},\n  eprint = {2101.00001}\n}\n"
+    [paper] = library_io.parse_bibtex(io.StringIO(entry))
+    assert paper["title"] == "On {B}ayes"
+
+
+def test_bibtex_drops_braces_wrapping_the_whole_title():
+    entry = "@article{x,\n  title = {{Attention Is All You Need}},\n  eprint = {1706.03762}\n}\n"
+    [paper] = library_io.parse_bibtex(io.StringIO(entry))
+    assert paper["title"] == "Attention Is All You Need"
+
+
+def test_ris_continuation_lines_keep_line_breaks():
+    exported = library_io.format_ris(PAPER)
+    assert "AB  - First paragraph of the abstract.\nSecond line, with a comma.\n" in exported
+    [paper] = library_io.parse_ris(io.StringIO(exported))
+    assert paper["abstract"] == PAPER["abstract"]
@@ -0,0 +1,87 @@
+import json
+import re
+
+import llm_batch
+
+
+def make_papers(count: int) -> list:
+    return [{
+        "id": f"2401.{i:05d}v1",
+        "title": f"Paper {i}",
+        "authors": ["Ada Lovelace"],
+        "abstract": "word " * 200,
+        "publication_date": "2024",
+        "doi": "",
+    } for i in range(count)]
+
+
+def test_citation_retries_are_capped():
+    calls = []
+
+    def broken(prompt):
+        calls.append(prompt)
+        return "[{\"key\": "
+
+    output, stats = llm_batch.batch_citations([(p, ["APA", "MLA"]) for p in make_papers(40)], broken)
+    batches = stats["calls"] - stats["retries"]
+    assert stats["retries"] <= batches * llm_batch.MAX_RETRIES_PER_BATCH
+    assert stats["failed"] == 80
+    assert all(citation is None for result in output for citation in result.values())
+
+
+def test_related_retries_are_capped():
+    _, stats = llm_batch.batch_related(make_papers(1)[0], make_papers(61)[1:], lambda prompt: "not json")
+    assert stats["calls"] <= 1 + llm_batch.MAX_RETRIES_PER_BATCH
+    assert stats["failed"] == 60
+
+
+def test_default_budget_fits_sixty_candidates_in_one_call():
+    papers = make_papers(61)
+    _, stats = llm_batch.batch_related(papers[0], papers[1:], lambda prompt: "[]")
+    assert stats["calls"] == 1
+
+
+def test_finalists_of_several_batches_are_scored_together():
+    papers = make_papers(13)
+    prompts = []
+
+    def complete(prompt):
+        prompts.append(prompt)
+        ids = re.findall(r"^ID: (\S+)$", prompt, re.M)
+        if len(prompts) == 1:
+            # A weak batch where the model still rates its best candidates highly
+            return json.dumps([{"id": i, "similarity": 95, "reason": "r"} for i in ids[:3]])
+        if len(prompts) == 2:
+            return json.dumps([{"id": i, "similarity": 80, "reason": "r"} for i in ids[:3]])
+        # Side by side, the second batch's finalists win
+        return json.dumps([{"id": i, "similarity": 90, "reason": "r"} for i in ids[3:6]])
+
+    related, stats = llm_batch.batch_related(papers[0], papers[1:], complete, prompt_budget=2000)
+    assert stats["calls"] == 3
+    assert len(re.findall(r"^ID: ", prompts[-1], re.M)) == 6
+    assert [r["paper"]["id"] for r in related] == re.findall(r"^ID: (\S+)$", prompts[1], re.M)[:3]
+
+
+class Unavailable(Exception):
+    pass
+
+
+def test_citations_answered_before_an_outage_are_kept():
+    calls = []
+    arrived = []
+
+    def complete(prompt):
+        calls.append(prompt)
+        if len(calls) > 1:
+            raise Unavailable("breaker open")
+        keys = re.findall(r"^Key: (\S+)$", prompt, re.M)
+        return json.dumps([{"key": key, "format": "APA", "citation": f"cite {key}"} for key in keys])
+
+    output, stats = llm_batch.batch_citations(
+        [(p, ["APA"]) for p in make_papers(40)], complete, prompt_budget=1000,
+        unavailable=(Unavailable,), on_result=lambda paper, fmt, citation: arrived.append(paper["id"])
+    )
+    answered = [result["APA"] for result in output if result["APA"]]
+    assert stats["calls"] == 1 and stats["unavailable"] == len(calls) - 1 > 0
+    assert answered and stats["failed"] == 40 - len(answered)
+    assert len(arrived) == len(answered)
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import profiling
+
+SCOPE = {"type": "http", "method": "GET", "path": "/slow", "headers": []}
+
+
+def profiled_scope(token: bytes) -> dict:
+    return {**SCOPE, "headers": [(profiling.PROFILE_HEADER, token)]}
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def slow_app(scope, receive, send):
+    with profiling.stage("work"):
+        time.sleep(0.05)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def wait_for_profile(buffer: profiling.SlowRequestBuffer, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        profiles = buffer.slowest()
+        if profiles:
+            return profiles[0]
+        time.sleep(0.01)
+    return None
+
+
+def test_header_is_ignored_without_a_token():
+    buffer = profiling.SlowRequestBuffer()
+    middleware = profiling.ProfilingMiddleware(slow_app, buffer)
+    asyncio.run(middleware(profiled_scope(b"1"), _receive, _send))
+    assert wait_for_profile(buffer, timeout=0.2) is None
+
+
+def test_header_must_match_the_token():
+    buffer = profiling.SlowRequestBuffer()
+    middleware = profiling.ProfilingMiddleware(slow_app, buffer, token="secret", interval_ms=1)
+    asyncio.run(middleware(profiled_scope(b"wrong"), _receive, _send))
+    assert wait_for_profile(buffer, timeout=0.2) is None
+
+    asyncio.run(middleware(profiled_scope(b"secret"), _receive, _send))
+    profile = wait_for_profile(buffer)
+    assert profile is not None
+    assert profile.summary()["stage_totals_ms"]["work"] >= 50
+    assert profile.samples > 0
+
+
+def test_threads_are_sampled_only_inside_stages():
+    profile = profiling.RequestProfile("GET", "/", "header")
+    assert profile.active_threads() == ()
+    token = profiling._current_profile.set(profile)
+    try:
+        with profiling.stage("outer"):
+            with profiling.stage("inner"):
+                assert profile.active_threads() == (threading.get_ident(),)
+            assert profile.active_threads() == (threading.get_ident(),)
+    finally:
+        profiling._current_profile.reset(token)
+    assert profile.active_threads() == ()
+
+
+def test_middleware_does_not_wait_for_the_sampler():
+    buffer = profiling.SlowRequestBuffer()
+    # A long interval: joining the sampler would hold the request for it
+    middleware = profiling.ProfilingMiddleware(slow_app, buffer, token="secret", interval_ms=1000)
+    start = time.perf_counter()
+    asyncio.run(middleware(profiled_scope(b"secret"), _receive, _send))
+    assert time.perf_counter() - start < 0.5
+    assert wait_for_profile(buffer) is not None
+
+
+def test_local_llm_batch_work_is_profiled():
+    import llm_batch
+
+    papers = [{"id": f"2401.{i:05d}", "title": f"Paper {i}", "authors": ["A"], "abstract": "word " * 50,
+               "publication_date": "2024", "doi": ""} for i in range(5)]
+    profile = profiling.RequestProfile("GET", "/related", "header")
+    token = profiling._current_profile.set(profile)
+    try:
+        llm_batch.batch_related(papers[0], papers[1:], lambda prompt: "[]")
+    finally:
+        profiling._current_profile.reset(token)
+    assert {"llm.pack", "llm.build", "llm.parse"} <= set(profile.summary()["stage_totals_ms"])
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def paper_id(library):
+    return library["fixture_ids"][0]
+
+
+@pytest.fixture(autouse=True)
+def healthy_upstreams(main_module, stubs, library):
+    """Each test starts with answering stubs, closed breakers and cold caches."""
+    def reset():
+        for stub in stubs:
+            stub.faults.down = False
+            stub.faults.latency_ms = 0.0
+            stub.faults.error_rate = 0.0
+            stub.faults.error_status = 503
+        for dependency in (main_module.arxiv_api, main_module.arxiv_pdf, main_module.gemini):
+            dependency.breaker.record_success()
+        main_module.citation_cache.clear()
+        main_module.search_fallback_cache.clear()
+
+    reset()
+    yield
+    reset()
+
+
+def timed_get(client, url: str, **kwargs):
+    start = time.perf_counter()
+    response = client.get(url, **kwargs)
+    return response, time.perf_counter() - start
+
+
+def test_sqlite_endpoints_stay_fast_while_upstreams_hang(client, stubs, paper_id):
+    for stub in stubs:
+        stub.faults.latency_ms = 3000
+
+    upstream_threads = [
+        threading.Thread(target=client.get, args=(f"/api/papers/{paper_id}/related",)),
+        threading.Thread(target=client.post, args=("/api/search",), kwargs={"json": {"query": "transformer"}}),
+    ] + [
+        threading.Thread(target=client.get, args=(f"/api/papers/{paper_id}/citation",))
+        for _ in range(6)
+    ]
+    for thread in upstream_threads:
+        thread.start()
+    time.sleep(0.2)
+
+    slowest = 0.0
+    for url in ["/health", "/api/papers", "/api/reading-lists", f"/api/papers/{paper_id}"] * 3:
+        response, elapsed = timed_get(client, url)
+        assert response.status_code == 200
+        slowest = max(slowest, elapsed)
+    assert slowest < 0.5
+
+    for thread in upstream_threads:
+        thread.join()
+
+
+def test_slow_gemini_answers_within_the_timeout_with_a_template(client, stubs, paper_id):
+    stubs[1].faults.latency_ms = 3000
+    response, elapsed = timed_get(client, f"/api/papers/{paper_id}/citation")
+    assert response.status_code == 200
+    assert response.json()["degraded"] is True
+    assert response.json()["source"] == "local"
+    assert elapsed < 2.5
+
+
+def test_erroring_upstreams_return_degraded_answers(client, stubs, paper_id):
+    for stub in stubs:
+        stub.faults.error_rate = 1.0
+
+    citation = client.get(f"/api/papers/{paper_id}/citation").json()
+    assert citation["degraded"] is True and citation["citation"]
+
+    related = client.get(f"/api/papers/{paper_id}/related").json()
+    assert related["success"] is True and related["degraded"] is True
+
+    search = client.post("/api/search", json={"query": "Scalable"})
+    assert search.status_code == 200
+    assert search.json()["degraded"] is True and search.json()["source"] == "library"
+
+
+def test_citation_without_an_api_key_uses_the_template(client, monkeypatch, paper_id):
+    monkeypatch.delenv("GOOGLE_API_KEY")
+    response = client.get(f"/api/papers/{paper_id}/citation", params={"format": "BibTeX"})
+    assert response.status_code == 200
+    assert response.json()["degraded"] is True
+    assert response.json()["citation"].startswith("@")
+
+
+def test_quota_errors_open_the_breaker(client, main_module, stubs, paper_id):
+    stubs[1].faults.error_rate = 1.0
+    stubs[1].faults.error_status = 429
+    threshold = main_module.gemini.breaker.failure_threshold
+
+    for _ in range(threshold):
+        assert client.get(f"/api/papers/{paper_id}/citation").status_code == 429
+    assert main_module.gemini.breaker.state == "open"
+
+    response = client.get(f"/api/papers/{paper_id}/citation")
+    assert response.status_code == 200
+    assert response.json()["degraded"] is True
+
+
+def test_breaker_opens_then_half_opens_and_closes(client, main_module, stubs, paper_id):
+    gemini_stub = stubs[1]
+    breaker = main_module.gemini.breaker
+    gemini_stub.faults.error_rate = 1.0
+    for _ in range(breaker.failure_threshold):
+        client.get(f"/api/papers/{paper_id}/citation")
+    assert breaker.state == "open"
+
+    # While open, calls fail fast without reaching the upstream
+    served = gemini_stub.requests_served
+    response, elapsed = timed_get(client, f"/api/papers/{paper_id}/citation")
+    assert response.json()["degraded"] is True
+    assert gemini_stub.requests_served == served
+    assert elapsed < 0.5
+
+    # After the recovery time one slow probe goes through; others still fail fast
+    gemini_stub.faults.error_rate = 0.0
+    gemini_stub.faults.latency_ms = 500
+    time.sleep(breaker.recovery_timeout)
+    probe = threading.Thread(target=client.get, args=(f"/api/papers/{paper_id}/citation",))
+    probe.start()
+    time.sleep(0.2)
+    assert breaker.state == "half_open"
+    response, elapsed = timed_get(client, f"/api/papers/{paper_id}/citation", params={"format": "MLA"})
+    assert response.json()["degraded"] is True
+    assert elapsed < 0.5
+    probe.join()
+
+    assert breaker.state == "closed"
+    response = client.get(f"/api/papers/{paper_id}/citation")
+    assert response.status_code == 200
+    assert "degraded" not in response.json()
+
+
+def test_list_citations_keep_answers_from_before_an_outage(client, main_module, monkeypatch, library):
+    complete = main_module.complete_with_gemini
+    calls = []
+
+    def fail_after_first(prompt):
+        calls.append(prompt)
+        if len(calls) > 1:
+            raise main_module.resilience.DependencyUnavailable("gemini", "request deadline exceeded")
+        return complete(prompt)
+
+    monkeypatch.setattr(main_module, "complete_with_gemini", fail_after_first)
+    monkeypatch.setattr(main_module, "LLM_PROMPT_TOKEN_BUDGET", 600)
+    body = client.get(f"/api/reading-lists/{library['list_ids'][0]}/citations").json()
+
+    assert len(calls) > 1 and body["llm_calls"] == 1
+    assert body["degraded"] is True and 0 < body["failed"] < body["count"]
+    cached = [c for c in body["citations"] if (c["paper_id"], "APA") in main_module.citation_cache]
+    assert len(cached) == body["count"] - body["failed"]
+    assert all(c["citations"]["APA"] for c in body["citations"])
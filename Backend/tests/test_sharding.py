@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+import sharding
+
+USERS = [f"user_{i}" for i in range(40)]
+
+
+@pytest.fixture
+def router(main_module, tmp_path):
+    """A single-shard router over fresh databases, with some saved papers per user."""
+    db_path = str(tmp_path / "papers.db")
+    main_module.init_db(db_path)
+    shards = sharding.ShardRouter.open(str(tmp_path / "shard_map.db"), db_path, init_shard=main_module.init_db)
+    for user_id in USERS:
+        list_id = shards.new_list_id()
+        conn = shards.connect(user_id)
+        conn.execute("INSERT INTO reading_lists (id, name, user_id) VALUES (?, ?, ?)", (list_id, "List", user_id))
+        conn.executemany(
+            "INSERT INTO saved_papers (paper_id, title, authors, user_id, reading_list_id) VALUES (?, ?, ?, ?, ?)",
+            [(f"2401.{i:05d}", f"Paper {i}", "Ada Lovelace", user_id, list_id) for i in range(3)]
+        )
+        conn.commit()
+        conn.close()
+    return shards
+
+
+def rows_by_shard(shards, user_id: str) -> dict:
+    found = shards.scatter(lambda conn: conn.execute(
+        "SELECT COUNT(*) FROM saved_papers WHERE user_id = ?", (user_id,)
+    ).fetchone()[0])
+    return {name: count for name, count in found.items() if count}
+
+
+def list_ids(shards, user_id: str) -> list:
+    conn = shards.connect(user_id)
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT id FROM reading_lists WHERE user_id = ? ORDER BY id", (user_id,)
+        )]
+    finally:
+        conn.close()
+
+
+def test_moved_users_keep_their_rows_and_list_ids(router, tmp_path):
+    before = {user_id: list_ids(router, user_id) for user_id in USERS}
+    status = router.rebalance(3, str(tmp_path / "shards"))
+    assert status["state"] == "done" and status["users_moved"] > 0
+
+    for user_id in USERS:
+        assert rows_by_shard(router, user_id) == {router.shard_for(user_id): 3}
+        assert list_ids(router, user_id) == before[user_id]
+        conn = router.connect(user_id)
+        linked = conn.execute(
+            "SELECT COUNT(*) FROM saved_papers WHERE user_id = ? AND reading_list_id = ?",
+            (user_id, before[user_id][0])
+        ).fetchone()[0]
+        conn.close()
+        assert linked == 3
+
+    # Ids stay unique for lists created after the move
+    new_id = router.new_list_id()
+    assert all(new_id not in ids for ids in before.values())
+
+
+def test_a_busy_user_does_not_block_others_during_a_rebalance(router, tmp_path):
+    target = sharding.HashRing([sharding.shard_name(i) for i in range(2)])
+    busy = next(u for u in USERS if target.node_for(u) != router.shard_for(u))
+    held = router.connect(busy)
+
+    rebalance = threading.Thread(target=router.rebalance, args=(2, str(tmp_path / "shards"), 0.2))
+    rebalance.start()
+    slowest = 0.0
+    while rebalance.is_alive() and (router.rebalance_status or {}).get("state") != "moving_stragglers":
+        for user_id in USERS:
+            if user_id == busy:
+                continue
+            start = time.perf_counter()
+            router.connect(user_id).close()
+            slowest = max(slowest, time.perf_counter() - start)
+    held.close()
+    rebalance.join()
+
+    assert slowest < 0.1
+    assert router.rebalance_status["retries"] > 0
+    assert rows_by_shard(router, busy) == {router.shard_for(busy): 3}
+
+
+def test_concurrent_writers_lose_no_rows_during_a_rebalance(router, tmp_path):
+    written = {user_id: 3 for user_id in USERS}
+    stop = threading.Event()
+
+    def write(user_id):
+        while not stop.is_set():
+            conn = router.connect(user_id, timeout=30)
+            conn.execute(
+                "INSERT INTO saved_papers (paper_id, title, authors, user_id) VALUES (?, ?, ?, ?)",
+                (f"2402.{written[user_id]:05d}", "Paper", "Ada Lovelace", user_id)
+            )
+            conn.commit()
+            conn.close()
+            written[user_id] += 1
+
+    writers = [threading.Thread(target=write, args=(user_id,)) for user_id in USERS[:8]]
+    for writer in writers:
+        writer.start()
+    try:
+        status = router.rebalance(4, str(tmp_path / "shards"), timeout=0.5)
+    finally:
+        stop.set()
+        for writer in writers:
+            writer.join()
+
+    assert status["state"] == "done"
+    for user_id in USERS:
+        assert rows_by_shard(router, user_id) == {router.shard_for(user_id): written[user_id]}
+
+
+def test_a_map_for_another_database_is_refused(main_module, router, tmp_path):
+    router.rebalance(2, str(tmp_path / "shards"))
+    other = str(tmp_path / "other.db")
+    main_module.init_db(other)
+    with pytest.raises(ValueError):
+        sharding.ShardRouter.open(router.map_path, other)
+
+
+ADMIN_ROUTES = [
+    ("get", "/api/admin/shards"),
+    ("post", "/api/admin/shards/rebalance?shards_count=2"),
+    ("get", "/api/admin/related-candidates/2401.00001"),
+    ("get", "/api/admin/db"),
+    ("get", "/api/admin/dependencies"),
+]
+
+
+def test_admin_routes_fail_closed(client, main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "ADMIN_TOKEN", None)
+    monkeypatch.setattr(main_module, "PROFILE_TOKEN", "profile")
+    for method, url in ADMIN_ROUTES:
+        response = getattr(client, method)(url, headers={"X-Profile-Token": "profile"})
+        assert response.status_code == 403
+
+    monkeypatch.setattr(main_module, "ADMIN_TOKEN", "admin")
+    assert client.get("/api/admin/shards", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/api/admin/shards", headers={"X-Admin-Token": "admin"}).status_code == 200